@@ -230,6 +230,22 @@ fprintf(stderr,"exitbert:  user = %d\n", connection);
 
 }
 
+/* forget every open document of every connection (see resetstate) */
+void clearbert(void)
+{
+  conscell *p, *next;
+  int i;
+
+	for (i = 0; i < NUMBEROFBERTTABLE; i++) {
+		for (p = berttable[i]; p; p = next) {
+			next = p->next;
+			if (p->stuff)
+				efree((char *)p->stuff);
+			efree((char *)p);
+		}
+		berttable[i] = NULL;
+	}
+}
 
 int hashoftumbler(tumbler *tp)
 {
@@ -431,6 +431,22 @@ void subtreefree(typecorecrum *ptr)
 	freecrum (ptr);
 }
 
+/* like subtreefree, but also frees orgls that were never written out */
+void enffree(typecorecrum *ptr)
+{
+  typecorecrum *p, *right;
+
+	if (ptr->height > 0) {
+		for (p = ((typecuc *)ptr)->leftson; p; p = right) {
+			right = p->rightbro;
+			disownnomodify (p);
+			enffree (p);
+		}
+	} else if (ptr->cenftype == GRAN && ((typecbc *)ptr)->cinfo.infotype == GRANORGL && ((typecbc *)ptr)->cinfo.granstuff.orglstuff.orglincore)
+		enffree ((typecorecrum*)((typecbc *)ptr)->cinfo.granstuff.orglstuff.orglptr);
+	freecrum (ptr);
+}
+
 void freecrum(typecorecrum *ptr)
 {
 	if (ptr->age == RESERVED)
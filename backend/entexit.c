@@ -45,3 +45,18 @@ fprintf(stderr,"sizeof(typeducloaf) = %d sizeof(typedbcloaf) = %d sizeof(type2dd
 		spanf = (typespanf) createenf (SPAN);
 	}
 }
+
+/* throw away granf and spanf and everything written from them, leaving
+   a --test-mode back-end as it was just after initmagicktricks */
+int resetmagicktricks(void)
+{
+  void enffree();
+  int closediskfile();
+
+	enffree ((typecorecrum*)granf);
+	enffree ((typecorecrum*)spanf);
+	closediskfile ();
+	initheader ();
+	granf = (typegranf) createenf (GRAN);
+	spanf = (typespanf) createenf (SPAN);
+}
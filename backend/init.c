@@ -33,7 +33,7 @@ int init(bool safe)
 	    xaccount(), createnode_or_account(), myopen(), myclose(), quitxanadu();
 	/* Debugging stuff */
 	void setdebug(), showenfilades(), examine(), dumpgranfwids(), ioinfo(), playwithalloc(),
-	     setmaximumsetupsize(), dumpstate();
+	     setmaximumsetupsize(), dumpstate(), resetstate();
 	long start_time;
 	struct tm *tm;
 
@@ -67,6 +67,7 @@ int init(bool safe)
 	requestfns[CLOSE] = myclose;
 	requestfns[XACCOUNT] = xaccount;
 	requestfns[DUMPSTATE] = dumpstate;
+	requestfns[RESETSTATE] = resetstate;
 	
 	if (safe) {
 		requestfns[SOURCEUNIXCOMMAND] = nullfun;
@@ -50,6 +50,7 @@ INT qerror(char *message);
 
 /* init.c */
 int initmagicktricks(void);
+int resetmagicktricks(void);
 int initheader(void);
 
 /* queues.c */
@@ -65,9 +66,11 @@ int dumphexstuff(char *ptr);
 int checkpointer(char *msg, char *ptr);
 void testforreservedness(char *msg);
 void dumpstate(typetask *taskptr);
+void resetstate(typetask *taskptr);
 
 /* putfe.c */
 int putdumpstate(typetask *taskptr);
+int putresetstate(typetask *taskptr);
 
 /* tumble.c */
 int tumblerjustify(tumbler *tumblerptr);
@@ -286,3 +286,9 @@ int putdumpstate(typetask *taskptr)
   fprintf(taskptr->outp, "Internal state dump not available in interactive mode.\n");
   return(TRUE);
 }
+
+int putresetstate(typetask *taskptr)
+{
+  fprintf(taskptr->outp, "State reset.\n");
+  return(TRUE);
+}
@@ -414,6 +414,11 @@ int putdumpstate(typetask *taskptr)
 	putdumpstatetree(taskptr, spanf, 's');
 }
 
+int putresetstate(typetask *taskptr)
+{
+	putnumber(taskptr->outp, RESETSTATE);
+}
+
 static void putdumpstatetree(typetask *taskptr, typecuc *root, char marker)
 {
 	FILE *outp = taskptr->outp;
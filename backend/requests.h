@@ -41,6 +41,6 @@
 #define XACCOUNT 34
 #define OPEN     35
 #define CLOSE    36
-
+#define RESETSTATE 37             /* discard all state (--test-mode only) */
 #define CREATENODE_OR_ACCOUNT 38
 #define DUMPSTATE 39              /* dump internal enfilade state */
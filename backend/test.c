@@ -1362,3 +1362,21 @@ void dumpstate(typetask *taskptr)
 
 	putdumpstate(taskptr);
 }
+
+/* RESETSTATE request handler - throws away every document, link and open
+   in a --test-mode back-end so that one process can run many tests */
+void resetstate(typetask *taskptr)
+{
+	extern bool test_mode;
+	extern int putresetstate(typetask *taskptr);
+	int resetmagicktricks();
+	void clearbert();
+
+	if (!test_mode) {
+		putrequestfailed(taskptr);
+		return;
+	}
+	clearbert();
+	resetmagicktricks();
+	putresetstate(taskptr);
+}
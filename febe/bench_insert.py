@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Benchmark ingesting multi-megabyte documents with insert_large.
+
+Each run starts a fresh back-end in test mode, streams a generated
+document of the given size into one new document with
+XuSession.insert_large, and reports the time, throughput and number of
+INSERT requests.  Runs are repeated for every combination of --size,
+--chunk-size and --window, so the effect of request size and of
+pipelining can be compared.  The document's V-span is always checked;
+--verify also reads the text back and compares it.
+"""
+
+import argparse
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+from client import (XuSession, XuConn, PipeStream, LoopbackStream, Address,
+                    VSpec, SpecSet, READ_WRITE, CONFLICT_FAIL, MAX_TEXT_STRING)
+
+DEFAULT_ACCOUNT = Address(1, 1, 0, 1)
+
+
+def generate_text(nchars, seed=0):
+    """Return nchars of word-like text, the same for the same seed."""
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz")
+                     for _ in range(rng.randint(1, 10))) for _ in range(1000)]
+    pieces, total = [], 0
+    while total < nchars:
+        word = rng.choice(words) + (" " if rng.random() < 0.9 else "\n")
+        pieces.append(word)
+        total += len(word)
+    return "".join(pieces)[:nchars]
+
+
+def run(backend_path, loopback, text, chunk_size, window, verify):
+    """Ingest text into a fresh back-end; return (seconds, inserts)."""
+    stream = LoopbackStream() if loopback else PipeStream(f"{backend_path} --test-mode")
+    session = XuSession(XuConn(stream))
+    stats = session.enable_stats()
+    try:
+        session.account(DEFAULT_ACCOUNT)
+        docid = session.open_document(session.create_document(),
+                                      READ_WRITE, CONFLICT_FAIL)
+        start = time.perf_counter()
+        end = session.insert_large(docid, Address(1, 1), io.StringIO(text),
+                                   chunk_size=chunk_size, window=window)
+        elapsed = time.perf_counter() - start
+        inserts = stats.histogram(0).count
+
+        vspec = session.retrieve_vspanset(docid)
+        if [span.end() for span in vspec.spans] != [end]:
+            raise AssertionError(f"document spans {vspec}, expected text up to {end}")
+        if verify:
+            contents = session.retrieve_contents(SpecSet(VSpec(docid, list(vspec.spans))))
+            if "".join(contents) != text:
+                raise AssertionError("text read back differs from text inserted")
+        session.quit()
+    finally:
+        stream.close()
+    return elapsed, inserts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark large-document ingestion")
+    parser.add_argument("--backend", default="../backend/build/backend",
+                        help="Path to backend executable")
+    parser.add_argument("--loopback", action="store_true",
+                        help="Use the in-process Python backend (pybackend.py)")
+    parser.add_argument("--size", type=float, nargs="+", default=[1, 4],
+                        help="Document sizes in MB (default 1 4)")
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[65536],
+                        help="Characters per INSERT request (default 65536)")
+    parser.add_argument("--window", type=int, nargs="+", default=[1, 16],
+                        help="INSERT requests in flight (default 1 16)")
+    parser.add_argument("--verify", action="store_true",
+                        help="Read the text back and compare it")
+    args = parser.parse_args()
+
+    script_dir = Path(__file__).parent
+    backend_path = (script_dir / args.backend).resolve()
+    if not args.loopback and not backend_path.exists():
+        print(f"Error: Backend not found at {backend_path}")
+        print("Run 'make' in the backend directory first.")
+        sys.exit(1)
+
+    print(f"{'size':>8} {'chunk':>8} {'window':>6} {'inserts':>8} {'seconds':>8} {'MB/s':>8}")
+    for size in args.size:
+        text = generate_text(int(size * 1_000_000))
+        for chunk_size in args.chunk_size:
+            if chunk_size < MAX_TEXT_STRING:
+                parser.error(f"--chunk-size must be at least {MAX_TEXT_STRING}")
+            for window in args.window:
+                elapsed, inserts = run(str(backend_path), args.loopback, text,
+                                       chunk_size, window, args.verify)
+                print(f"{size:>6g}MB {chunk_size:>8} {window:>6} {inserts:>8} "
+                      f"{elapsed:>8.3f} {len(text) / elapsed / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
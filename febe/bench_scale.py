@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Benchmark how operation latency grows with the size of the enfilades.
+
+Each axis grows one kind of state geometrically in a fresh back-end in
+test mode: the number of documents, the number of inserts fragmenting one
+document, the number of links, or the number of versions in chains of
+versions.  At each step (--start, then times --factor, --steps times) it
+reports the mean latency of the operations that did the growing, the
+median latency of a few probe operations against the grown state, and the
+shape of the granfilade, spanfilade and POOM trees from DUMPSTATE:
+height, crum count and fan-out of the upper crums, from tree_metrics.py.
+
+If an operation is logarithmic in the size of the trees, its latency
+should rise by a constant amount per step; the "x prev" column shows the
+ratio to the step before, which stays near 1 for logarithmic operations
+and near --factor for linear ones.  --json writes every measurement for
+plotting.
+"""
+
+import argparse
+import io
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from client import (XuSession, XuConn, PipeStream, LoopbackStream, Address,
+                    Offset, Span, VSpec, SpecSet, READ_ONLY, READ_WRITE,
+                    CONFLICT_FAIL, LINK_TARGET, JUMP_TYPE)
+from tree_metrics import metrics, summary
+
+DEFAULT_ACCOUNT = Address(1, 1, 0, 1)
+AXES = ("documents", "content", "links", "versions")
+WHOLE = Span(Address(1, 1), Offset(1))
+MAX_CHAIN_DEPTH = 7
+
+
+def state_shape(session):
+    """Tree health metrics of the back-end's current state."""
+    return metrics(session.dump_state())
+
+
+class Sweep:
+    """One axis grown step by step in one back-end."""
+
+    def __init__(self, session, axis, seed):
+        self.session = session
+        self.axis = axis
+        self.rng = random.Random(seed)
+        self.size = 0
+        self.times = {}
+        getattr(self, f"setup_{axis}")()
+
+    def timed(self, op, call, *args):
+        start = time.perf_counter()
+        result = call(*args)
+        self.times.setdefault(op, []).append(time.perf_counter() - start)
+        return result
+
+    def text(self, nchars):
+        return "".join(self.rng.choice("abcdefghijklmnopqrstuvwxyz ")
+                       for _ in range(nchars))
+
+    def new_document(self, text):
+        docid = self.session.create_document()
+        opened = self.session.open_document(docid, READ_WRITE, CONFLICT_FAIL)
+        self.session.insert_large(opened, Address(1, 1), io.StringIO(text))
+        return opened
+
+    def grow(self, size):
+        """Grow the axis to size; return the mean latency of each growing op."""
+        self.times = {}
+        while self.size < size:
+            getattr(self, f"grow_{self.axis}")()
+            self.size += 1
+        return {op: statistics.fmean(times) for op, times in self.times.items()}
+
+    def probe(self, repeat):
+        """Median latency of each probe operation, repeated."""
+        self.times = {}
+        for _ in range(repeat):
+            getattr(self, f"probe_{self.axis}")()
+        return {op: statistics.median(times) for op, times in self.times.items()}
+
+    # documents: many small documents; probes read the first through the
+    # granfilade and find it through the spanfilade
+    def setup_documents(self):
+        self.first = self.new_document(self.text(40))
+
+    def grow_documents(self):
+        docid = self.timed("create_document", self.session.create_document)
+        opened = self.session.open_document(docid, READ_WRITE, CONFLICT_FAIL)
+        self.timed("insert", self.session.insert, opened, Address(1, 1), [self.text(40)])
+        self.session.close_document(opened)
+
+    def probe_documents(self):
+        self.timed("retrieve_contents", self.session.retrieve_contents,
+                   SpecSet(VSpec(self.first, [WHOLE])))
+        self.timed("find_documents", self.session.find_documents,
+                   SpecSet(VSpec(self.first, [Span(Address(1, 1), Offset(0, 10))])))
+
+    # content: one document fragmented by inserts at random positions
+    def setup_content(self):
+        self.doc = self.new_document(self.text(40))
+        self.length = 40
+
+    def grow_content(self):
+        position = Address(1, 1 + self.rng.randrange(self.length + 1))
+        self.timed("insert", self.session.insert, self.doc, position, [self.text(20)])
+        self.length += 20
+
+    def probe_content(self):
+        self.timed("retrieve_vspanset", self.session.retrieve_vspanset, self.doc)
+        start = 1 + self.rng.randrange(self.length - 10)
+        self.timed("retrieve_contents", self.session.retrieve_contents,
+                   SpecSet(VSpec(self.doc, [Span(Address(1, start), Offset(0, 10))])))
+
+    # links: links between random spans of two documents
+    def setup_links(self):
+        self.length = 4000
+        self.source = self.new_document(self.text(self.length))
+        self.target = self.new_document(self.text(self.length))
+        self.links = []
+
+    def span(self, docid):
+        start = 1 + self.rng.randrange(self.length - 5)
+        return SpecSet(VSpec(docid, [Span(Address(1, start), Offset(0, 5))]))
+
+    def grow_links(self):
+        self.links.append(self.timed(
+            "create_link", self.session.create_link, self.source,
+            self.span(self.source), self.span(self.target), SpecSet([JUMP_TYPE])))
+
+    def probe_links(self):
+        self.timed("find_links", self.session.find_links, self.span(self.source))
+        self.timed("follow_link", self.session.follow_link,
+                   self.rng.choice(self.links), LINK_TARGET)
+
+    # versions: chains of versions, each one edited once.  A version's
+    # address is one place longer than its parent's, so a chain is cut at
+    # MAX_CHAIN_DEPTH, before the addresses of its text overflow a tumbler
+    # (NPLACES) and crash the back-end; the next chain starts again from
+    # the original.
+    def setup_versions(self):
+        self.original = self.new_document(self.text(200))
+        self.session.close_document(self.original)
+        self.latest = self.original
+        self.depth = 0
+
+    def grow_versions(self):
+        if self.depth == MAX_CHAIN_DEPTH:
+            self.latest, self.depth = self.original, 0
+        version = self.timed("create_version", self.session.create_version, self.latest)
+        self.depth += 1
+        opened = self.session.open_document(version, READ_WRITE, CONFLICT_FAIL)
+        self.session.insert(opened, Address(1, 1 + self.rng.randrange(200)), [self.text(1)])
+        self.session.close_document(opened)
+        self.latest = version
+
+    def probe_versions(self):
+        original = self.session.open_document(self.original, READ_ONLY, CONFLICT_FAIL)
+        latest = self.session.open_document(self.latest, READ_ONLY, CONFLICT_FAIL)
+        self.timed("retrieve_contents", self.session.retrieve_contents,
+                   SpecSet(VSpec(latest, [WHOLE])))
+        self.timed("compare_versions", self.session.compare_versions,
+                   SpecSet(VSpec(original, [WHOLE])), SpecSet(VSpec(latest, [WHOLE])))
+        self.session.close_document(latest)
+        self.session.close_document(original)
+
+
+def sweep(backend_path, loopback, axis, sizes, repeat, seed):
+    """Measure one axis at each size; return a list of steps."""
+    stream = LoopbackStream() if loopback else PipeStream(f"{backend_path} --test-mode")
+    session = XuSession(XuConn(stream))
+    steps = []
+    try:
+        session.account(DEFAULT_ACCOUNT)
+        bench = Sweep(session, axis, seed)
+        for size in sizes:
+            latency = bench.grow(size)
+            latency.update(bench.probe(repeat))
+            steps.append({"axis": axis, "size": size, "latency": latency,
+                          "shape": state_shape(session)})
+        session.quit()
+    finally:
+        stream.close()
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark latency against enfilade size")
+    parser.add_argument("--backend", default="../backend/build/backend",
+                        help="Path to backend executable")
+    parser.add_argument("--loopback", action="store_true",
+                        help="Use the in-process Python backend (pybackend.py)")
+    parser.add_argument("--axis", nargs="+", choices=AXES, default=list(AXES),
+                        help="What to grow (default all)")
+    parser.add_argument("--start", type=int, default=8,
+                        help="Size at the first step (default 8)")
+    parser.add_argument("--factor", type=int, default=2,
+                        help="Growth factor between steps (default 2)")
+    parser.add_argument("--steps", type=int, default=7,
+                        help="Number of steps (default 7)")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="Times each probe is repeated (default 20)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for text and positions (default 0)")
+    parser.add_argument("--json", metavar="FILE",
+                        help="Write every step as JSON")
+    args = parser.parse_args()
+
+    script_dir = Path(__file__).parent
+    backend_path = (script_dir / args.backend).resolve()
+    if not args.loopback and not backend_path.exists():
+        print(f"Error: Backend not found at {backend_path}")
+        print("Run 'make' in the backend directory first.")
+        sys.exit(1)
+
+    sizes = [args.start * args.factor ** i for i in range(args.steps)]
+    results = []
+    for axis in args.axis:
+        steps = sweep(str(backend_path), args.loopback, axis, sizes, args.repeat, args.seed)
+        results.extend(steps)
+        print(f"{axis}")
+        previous = {}
+        for step in steps:
+            print(f"  {step['size']:>7}  {summary(step['shape'])}")
+            for op, seconds in step["latency"].items():
+                ratio = f"x{seconds / previous[op]:.2f}" if op in previous else ""
+                print(f"           {op:<18} {seconds * 1e6:>10.1f} us {ratio:>7}")
+            previous = step["latency"]
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
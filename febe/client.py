@@ -29,7 +29,8 @@
 
 # Ported to Python 3 - January 2026
 
-import sys, os, socket
+import sys, os, socket, locale, time, json, zlib, select, codecs
+from collections import deque, namedtuple
 from functools import total_ordering
 
 # ==================================================== OBJECT TYPES AND I/O
@@ -580,11 +581,19 @@ NOWIDTH = Offset()
 # specifiers
 NOSPECS = SpecSet([])
 
+# the longest string of text the C back-end accepts in one insert
+# (GRANTEXTLENGTH); longer strings overflow a text crum (bug 0018)
+MAX_TEXT_STRING = 950
+
 # exceptions
 class XuError(Exception):
     """Udanax protocol error."""
     pass
 
+class XuTimeout(XuError):
+    """The back-end did not answer before a stream's deadline."""
+    pass
+
 # access modes
 (READ_ONLY, READ_WRITE) = (1, 2)
 
@@ -615,6 +624,16 @@ TYPES_BY_NAME = {}
 for spec in LINK_TYPES:
     TYPES_BY_NAME[TYPE_NAMES[spec]] = spec
 
+# order codes, named after the XuSession methods that issue them
+REQUEST_NAMES = {
+    0: "insert", 1: "retrieve_vspanset", 2: "vcopy", 3: "rearrange",
+    5: "retrieve_contents", 10: "compare_versions", 11: "create_document",
+    12: "delete", 13: "create_version", 14: "retrieve_vspan", 16: "quit",
+    18: "follow_link", 22: "find_documents", 27: "create_link",
+    28: "retrieve_endsets", 30: "find_links", 34: "account",
+    35: "open_document", 36: "close_document", 37: "reset_state",
+    38: "create_node", 39: "dump_state"}
+
 # ------------------------------------------------------------------ XuConn
 class XuConn:
     """Methods for sending and receiving objects on a stream.  The
@@ -622,17 +641,47 @@ class XuConn:
 
     def __init__(self, stream):
         self.stream = stream
+        self.monitors = []
+        self.stats = None
+        self.tracer = None
 
     def __repr__(self):
         return "<XuConn on %s>" % repr(self.stream)
 
+    def monitor(self, monitor):
+        """Report every command from now on to a monitor such as XuStats
+        or XuTracer, and return it.  Monitors are told when a command
+        begins and when its request is written, and are given everything
+        sent and received (see MeteredStream)."""
+        if not self.monitors:
+            self.stream = MeteredStream(self.stream, self.monitors)
+        self.monitors.append(monitor)
+        return monitor
+
+    def enable_stats(self, stats=None):
+        """Start collecting per-opcode timings into an XuStats, which is
+        returned.  Everything read or written from now on is counted."""
+        if self.stats is None:
+            if stats is None: stats = XuStats()
+            self.stats = self.monitor(stats)
+        return self.stats
+
+    def enable_tracing(self, tracer=None):
+        """Start recording commands into an XuTracer, which is returned."""
+        if self.tracer is None:
+            if tracer is None: tracer = XuTracer()
+            self.tracer = self.monitor(tracer)
+        return self.tracer
+
     # protocol
 
     def handshake(self):
         """Perform the FeBe protocol handshake to open a session."""
         self.stream.write("\nP0~")
         while 1:
-            if self.stream.read(1) == "\n": break
+            ch = self.stream.read(1)
+            if not ch: raise XuError("stream closed prematurely")
+            if ch == "\n": break
         if self.stream.read(2) != "P0":
             raise ValueError("back-end does not speak 88.1 protocol")
         if self.stream.read(1) not in "~\n":
@@ -669,8 +718,24 @@ class XuConn:
 
     def command(self, code, *args):
         """Issue a command with the given order code and arguments."""
+        self.send(code, *args)
+        self.receive(code)
+
+    def send(self, code, *args):
+        """Write a request without waiting for its response.  Several
+        requests may be sent before their responses are received, in
+        order, with receive(); monitors then count all of the responses
+        towards the last request sent."""
+        monitors = self.monitors
+        if monitors:
+            for monitor in monitors: monitor.begin(code)
         Number_write(code, self.stream)
         for arg in args: self.write(arg)
+        if monitors:
+            for monitor in monitors: monitor.written()
+
+    def receive(self, code):
+        """Read the response code to a request sent with send()."""
         try:
             response = self.Number()
         except ValueError:
@@ -689,6 +754,18 @@ class XuSession:
         self.xc = conn
         self.xc.handshake()
         self.open = 1
+        self.stats = conn.stats
+        self.tracer = conn.tracer
+
+    def enable_stats(self, stats=None):
+        """Time every command from now on; see XuStats."""
+        self.stats = self.xc.enable_stats(stats)
+        return self.stats
+
+    def enable_tracing(self, tracer=None):
+        """Record every command from now on; see XuTracer."""
+        self.tracer = self.xc.enable_tracing(tracer)
+        return self.tracer
 
     def __repr__(self):
         if self.open:
@@ -789,6 +866,39 @@ class XuSession:
     def insert(self, docid, vaddr, strings):
         self.xc.command(0, docid, vaddr, strings)
 
+    def insert_large(self, docid, vaddr, text, chunk_size=65536,
+                     segment_size=MAX_TEXT_STRING, window=16):
+        """Insert text of any length at vaddr and return the address just
+        after it.  The text may be a string, a file object or an iterable
+        of strings, and is read as it is sent.
+
+        The text is cut into strings of at most segment_size characters
+        (the C back-end overflows a fixed buffer on longer strings; see
+        bug 0018), which are sent as consecutive inserts of up to
+        chunk_size characters, each placed where the last one ended.  Up
+        to window inserts are sent before their responses are read."""
+        segment_size = min(segment_size, chunk_size)
+        pending = 0
+        strings, nchars = [], 0
+        for segment in text_segments(text, segment_size):
+            strings.append(segment)
+            nchars = nchars + len(segment)
+            if nchars + segment_size > chunk_size:
+                if pending == window:
+                    self.xc.receive(0)
+                    pending = pending - 1
+                self.xc.send(0, docid, vaddr, strings)
+                pending = pending + 1
+                vaddr = vaddr + Offset(0, nchars)
+                strings, nchars = [], 0
+        if strings:
+            self.xc.send(0, docid, vaddr, strings)
+            pending = pending + 1
+            vaddr = vaddr + Offset(0, nchars)
+        for i in range(pending):
+            self.xc.receive(0)
+        return vaddr
+
     def vcopy(self, docid, vaddr, specset):
         self.xc.command(2, docid, vaddr, specset)
 
@@ -821,6 +931,12 @@ class XuSession:
         self.xc.command(38, acctid)
         return self.xc.Address()
 
+    def reset_state(self):
+        """Discard every document, link and open document (RESETSTATE
+        command 37).  Only a back-end started with --test-mode accepts
+        this; the current account is kept."""
+        self.xc.command(37)
+
     # debugging / internal state
 
     def dump_state(self):
@@ -968,6 +1084,141 @@ def collapse_sharedspans(sharedspans):
         lastwidth = width
     return result
 
+def text_segments(text, size):
+    """Yield a string, a file object or an iterable of strings as
+    strings of at most size characters, reading it as it goes."""
+    if isinstance(text, str):
+        for i in range(0, len(text), size):
+            yield text[i:i + size]
+        return
+    if hasattr(text, "read"):
+        read = text.read
+        text = iter(lambda: read(size), "")
+    buffer = ""
+    for piece in text:
+        buffer = buffer + piece
+        while len(buffer) >= size:
+            yield buffer[:size]
+            buffer = buffer[size:]
+    if buffer:
+        yield buffer
+
+# ------------------------------------------------------------- WriteBuffer
+class WriteBuffer:
+    """Wrapper around an XuSession that coalesces typing.
+
+    An insert that continues the pending one (same document, starting
+    where the pending text ends) is added to its text set instead of
+    being sent, so a run of keystrokes becomes one INSERT request.  The
+    pending insert is flushed when it reaches max_chars characters, when
+    it is older than max_delay seconds (checked on each insert and by
+    poll()), and before any other request, so reads always see it.
+
+    The end of each document's text (its 1.x subspace) is tracked
+    locally: end() asks the back-end once and then follows the inserts
+    made through the buffer, so append() needs no RETRIEVEVSPANSET per
+    keystroke.  Any other editing request through the buffer forgets the
+    tracked ends.  Every other XuSession method is available unchanged."""
+
+    def __init__(self, session, max_chars=4096, max_delay=None,
+                 clock=time.monotonic):
+        self.session = session
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self.clock = clock
+        self.pending = None         # [docid, vaddr, strings, nchars, since]
+        self.ends = {}
+        self.ninserts = 0
+        self.nflushes = 0
+
+    def __repr__(self):
+        return "<WriteBuffer on %s, %d inserts in %d requests>" % (
+            repr(self.session), self.ninserts, self.nflushes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def __getattr__(self, name):
+        attr = getattr(self.session, name)
+        if not callable(attr): return attr
+        def call(*args, **kwargs):
+            self.flush()
+            if name in ("vcopy", "delete", "pivot", "swap", "remove",
+                        "reset_state"):
+                self.ends.clear()
+            return attr(*args, **kwargs)
+        return call
+
+    def insert(self, docid, vaddr, strings):
+        """Queue an insert, sending the pending one first unless this
+        one continues it."""
+        nchars = sum(map(len, strings))
+        pending = self.pending
+        if pending and (pending[0] != docid or
+                        pending[1] + Offset(0, pending[3]) != vaddr):
+            self.flush()
+            pending = None
+        if pending:
+            pending[2].extend(strings)
+            pending[3] += nchars
+        else:
+            self.pending = [docid, vaddr, list(strings), nchars, self.clock()]
+        self.ninserts += 1
+
+        end = self.ends.get(docid)
+        if end is not None:
+            if Address(1, 1) <= vaddr <= end:
+                self.ends[docid] = end + Offset(0, nchars)
+            else:
+                del self.ends[docid]
+
+        if self.pending[3] >= self.max_chars: self.flush()
+        else: self.poll()
+
+    def insert_large(self, docid, vaddr, text, **options):
+        """Send the pending insert, then XuSession.insert_large, following
+        the tracked end of the document."""
+        self.flush()
+        after = self.session.insert_large(docid, vaddr, text, **options)
+        end = self.ends.get(docid)
+        if end is not None:
+            if Address(1, 1) <= vaddr <= end:
+                self.ends[docid] = end + (after - vaddr)
+            else:
+                del self.ends[docid]
+        return after
+
+    def append(self, docid, strings):
+        """Insert at the end of the document's text."""
+        self.insert(docid, self.end(docid), strings)
+
+    def end(self, docid):
+        """Return the address just after the last character of text."""
+        if docid not in self.ends:
+            self.flush()
+            end = Address(1, 1)
+            for span in self.session.retrieve_vspanset(docid).spans:
+                if span.start[0] == 1: end = span.end()
+            self.ends[docid] = end
+        return self.ends[docid]
+
+    def poll(self):
+        """Flush the pending insert if it is older than max_delay."""
+        if (self.pending and self.max_delay is not None and
+                self.clock() - self.pending[4] >= self.max_delay):
+            self.flush()
+
+    def flush(self):
+        """Send the pending insert, if any."""
+        if self.pending:
+            docid, vaddr, strings = self.pending[:3]
+            self.pending = None
+            self.session.insert(docid, vaddr, strings)
+            self.nflushes += 1
+
 # ================================ STREAMS OVER WHICH TO HOLD FEBE SESSIONS
 
 class XuStream:
@@ -1066,6 +1317,16 @@ class PipeStream(XuStream):
         self.inpipe = os.popen(command + " < " + self.fifo)
         self.outpipe = open(self.fifo, "w")
         self.open = 1
+        # replies are read from the descriptor with select(), so that a
+        # read can give up at the deadline (a time.monotonic() value)
+        self.fd = self.inpipe.fileno()
+        self.decoder = codecs.getincrementaldecoder(self.inpipe.encoding)()
+        self.buffer = ""
+        self.pos = 0
+        self.deadline = None
+        # once a deadline is missed the late reply would be taken for the
+        # next request's, so every later read fails at once
+        self.timed_out = None
 
     def __repr__(self):
         result = self.__class__.__name__
@@ -1079,7 +1340,27 @@ class PipeStream(XuStream):
         except: pass
 
     def read(self, length):
-        return self.inpipe.read(length)
+        while len(self.buffer) - self.pos < length:
+            if not self.fill(): break
+        data = self.buffer[self.pos:self.pos + length]
+        self.pos = self.pos + len(data)
+        return data
+
+    def fill(self):
+        """Read what the back-end has written; return 0 at end of file.
+        Raise XuTimeout if nothing arrives before the deadline, or if an
+        earlier read missed its deadline."""
+        if self.timed_out:
+            raise XuTimeout(self.timed_out)
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.fd], [], [], remaining)[0]:
+                self.timed_out = "no response from back-end before deadline"
+                raise XuTimeout(self.timed_out)
+        data = os.read(self.fd, 65536)
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(data, not data)
+        self.pos = 0
+        return len(data)
 
     def write(self, data):
         self.outpipe.write(data)
@@ -1092,6 +1373,297 @@ class PipeStream(XuStream):
         except: pass
         self.open = 0
 
+# ---------------------------------------------------------- LoopbackStream
+class LoopbackStream(XuStream):
+    """Stream interface to an in-process back-end (see pybackend.py)."""
+
+    def __init__(self, backend=None):
+        if backend is None:
+            from pybackend import Backend
+            backend = Backend()
+        self.backend = backend
+        self.encoding = locale.getpreferredencoding(False)
+        self.open = 1
+
+    def __repr__(self):
+        result = self.__class__.__name__
+        if self.open:
+            return "<%s to %s>" % (result, repr(self.backend))
+        else:
+            return "<%s closed>" % result
+
+    def read(self, length):
+        return self.backend.read(length)
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode(self.encoding)
+        self.backend.write(data)
+
+    def close(self):
+        self.backend.close()
+        self.open = 0
+
+# ------------------------------------------------------------ MeteredStream
+class MeteredStream(XuStream):
+    """Stream wrapper that reports traffic to a list of monitors."""
+
+    def __init__(self, stream, monitors):
+        self.stream = stream
+        self.monitors = monitors
+
+    def __repr__(self):
+        return repr(self.stream)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def read(self, length):
+        data = self.stream.read(length)
+        for monitor in self.monitors: monitor.received(data)
+        return data
+
+    def write(self, data):
+        self.stream.write(data)
+        for monitor in self.monitors: monitor.sent(data)
+
+    def close(self):
+        self.stream.close()
+
+# ============================================================ INSTRUMENTATION
+class Histogram:
+    """Counts of non-negative integers in log-linear buckets, as in
+    HdrHistogram: each power of two is split into 2**precision buckets,
+    so every value is kept to within one part in 2**precision."""
+
+    def __init__(self, precision=5):
+        self.precision = precision
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def __repr__(self):
+        return "<Histogram of %d, p50 %d, max %d>" % (
+            self.count, self.percentile(50), self.max)
+
+    def bucket(self, value):
+        """Return the lowest and highest values sharing a bucket with value."""
+        shift = value.bit_length() - self.precision - 1
+        if shift <= 0: return value, value
+        low = value >> shift << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, value):
+        value = int(value)
+        low = self.bucket(value)[0]
+        self.buckets[low] = self.buckets.get(low, 0) + 1
+        if not self.count or value < self.min: self.min = value
+        if value > self.max: self.max = value
+        self.count = self.count + 1
+        self.total = self.total + value
+
+    def percentile(self, percent):
+        """Return the value below which the given percentage of values fall
+        (the top of its bucket, and never more than the largest value)."""
+        rank = self.count * percent / 100.0
+        seen = 0
+        for low in sorted(self.buckets):
+            seen = seen + self.buckets[low]
+            if seen >= rank:
+                return min(self.bucket(low)[1], self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"count": self.count, "min": self.min, "max": self.max,
+                "mean": self.count and self.total / self.count,
+                "p50": self.percentile(50), "p90": self.percentile(90),
+                "p99": self.percentile(99), "p999": self.percentile(99.9),
+                "buckets": sorted(self.buckets.items())}
+
+class XuStats:
+    """Per-opcode timings and traffic for a connection.
+
+    Each command's time is split into writing the request ("write"),
+    waiting for the first byte of the reply ("wait", which is the network
+    and the back-end), and reading and decoding the rest of the reply
+    ("decode"), which ends with the last read before the next command.
+    Times are in microseconds; "sent" and "received" count characters."""
+
+    METRICS = ("write", "wait", "decode", "total", "sent", "received")
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.opcodes = {}
+        self.code = None
+
+    def __repr__(self):
+        self.finish()
+        count = 0
+        for histograms in self.opcodes.values():
+            count = count + histograms["total"].count
+        return "<XuStats of %d commands>" % count
+
+    def begin(self, code):
+        self.finish()
+        self.code = code
+        self.start = self.clock()
+        self.done = self.first = self.last = None
+        self.nsent = self.nreceived = 0
+
+    def written(self):
+        self.done = self.clock()
+
+    def sent(self, data):
+        self.nsent = self.nsent + len(data)
+
+    def received(self, data):
+        if self.code is None: return
+        self.last = self.clock()
+        if self.first is None: self.first = self.last
+        self.nreceived = self.nreceived + len(data)
+
+    def finish(self):
+        """Record the command in progress, if any."""
+        if self.code is None: return
+        if self.code not in self.opcodes:
+            self.opcodes[self.code] = {}
+            for metric in self.METRICS:
+                self.opcodes[self.code][metric] = Histogram()
+        histograms = self.opcodes[self.code]
+        done = self.done or self.clock()
+        first = self.first or done
+        last = self.last or first
+        for metric, value in [("write", done - self.start),
+                              ("wait", first - done),
+                              ("decode", last - first),
+                              ("total", last - self.start)]:
+            histograms[metric].record(round(value * 1e6))
+        histograms["sent"].record(self.nsent)
+        histograms["received"].record(self.nreceived)
+        self.code = None
+
+    def histogram(self, code, metric="total"):
+        """Return the Histogram of one metric for one order code."""
+        self.finish()
+        return self.opcodes[code][metric]
+
+    def to_dict(self):
+        self.finish()
+        opcodes = {}
+        for code in sorted(self.opcodes):
+            entry = {"name": REQUEST_NAMES.get(code, str(code))}
+            for metric in self.METRICS:
+                entry[metric] = self.opcodes[code][metric].to_dict()
+            opcodes[str(code)] = entry
+        return {"unit": "us", "opcodes": opcodes}
+
+    def write_json(self, file):
+        """Write to_dict() as JSON to a file object or path."""
+        if type(file) is type(""):
+            with open(file, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+        else:
+            json.dump(self.to_dict(), file, indent=2)
+
+TraceRecord = namedtuple("TraceRecord",
+                         "timestamp opcode digest duration size")
+
+class XuTracer:
+    """A ring buffer of the most recent commands on one or more sessions.
+
+    Each TraceRecord holds the start time and duration of a command (in
+    seconds on the tracer's clock), its order code, a CRC-32 of the whole
+    request as sent, and the number of characters in the reply.  With
+    every=N only one command in N is recorded.  This is cheap enough to
+    leave on, unlike DebugWrapper; sessions that never call
+    enable_tracing() are not slowed at all."""
+
+    def __init__(self, capacity=4096, every=1, name="febe",
+                 clock=time.perf_counter):
+        self.records = deque(maxlen=capacity)
+        self.every = every
+        self.name = name
+        self.clock = clock
+        self.origin = clock()
+        self.commands = 0
+        self.code = None
+
+    def __repr__(self):
+        self.finish()
+        return "<XuTracer %s with %d of %d commands>" % (
+            self.name, len(self.records), self.commands)
+
+    def __iter__(self):
+        self.finish()
+        return iter(self.records)
+
+    def begin(self, code):
+        self.finish()
+        self.commands = self.commands + 1
+        if self.commands % self.every: return
+        self.code = code
+        self.start = self.last = self.clock()
+        self.digest = 0
+        self.size = 0
+
+    def written(self):
+        pass
+
+    def sent(self, data):
+        if self.code is not None:
+            self.digest = zlib.crc32(data.encode("utf-8", "replace"),
+                                     self.digest)
+
+    def received(self, data):
+        if self.code is not None:
+            self.last = self.clock()
+            self.size = self.size + len(data)
+
+    def finish(self):
+        """Record the command in progress, if any."""
+        if self.code is None: return
+        self.records.append(TraceRecord(self.start, self.code, self.digest,
+                                        self.last - self.start, self.size))
+        self.code = None
+
+    def to_chrome_trace(self):
+        return chrome_trace([self])
+
+    def write_chrome_trace(self, file):
+        """Write the records as Chrome trace-event JSON (for chrome://tracing
+        or Perfetto) to a file object or path."""
+        write_chrome_trace([self], file)
+
+def chrome_trace(tracers):
+    """Return the records of several tracers as one Chrome trace, with a
+    track for each tracer.  They must share a clock."""
+    origin = min([tracer.origin for tracer in tracers])
+    events = []
+    for tid in range(len(tracers)):
+        tracer = tracers[tid]
+        events.append({"name": "thread_name", "ph": "M", "pid": 1,
+                       "tid": tid, "args": {"name": tracer.name}})
+        for record in tracer:
+            events.append({
+                "name": REQUEST_NAMES.get(record.opcode, str(record.opcode)),
+                "cat": "febe", "ph": "X", "pid": 1, "tid": tid,
+                "ts": round((record.timestamp - origin) * 1e6, 3),
+                "dur": round(record.duration * 1e6, 3),
+                "args": {"opcode": record.opcode,
+                         "digest": "%08x" % record.digest,
+                         "size": record.size}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def write_chrome_trace(tracers, file):
+    """Write chrome_trace(tracers) as JSON to a file object or path."""
+    if type(file) is type(""):
+        with open(file, "w") as f:
+            json.dump(chrome_trace(tracers), f)
+    else:
+        json.dump(chrome_trace(tracers), file)
+
 # ====================================================== DEBUGGING WRAPPERS
 def shortrepr(obj):
     if type(obj) is type([]):
@@ -1169,5 +1741,8 @@ def tcpconnect(hostname, port):
 def pipeconnect(command):
     return XuSession(XuConn(PipeStream(command)))
 
+def loopbackconnect():
+    return XuSession(XuConn(LoopbackStream()))
+
 def testconnect():
     return XuSession(XuConn(FileStream(sys.stdin, sys.stdout)))
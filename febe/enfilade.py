@@ -0,0 +1,1434 @@
+"""Enfilade data structures for the in-process reference back-end.
+
+This is a transliteration of the tree code in backend/ (tumble.c, genf.c,
+wisp.c, split.c, recombine.c, makeroom.c, ndcuts.c, insertnd.c, edit.c,
+retrie.c, granf2.c, insert.c) into Python.  The granfilade, the spanfilade
+and every document's POOM are the same balanced B-tree variants as in the C
+back-end, with the same split, recombine and cut rules, so the shapes
+reported by DUMPSTATE and the order of retrieval results agree with it.
+
+Tumblers are immutable tuples (sign, exp, mantissa) where mantissa is a
+16-tuple of unsigned 32-bit digits, exactly as in the C ``tumbler`` struct.
+"""
+
+# ================================================================ TUMBLERS
+
+NPLACES = 16
+DIGITMASK = 0xffffffff
+
+NOPLACES = (0,) * NPLACES
+ZERO = (0, 0, NOPLACES)
+
+# tumblercmp results
+(LESS, EQUAL, GREATER) = (-1, 0, 1)
+
+# intervalcmp / whereoncrum results
+(TOMYLEFT, ONMYLEFTBORDER, THRUME, ONMYRIGHTBORDER, TOMYRIGHT) = \
+    (-2, -1, 0, 1, 2)
+
+
+class EnfiladeError(Exception):
+    """An internal consistency failure; the C back-end aborts here."""
+    pass
+
+
+def maketumbler(digits, exp=0, sign=0):
+    """Build a tumbler from a list of mantissa digits."""
+    mant = [d & DIGITMASK for d in digits[:NPLACES]]
+    return (sign, exp, tuple(mant + [0] * (NPLACES - len(mant))))
+
+def fromdigits(digits):
+    """Convert client-style digits (leading zeros for the exponent)."""
+    exp = 0
+    while exp < len(digits) and digits[exp] == 0:
+        exp += 1
+    if exp == len(digits):
+        return ZERO
+    return maketumbler(list(digits[exp:]), -exp)
+
+def todigits(t):
+    """Convert a tumbler to client-style digits, as puttumbler prints it."""
+    sign, exp, mant = t
+    place = NPLACES - 1
+    while place > 0 and mant[place] == 0:
+        place -= 1
+    return [0] * (-exp) + [_signed(d) for d in mant[:place + 1]]
+
+def tumblerstr(t):
+    return ".".join(map(str, todigits(t)))
+
+def _signed(d):
+    return d - 0x100000000 if d & 0x80000000 else d
+
+def iszero(t):
+    return t[2][0] == 0
+
+def is1story(t):
+    mant = t[2]
+    for i in range(1, NPLACES):
+        if mant[i]:
+            return False
+    return True
+
+def nstories(t):
+    mant = t[2]
+    i = NPLACES
+    while i > 0:
+        i -= 1
+        if mant[i]:
+            return i + 1
+    return 1
+
+def tumblerlength(t):
+    return nstories(t) - t[1]
+
+def lastdigit(t):
+    return t[2][nstories(t) - 1]
+
+def _justify(sign, exp, mant):
+    if mant[0]:
+        return (sign, exp, mant)
+    shift = 0
+    while mant[shift] == 0:
+        if shift == NPLACES - 1:
+            return (0, 0, mant)
+        shift += 1
+    return (sign, exp - shift, mant[shift:] + (0,) * shift)
+
+def justify(t):
+    return _justify(*t)
+
+def _abscmp(a, b):
+    if a[1] != b[1]:
+        return LESS if a[1] < b[1] else GREATER
+    am, bm = a[2], b[2]
+    for i in range(NPLACES):
+        if am[i] != bm[i]:
+            # The C code subtracts the digits as signed 32-bit integers.
+            cmp = (am[i] - bm[i]) & DIGITMASK
+            return LESS if cmp & 0x80000000 else GREATER
+    return EQUAL
+
+def tumblercmp(a, b):
+    if a[2][0] == 0:
+        if b[2][0] == 0:
+            return EQUAL
+        return GREATER if b[0] else LESS
+    if b[2][0] == 0:
+        return LESS if a[0] else GREATER
+    if a[0] == b[0]:
+        return _abscmp(b, a) if a[0] else _abscmp(a, b)
+    return LESS if a[0] else GREATER
+
+def intervalcmp(left, right, address):
+    cmp = tumblercmp(address, left)
+    if cmp == LESS:
+        return TOMYLEFT
+    if cmp == EQUAL:
+        return ONMYLEFTBORDER
+    cmp = tumblercmp(address, right)
+    if cmp == LESS:
+        return THRUME
+    if cmp == EQUAL:
+        return ONMYRIGHTBORDER
+    return TOMYRIGHT
+
+def tumblermax(a, b):
+    return a if tumblercmp(a, b) == GREATER else b
+
+def _absadd(a, b):
+    am, bm = a[2], b[2]
+    ans = [0] * NPLACES
+    if a[1] == b[1]:
+        exp = a[1]
+        ans[0] = (am[0] + bm[0]) & DIGITMASK
+        i = j = 1
+    elif a[1] > b[1]:
+        exp = a[1]
+        temp = a[1] - b[1]
+        if temp >= NPLACES:
+            return (0, exp, am)
+        ans[:temp] = am[:temp]
+        ans[temp] = (am[temp] + bm[0]) & DIGITMASK
+        j = temp + 1
+        i = 1
+    else:
+        return (0, b[1], bm)
+    ans[j:] = bm[i:i + NPLACES - j]
+    return (0, exp, tuple(ans))
+
+def _strongsub(a, b):
+    if a == b:
+        return ZERO
+    if b[1] < a[1]:
+        return a
+    am, bm = a[2], b[2]
+    exp = a[1]
+    i = 0
+    while am[i] == bm[i]:
+        exp -= 1
+        i += 1
+        if i >= NPLACES:
+            return (0, exp, NOPLACES)
+    ans = [(am[i] - bm[i]) & DIGITMASK] + list(am[i + 1:])
+    return (0, exp, tuple(ans + [0] * (NPLACES - len(ans))))
+
+def _weaksub(a, b):
+    if a == b:
+        return ZERO
+    am = a[2]
+    expdiff = a[1] - b[1]
+    ans = [0] * NPLACES
+    i = 0
+    while i < expdiff:
+        if i >= NPLACES:
+            return (0, a[1], tuple(ans))
+        ans[i] = am[i]
+        i += 1
+    if i < NPLACES:
+        ans[i] = (am[i] - b[2][0]) & DIGITMASK
+    return (0, a[1], tuple(ans))
+
+def tumbleradd(a, b):
+    if b[2][0] == 0:
+        return a
+    if a[2][0] == 0:
+        return b
+    if a[0] == b[0]:
+        c = _absadd(a, b)
+        return (a[0], c[1], c[2])
+    if _abscmp(a, b) == GREATER:
+        c = _strongsub(a, b)
+        sign = a[0]
+    else:
+        c = _weaksub(b, a)
+        sign = b[0]
+    if c[2][0] == 0:
+        return _justify(sign, c[1], c[2])
+    return (sign, c[1], c[2])
+
+def tumblersub(a, b):
+    if b[2][0] == 0:
+        c = a
+    elif a == b:
+        c = ZERO
+    elif a[2][0] == 0:
+        c = (int(not b[0]), b[1], b[2])
+    else:
+        c = tumbleradd(a, (int(not b[0]), b[1], b[2]))
+    return justify(c)
+
+def tumblerintdiff(a, b):
+    return _signed(tumblersub(a, b)[2][0])
+
+def tumblerincrement(a, rightshift, bint):
+    if a[2][0] == 0:
+        return (0, -rightshift, ((bint & DIGITMASK),) + NOPLACES[1:])
+    mant = list(a[2])
+    idx = NPLACES - 1
+    while mant[idx] == 0 and idx > 0:
+        idx -= 1
+    if idx + rightshift >= NPLACES:
+        raise EnfiladeError("tumblerincrement overflow")
+    if idx + rightshift < 0:
+        # C writes into the header word before the mantissa
+        return _justify(a[0], a[1], a[2])
+    mant[idx + rightshift] = (mant[idx + rightshift] + bint) & DIGITMASK
+    return _justify(a[0], a[1], tuple(mant))
+
+def tumblertruncate(a, bint):
+    i = a[1]
+    while i < 0 and bint > 0:
+        i += 1
+        bint -= 1
+    if bint <= 0:
+        return ZERO
+    mant = a[2][:bint] + (0,) * (NPLACES - bint) if bint < NPLACES else a[2]
+    return _justify(a[0], a[1], mant)
+
+def prefixtumbler(a, bint):
+    temp1 = (0, 0, (bint & DIGITMASK,) + NOPLACES[1:])
+    temp2 = a if a[2][0] == 0 else (a[0], a[1] - 1, a[2])
+    return tumbleradd(temp1, temp2)
+
+def beheadtumbler(a):
+    mant = a[2]
+    if a[1] == 0:
+        mant = (0,) + mant[1:]
+    return _justify(a[0], a[1] + 1, mant)
+
+def tumbleraccounteq(a, acct):
+    if a[0] != acct[0]:
+        return False
+    zeros = 0
+    for i in range(NPLACES):
+        if acct[2][i] == 0:
+            zeros += 1
+            if zeros == 2:
+                return True
+        elif a[2][i] != acct[2][i]:
+            return False
+    return True
+
+def docidandvstream2tumbler(docid, vstream):
+    mant = list(docid[2])
+    i = NPLACES - 1
+    while i >= 0:
+        if mant[i]:
+            i += 1
+            break
+        i -= 1
+    j = 0
+    while i < NPLACES - 1 and j < NPLACES:
+        i += 1
+        mant[i] = vstream[2][j]
+        j += 1
+    return (docid[0], docid[1], tuple(mant))
+
+# ================================================================== CRUMS
+
+# enfilade types
+(GRAN, POOM, SPAN) = (1, 2, 3)
+
+# dimensions: the granfilade has one, POOMs and the spanfilade have two
+WIDTH = 0
+(I, V) = (0, 1)
+(ORGLRANGE, SPANRANGE) = (0, 1)
+
+# granfilade bottom crum contents
+(GRANNULL, GRANTEXT, GRANORGL) = (0, 1, 2)
+GRANCLEARLYILLEGALINFO = 42
+GRANTEXTLENGTH = 950
+
+# loaf sizes
+MAXUCINLOAF = 6
+MAXBCINLOAF = 1
+MAX2DBCINLOAF = 4
+
+# adopt relatives
+(LEFTMOSTSON, RIGHTMOSTSON, LEFTBRO, RIGHTBRO) = (0, 1, 2, 3)
+SON = LEFTMOSTSON
+
+
+class Crum:
+    """A node of an enfilade.  Upper crums keep their sons in a list;
+    bottom crums carry the granfilade or 2D bottom crum info."""
+
+    __slots__ = ("height", "enftype", "isapex", "father", "sons",
+                 "dsp", "wid", "infotype", "text", "orgl", "homedoc")
+
+    def __init__(self, height, enftype):
+        self.height = height
+        self.enftype = enftype
+        self.isapex = False
+        self.father = None
+        self.sons = []
+        nstreams = 1 if enftype == GRAN else 2
+        self.dsp = [ZERO] * nstreams
+        self.wid = [ZERO] * nstreams
+        self.infotype = GRANCLEARLYILLEGALINFO
+        self.text = ""
+        self.orgl = None
+        self.homedoc = ZERO
+
+    def __repr__(self):
+        return "<Crum h%d e%d wid %s dsp %s>" % (
+            self.height, self.enftype,
+            "/".join(map(tumblerstr, self.wid)),
+            "/".join(map(tumblerstr, self.dsp)))
+
+
+def createenf(enftype):
+    """Create an empty enfilade: an apex over a single bottom crum."""
+    fullcrum = Crum(1, enftype)
+    fullcrum.isapex = True
+    bottom = Crum(0, enftype)
+    adopt(bottom, SON, fullcrum)
+    if enftype == GRAN:
+        bottom.infotype = GRANNULL
+    return fullcrum
+
+def lockadd(a, b):
+    return [tumbleradd(x, y) for x, y in zip(a, b)]
+
+def locksub(a, b):
+    return [tumblersub(x, y) for x, y in zip(a, b)]
+
+def iszerolock(lock):
+    for t in lock:
+        if t[2][0]:
+            return False
+    return True
+
+def prologuend(ptr, offset):
+    """Return the grasp of a crum given its father's grasp."""
+    return lockadd(offset, ptr.dsp)
+
+# ------------------------------------------------------------- family tree
+def findfather(ptr):
+    return None if ptr.isapex else ptr.father
+
+def findfullcrum(ptr):
+    while not ptr.isapex:
+        ptr = ptr.father
+    return ptr
+
+def rightbro(ptr):
+    father = ptr.father
+    if ptr.isapex or father is None:
+        return None
+    sons = father.sons
+    index = _sonindex(sons, ptr) + 1
+    return sons[index] if index < len(sons) else None
+
+def _sonindex(sons, ptr):
+    for i, son in enumerate(sons):
+        if son is ptr:
+            return i
+    raise EnfiladeError("crum is not among its father's sons")
+
+def _sonlimit(ptr):
+    if ptr.height > 1:
+        return MAXUCINLOAF
+    return MAXBCINLOAF if ptr.enftype == GRAN else MAX2DBCINLOAF
+
+def toomanysons(ptr):
+    return len(ptr.sons) > _sonlimit(ptr)
+
+def roomformoresons(ptr):
+    return len(ptr.sons) < _sonlimit(ptr)
+
+def adopt(new, relative, old):
+    """Link a crum (and its subtree) into the family containing old."""
+    if new is old:
+        raise EnfiladeError("adopt with both crums same")
+    new.enftype = old.enftype
+    if relative in (LEFTMOSTSON, RIGHTMOSTSON):
+        father = old
+        index = 0 if relative == LEFTMOSTSON else len(father.sons)
+    else:
+        if new.height != old.height:
+            raise EnfiladeError("adopt height mismatch")
+        father = findfather(old)
+        if father is None:
+            raise EnfiladeError("adopt without a father")
+        index = _sonindex(father.sons, old)
+        if relative == RIGHTBRO:
+            index += 1
+    if father.height != new.height + 1:
+        raise EnfiladeError("height mismatch in adopt")
+    father.sons.insert(index, new)
+    new.father = father
+
+def disown(ptr):
+    """Remove a crum from its father; it keeps its own sons."""
+    if ptr.isapex or ptr.father is None:
+        raise EnfiladeError("disown called without a father")
+    sons = ptr.father.sons
+    del sons[_sonindex(sons, ptr)]
+    ptr.father = None
+
+def levelpush(fullcrum):
+    """Grow the tree by one level under the apex."""
+    if not fullcrum.isapex:
+        raise EnfiladeError("levelpush not called with fullcrum")
+    new = Crum(fullcrum.height, fullcrum.enftype)
+    if fullcrum.height:
+        new.sons = fullcrum.sons
+        for son in new.sons:
+            son.father = new
+        fullcrum.sons = []
+    fullcrum.height += 1
+    adopt(new, SON, fullcrum)
+    setwispupwards(new)
+
+# ------------------------------------------------------------------- wisps
+def setwispupwards(ptr):
+    """Recompute wisps from ptr towards the apex while they change."""
+    changed = True
+    ntimes = 0
+    while changed and ptr is not None:
+        father = findfather(ptr)
+        changed = setwisp(ptr)
+        if changed:
+            ntimes += 1
+        ptr = father
+    return ntimes != 0
+
+def setwisp(ptr):
+    if ptr.height == 0:
+        return False
+    if ptr.enftype == GRAN:
+        return setwidseq(ptr)
+    return setwispnd(ptr)
+
+def setwidseq(father):
+    total = ZERO
+    for son in father.sons:
+        total = tumbleradd(total, son.wid[0])
+    if total == father.wid[0]:
+        return False
+    father.wid = [total]
+    return True
+
+def setwispnd(father):
+    sons = father.sons
+    if not sons:
+        father.dsp = [ZERO, ZERO]
+        father.wid = [ZERO, ZERO]
+        return True
+    mindsp = list(sons[0].dsp)
+    for son in sons[1:]:
+        for i in (0, 1):
+            if tumblercmp(mindsp[i], son.dsp[i]) != LESS:
+                mindsp[i] = son.dsp[i]
+    changed = not iszerolock(mindsp)
+    if changed:
+        newdsp = lockadd(father.dsp, mindsp)
+    else:
+        newdsp = father.dsp
+    newwid = [ZERO, ZERO]
+    for son in sons:
+        if changed:
+            son.dsp = locksub(son.dsp, mindsp)
+        reach = lockadd(son.dsp, son.wid)
+        for i in (0, 1):
+            if tumblercmp(newwid[i], reach[i]) != GREATER:
+                newwid[i] = reach[i]
+    if not changed and newwid != father.wid:
+        changed = True
+    if not changed:
+        return False
+    father.dsp = list(newdsp)
+    father.wid = newwid
+    return True
+
+def setwidnd(father):
+    """Reset the father's wid but leave its dsp alone.  As in wisp.c the
+    running maximum is cleared for every son, so the last son wins."""
+    if not father.sons:
+        return
+    newwid = list(father.sons[-1].wid)
+    for i in (0, 1):
+        if tumblercmp(ZERO, newwid[i]) == GREATER:
+            newwid[i] = ZERO
+    if newwid != father.wid:
+        father.wid = newwid
+
+def _replaced(lock, i, t):
+    lock = list(lock)
+    lock[i] = t
+    return lock
+
+def makeroomonleftnd(father, offset, origin):
+    """Widen a crum leftwards so that it reaches back to origin;
+    returns the father's (possibly new) grasp."""
+    grasp = prologuend(father, offset)
+    for i in (0, 1):
+        if tumblercmp(origin[i], grasp[i]) == LESS:
+            base = tumblersub(grasp[i], origin[i])
+            father.dsp = _replaced(father.dsp, i,
+                                   tumblersub(origin[i], offset[i]))
+            father.wid = _replaced(father.wid, i,
+                                   tumbleradd(base, father.wid[i]))
+            for son in father.sons:
+                son.dsp = _replaced(son.dsp, i, tumbleradd(base, son.dsp[i]))
+            grasp = prologuend(father, offset)
+    return grasp
+
+# ------------------------------------------------------------------- split
+def splitcrumupwards(father):
+    if father.height <= 0:
+        raise EnfiladeError("splitcrumupwards on bottom crum")
+    splitsomething = False
+    while toomanysons(father):
+        if father.isapex:
+            levelpush(father)
+            splitcrum(father.sons[0])
+            return True
+        splitcrum(father)
+        splitsomething = True
+        father = findfather(father)
+    return splitsomething
+
+def splitcrum(father):
+    if father.enftype == GRAN:
+        splitcrumseq(father)
+    elif father.enftype == POOM:
+        _peelgreatest(father, lambda crum: crum.dsp[SPANRANGE])
+    else:
+        _peelgreatest(father,
+                      lambda crum: tumbleradd(crum.dsp[0], crum.dsp[1]))
+    setwispupwards(father)
+
+def splitcrumseq(father):
+    new = Crum(father.height, father.enftype)
+    adopt(new, RIGHTBRO, father)
+    for i in range(len(father.sons) // 2):
+        ptr = father.sons[-1]
+        disown(ptr)
+        adopt(ptr, LEFTMOSTSON, new)
+    setwispupwards(father)
+    setwispupwards(new)
+
+def _peelgreatest(father, key):
+    correctone = father.sons[0]
+    correctkey = key(correctone)
+    for ptr in father.sons:
+        ptrkey = key(ptr)
+        if tumblercmp(ptrkey, correctkey) == GREATER:
+            correctone, correctkey = ptr, ptrkey
+    peelcrumoffnd(correctone)
+
+def peelcrumoffnd(ptr):
+    if ptr.isapex:
+        raise EnfiladeError("peelcrumoffnd called with fullcrum")
+    father = findfather(ptr)
+    disown(ptr)
+    new = Crum(father.height, father.enftype)
+    adopt(new, RIGHTBRO, father)
+    new.dsp = list(father.dsp)
+    adopt(ptr, LEFTMOSTSON, new)
+    setwispupwards(father)
+    setwispupwards(new)
+    setwispupwards(ptr)
+
+# --------------------------------------------------------------- recombine
+def recombine(father):
+    if father.enftype == GRAN:
+        recombineseq(father)
+    else:
+        recombinend(father)
+
+def recombineseq(father):
+    if father.height < 3 or not roomformoresons(father):
+        return
+    for son in list(father.sons):
+        recombineseq(son)
+    sons = father.sons
+    for i in range(len(sons) - 1):
+        ptr, bro = sons[i], sons[i + 1]
+        if ptr.sons and roomformoresons(ptr) and bro.sons:
+            if len(ptr.sons) + len(bro.sons) <= MAXUCINLOAF:
+                _eatbrossubtreeseq(ptr, bro)
+            else:
+                _takeovernephewsseq(ptr, bro)
+            break
+
+def _takeovernephewsseq(me, bro):
+    while bro.sons and roomformoresons(me):
+        ptr = bro.sons[0]
+        disown(ptr)
+        adopt(ptr, RIGHTMOSTSON, me)
+    setwispupwards(bro)
+    setwispupwards(me)
+
+def _eatbrossubtreeseq(me, bro):
+    for son in bro.sons:
+        son.father = me
+    me.sons.extend(bro.sons)
+    bro.sons = []
+    disown(bro)
+    setwispupwards(me)
+
+def recombinend(father):
+    if father.height < 2:
+        return
+    for son in list(father.sons):
+        recombinend(son)
+    sons = getorderedsons(father)
+    n = len(sons)
+    for i in range(n - 1):
+        j = i + 1
+        while sons[i] is not None and j < n:
+            if sons[j] is not None and _ishouldbother(sons[i], sons[j]):
+                _takeovernephewsnd(sons, i, j)
+            j += 1
+
+def _ishouldbother(dest, src):
+    limit = MAXUCINLOAF if dest.height > 1 else MAX2DBCINLOAF
+    return len(dest.sons) + len(src.sons) <= limit
+
+def _takeovernephewsnd(sons, i, j):
+    me, bro = sons[i], sons[j]
+    if not me.sons or not bro.sons:
+        return False
+    if len(me.sons) + len(bro.sons) <= MAXUCINLOAF:
+        _eatbrossubtreend(me, bro)
+        sons[j] = None
+        return True
+    ret = False
+    for nephew in getorderedsons(bro):
+        if not roomformoresons(me):
+            break
+        _takenephewnd(me, nephew)
+        ret = True
+    if bro.sons:
+        setwispupwards(bro)
+    else:
+        disown(bro)
+        sons[j] = None
+    setwispupwards(me)
+    return ret
+
+def _eatbrossubtreend(me, bro):
+    makeroomonleftnd(me, [ZERO, ZERO], bro.dsp)
+    for nephew in bro.sons:
+        nephew.dsp = locksub(lockadd(bro.dsp, nephew.dsp), me.dsp)
+        nephew.father = me
+    me.sons.extend(bro.sons)
+    bro.sons = []
+    for son in me.sons:
+        setwisp(son)
+    oldfather = findfather(bro)
+    disown(bro)
+    setwispupwards(me)
+    setwispupwards(oldfather)
+
+def _takenephewnd(me, nephew):
+    bro = nephew.father
+    disown(nephew)
+    nephew.dsp = lockadd(bro.dsp, nephew.dsp)
+    adopt(nephew, RIGHTMOSTSON, me)
+    # recombine.c passes an uninitialised offset here; zero is assumed.
+    makeroomonleftnd(me, [ZERO, ZERO], nephew.dsp)
+    nephew.dsp = locksub(nephew.dsp, me.dsp)
+    if not bro.sons:
+        disown(bro)
+    else:
+        setwispupwards(bro)
+    setwispupwards(me)
+
+def getorderedsons(father):
+    """The sons sorted along the diagonal with recombine.c's shellsort."""
+    v = list(father.sons)
+    keys = [tumbleradd(son.dsp[0], son.dsp[1]) for son in v]
+    n = len(v)
+    gap = n // 2
+    while gap > 0:
+        for i in range(gap, n):
+            j = i - gap
+            while j >= 0 and tumblercmp(keys[j], keys[j + gap]) == GREATER:
+                v[j], v[j + gap] = v[j + gap], v[j]
+                keys[j], keys[j + gap] = keys[j + gap], keys[j]
+                j -= gap
+        gap //= 2
+    return v
+
+# ==================================================================== CUTS
+
+def whereoncrum(ptr, offset, address, index):
+    """Classify an address against a crum whose father's grasp is offset."""
+    if ptr.enftype == GRAN:
+        left = offset[WIDTH]
+        right = tumbleradd(left, ptr.wid[WIDTH])
+    else:
+        left = tumbleradd(offset[index], ptr.dsp[index])
+        cmp = tumblercmp(address, left)
+        if cmp == LESS:
+            return TOMYLEFT
+        if cmp == EQUAL:
+            return ONMYLEFTBORDER
+        right = tumbleradd(left, ptr.wid[index])
+        cmp = tumblercmp(address, right)
+        if cmp == LESS:
+            return THRUME
+        if cmp == EQUAL:
+            return ONMYRIGHTBORDER
+        return TOMYRIGHT
+    return intervalcmp(left, right, address)
+
+
+class Knives:
+    """The blades of a cut along one dimension."""
+
+    def __init__(self, blades, dimension):
+        self.blades = list(blades)
+        self.dimension = dimension
+
+
+def _crumiscut(ptr, offset, knives):
+    for blade in knives.blades:
+        if whereoncrum(ptr, offset, blade, knives.dimension) == THRUME:
+            return True
+    return False
+
+def _crumiscutbyithknife(ptr, offset, knives, i):
+    return whereoncrum(ptr, offset, knives.blades[i],
+                       knives.dimension) == THRUME
+
+def _sonsarecut(ptr, offset, knives):
+    grasp = prologuend(ptr, offset)
+    for son in ptr.sons:
+        if _crumiscut(son, grasp, knives):
+            return True
+    return False
+
+def makecutsnd(fullcrum, knives):
+    """Slice the bottom crums so that no crum straddles a blade."""
+    zero = [ZERO, ZERO]
+    _makecutsdownnd(fullcrum, zero, knives)
+    fullcrum = findfullcrum(fullcrum)
+    while _sonsarecut(fullcrum, zero, knives):
+        _makecutsdownnd(fullcrum, zero, knives)
+        fullcrum = findfullcrum(fullcrum)
+
+def _makecutsdownnd(fullcrum, offset, knives):
+    _makecutsbackuptohere(fullcrum, offset, knives)
+    if toomanysons(fullcrum):
+        if fullcrum.isapex:
+            levelpush(fullcrum)
+        makecutsnd(fullcrum, knives)
+
+def _makecutsbackuptohere(ptr, offset, knives):
+    if ptr.height == 0:
+        for i, blade in enumerate(knives.blades):
+            if whereoncrum(ptr, offset, blade, knives.dimension) == THRUME:
+                new = Crum(ptr.height, ptr.enftype)
+                if ptr.enftype == GRAN:
+                    new.infotype = ptr.infotype
+                _slicecbcpm(ptr, offset, new, blade, knives.dimension)
+        return
+    for i in range(len(knives.blades)):
+        _cutsons(ptr, offset, knives)
+        if ptr.isapex or not _crumiscutbyithknife(ptr, offset, knives, i):
+            continue
+        son = ptr.sons[0] if ptr.sons else None
+        while son is not None:
+            nextson = rightbro(son)
+            grasp = prologuend(ptr, offset)
+            _makeithcutonson(ptr, offset, son, grasp, knives, i)
+            if not _crumiscutbyithknife(ptr, offset, knives, i):
+                if not ptr.sons:
+                    return
+                break
+            son = nextson
+    if not ptr.isapex and toomanysons(ptr):
+        while toomanysons(ptr):
+            _peeloffcorrectson(ptr)
+        _makecutsbackuptohere(ptr, offset, knives)
+
+def _cutsons(ptr, offset, knives):
+    while _sonsarecut(ptr, offset, knives):
+        son = ptr.sons[0] if ptr.sons else None
+        while son is not None:
+            nextson = rightbro(son)
+            grasp = prologuend(ptr, offset)
+            while _crumiscut(son, grasp, knives):
+                _makecutsbackuptohere(son, grasp, knives)
+                grasp = prologuend(ptr, offset)
+            son = nextson
+
+def _makeithcutonson(ptr, offset, son, grasp, knives, i):
+    if not _crumiscutbyithknife(ptr, offset, knives, i):
+        return
+    where = whereoncrum(son, grasp, knives.blades[i], knives.dimension)
+    if where < THRUME:
+        _peelsoncorrectly(ptr, offset, son, knives, i)
+        if not _crumiscutbyithknife(ptr, offset, knives, i):
+            return
+        if not ptr.sons:
+            raise EnfiladeError("sons went away")
+    elif where == THRUME:
+        raise EnfiladeError("makecutsbackuptohere crum not cut")
+
+def _peelsoncorrectly(ptr, offset, son, knives, i):
+    """Put son in the leftmost uncle with room that is left of the cut."""
+    uncle = ptr.father.sons[0]
+    while uncle is not None:
+        if uncle is not ptr and roomformoresons(uncle):
+            if whereoncrum(uncle, offset, knives.blades[i],
+                           knives.dimension) <= THRUME:
+                _newpeelcrumoffnd(son, uncle)
+                return
+        uncle = rightbro(uncle)
+    uncle = Crum(ptr.height, ptr.enftype)
+    adopt(uncle, RIGHTBRO, ptr.father.sons[-1])
+    uncle.dsp = list(ptr.dsp)
+    _newpeelcrumoffnd(son, uncle)
+
+def _peeloffcorrectson(ptr):
+    if not toomanysons(ptr):
+        return
+    bro = rightbro(ptr)
+    if bro is not None:
+        if roomformoresons(bro):
+            _newpeelcrumoffnd(ptr.sons[0], bro)
+            return
+        # ndcuts.c walks off the end of the brother list here.
+        raise EnfiladeError("peeloffcorrectson found no room")
+    uncle = Crum(ptr.height, ptr.enftype)
+    adopt(uncle, RIGHTBRO, ptr)
+    uncle.dsp = list(ptr.dsp)
+    _newpeelcrumoffnd(ptr.sons[0], uncle)
+
+def _newpeelcrumoffnd(ptr, newuncle):
+    if not roomformoresons(newuncle):
+        raise EnfiladeError("no room for more sons for newuncle")
+    if ptr.isapex:
+        raise EnfiladeError("peelcrumoffnd called with fullcrum")
+    father = findfather(ptr)
+    origin = lockadd(father.dsp, ptr.dsp)
+    makeroomonleftnd(newuncle, [ZERO, ZERO], origin)
+    disown(ptr)
+    adopt(ptr, LEFTMOSTSON, newuncle)
+    ptr.dsp = locksub(lockadd(father.dsp, ptr.dsp), newuncle.dsp)
+    setwispupwards(ptr)
+    setwispupwards(newuncle)
+    setwispupwards(father)
+    if toomanysons(newuncle):
+        raise EnfiladeError("too many sons for newuncle")
+
+def _slicecbcpm(ptr, offset, new, cut, index):
+    grasp = prologuend(ptr, offset)
+    if whereoncrum(ptr, offset, cut, index) != THRUME:
+        raise EnfiladeError("Why are you trying to slice me?")
+    for wid in ptr.wid:
+        if not is1story(wid):
+            raise EnfiladeError("Not one story in POOM wid")
+    localcut = tumblersub(cut, grasp[index])
+    if localcut[1] != ptr.wid[index][1] or not is1story(localcut):
+        raise EnfiladeError("Oh well, I thought I understood this")
+    if tumblerlength(cut) != tumblerlength(ptr.wid[index]):
+        raise EnfiladeError("level mismatch")
+    newwid = [_justify(w[0], w[1], (localcut[2][0],) + w[2][1:])
+              for w in ptr.wid]
+    new.wid = locksub(ptr.wid, newwid)
+    ptr.wid = newwid
+    new.dsp = lockadd(ptr.dsp, ptr.wid)
+    new.homedoc = ptr.homedoc
+    adopt(new, RIGHTBRO, ptr)
+
+# ================================================================ 2D EDITS
+
+def insertnd(fullcrum, origin, width, homedoc, index):
+    """Insert a bottom crum into a POOM or the spanfilade."""
+    oldheight = fullcrum.height
+    if width[index][2][0] == 0:
+        raise EnfiladeError("zero width in insertnd")
+    if fullcrum.enftype == POOM:
+        _makegappm(fullcrum, origin, width)
+        setwispupwards(fullcrum)
+    bothertorecombine = _doinsertnd(fullcrum, origin, width, homedoc, index)
+    setwispupwards(fullcrum)
+    if bothertorecombine or fullcrum.height != oldheight:
+        recombine(fullcrum)
+
+def _makegappm(fullcrum, origin, width):
+    grasp = list(fullcrum.dsp)
+    reach = lockadd(grasp, fullcrum.wid)
+    if (fullcrum.wid[V][2][0] == 0
+            or tumblercmp(origin[V], grasp[V]) == LESS
+            or tumblercmp(origin[V], reach[V]) != LESS):
+        return
+    blade0 = origin[V]
+    blade1 = tumblerincrement(blade0, -1, 1)
+    intpart = beheadtumbler(blade0)
+    blade1 = tumblerincrement(blade1, 0, -tumblerintdiff(intpart, ZERO))
+    blade1 = tumblerincrement(blade1, 1, 1)
+    knives = Knives([blade0, blade1], V)
+    makecutsnd(fullcrum, knives)
+    fgrasp = list(fullcrum.dsp)
+    for ptr in list(fullcrum.sons):
+        section = _insertcutsectionnd(ptr, fgrasp, knives)
+        if section == -1:
+            raise EnfiladeError("makegappm can't classify crum")
+        if section == 1:
+            ptr.dsp = _replaced(ptr.dsp, V, tumbleradd(ptr.dsp[V], width[V]))
+    setwidnd(fullcrum)
+
+def _insertcutsectionnd(ptr, offset, knives):
+    if len(knives.blades) == 2:
+        cmp = whereoncrum(ptr, offset, knives.blades[1], knives.dimension)
+        if cmp == THRUME:
+            return -1
+        if cmp <= ONMYLEFTBORDER:
+            return 2
+    cmp = whereoncrum(ptr, offset, knives.blades[0], knives.dimension)
+    if cmp == THRUME:
+        return -1
+    if cmp <= ONMYLEFTBORDER:
+        return 1
+    return 0
+
+def _cutsection(ptr, offset, knives):
+    """Which between-cut slice a crum is in (delete and rearrange)."""
+    for i in range(len(knives.blades) - 1, -1, -1):
+        cmp = whereoncrum(ptr, offset, knives.blades[i], knives.dimension)
+        if cmp == THRUME:
+            return -1
+        if cmp <= ONMYLEFTBORDER:
+            return i + 1
+    return 0
+
+def isemptyenfilade(fullcrum):
+    if fullcrum.enftype == GRAN:
+        return iszerolock(fullcrum.wid)
+    return iszerolock(fullcrum.wid) and iszerolock(fullcrum.dsp)
+
+def _doinsertnd(father, origin, width, homedoc, index):
+    if width[index][2][0] == 0:
+        raise EnfiladeError("zero width in doinsertnd")
+    if isemptyenfilade(father):
+        _firstinsertionnd(father, origin, width, homedoc)
+        return False
+    return _insertmorend(father, [ZERO, ZERO], origin, width, homedoc, index)
+
+def _firstinsertionnd(father, origin, width, homedoc):
+    if father.sons:
+        ptr = father.sons[0]
+    else:
+        ptr = Crum(0, father.enftype)
+        adopt(ptr, SON, father)
+    ptr.dsp = list(origin)
+    ptr.wid = list(width)
+    ptr.homedoc = homedoc
+    setwisp(father)
+
+def _insertmorend(father, offset, origin, width, homedoc, index):
+    grasp = makeroomonleftnd(father, offset, origin)
+    if father.height == 1:
+        return _insertcbcnd(father, grasp, origin, width, homedoc)
+    ptr = _findsontoinsertundernd(father, grasp, origin, width, index)
+    temp = _insertmorend(ptr, grasp, origin, width, homedoc, index)
+    setwispupwards(father)
+    return temp
+
+def _insertcbcnd(father, grasp, origin, width, homedoc):
+    for ptr in father.sons:
+        if ptr.homedoc == homedoc and \
+                lockadd(prologuend(ptr, grasp), ptr.wid) == list(origin):
+            ptr.wid = lockadd(ptr.wid, width)
+            setwispupwards(father)
+            if not father.isapex:
+                return setwispupwards(findfather(father))
+            return False
+    new = Crum(0, father.enftype)
+    adopt(new, SON, father)
+    new.dsp = locksub(origin, grasp)
+    if iszerolock(width):
+        raise EnfiladeError("zero width in insertnd")
+    new.wid = list(width)
+    new.homedoc = homedoc
+    setwispupwards(new)
+    setwispupwards(father)
+    return splitcrumupwards(father)
+
+def _findsontoinsertundernd(father, grasp, origin, width, index):
+    spanend = tumbleradd(origin[index], width[index])
+    nearestonleft = father.sons[0]
+    for ptr in father.sons:
+        sonstart = tumbleradd(grasp[index], ptr.dsp[index])
+        if tumblercmp(sonstart, origin[index]) != GREATER and \
+                tumblercmp(ptr.dsp[index],
+                           nearestonleft.dsp[index]) != LESS:
+            nearestonleft = ptr
+        if whereoncrum(ptr, grasp, origin[index], index) >= ONMYLEFTBORDER \
+                and whereoncrum(ptr, grasp, spanend, index) \
+                <= ONMYRIGHTBORDER:
+            return ptr
+    return nearestonleft
+
+def deletend(fullcrum, origin, width, index):
+    """Remove everything between origin and origin + width."""
+    knives = Knives([origin, tumbleradd(origin, width)], index)
+    makecutsnd(fullcrum, knives)
+    fgrasp = list(fullcrum.dsp)
+    for ptr in list(fullcrum.sons):
+        section = _cutsection(ptr, fgrasp, knives)
+        if section == -1:
+            raise EnfiladeError("deletend can't classify crum")
+        if section == 1:
+            disown(ptr)
+        elif section == 2:
+            ptr.dsp = _replaced(ptr.dsp, index,
+                                tumblersub(ptr.dsp[index], width))
+    setwispupwards(fullcrum)
+    recombine(fullcrum)
+
+def rearrangend(fullcrum, cuts, index):
+    """Transpose the regions between three or four cuts."""
+    knives = Knives(cuts, index)
+    _sortknives(knives)
+    diff = _makeoffsetsfor3or4cuts(knives)
+    makecutsnd(fullcrum, knives)
+    fgrasp = list(fullcrum.dsp)
+    for ptr in list(fullcrum.sons):
+        section = _cutsection(ptr, fgrasp, knives)
+        if section == -1:
+            raise EnfiladeError("rearrangend can't classify crum")
+        if section in (1, 2, 3):
+            ptr.dsp = _replaced(ptr.dsp, index,
+                                tumbleradd(ptr.dsp[index], diff[section]))
+    setwispupwards(fullcrum)
+    recombine(fullcrum)
+    splitcrumupwards(fullcrum)
+
+def _sortknives(knives):
+    blades = knives.blades
+    for i in range(len(blades) - 1):
+        if tumblercmp(blades[i], blades[i + 1]) == GREATER:
+            blades[i], blades[i + 1] = blades[i + 1], blades[i]
+
+def _makeoffsetsfor3or4cuts(knives):
+    b = knives.blades
+    diff = [ZERO] * 4
+    if len(b) == 4:
+        diff[1] = tumblersub(b[2], b[0])
+        diff[2] = tumblersub(tumblersub(b[3], b[2]), tumblersub(b[1], b[0]))
+        diff[3] = (int(not diff[1][0]), diff[1][1], diff[1][2])
+    elif len(b) == 3:
+        diff[1] = tumblersub(b[2], b[1])
+        d2 = tumblersub(b[1], b[0])
+        diff[2] = (int(not d2[0]), d2[1], d2[2])
+    else:
+        raise EnfiladeError("Wrong number of cuts.")
+    return diff
+
+# =============================================================== CONTEXTS
+
+class Context:
+    """A bottom crum found by a retrieve, with its absolute position."""
+
+    __slots__ = ("enftype", "totaloffset", "wid", "infotype", "text",
+                 "orgl", "homedoc")
+
+    def __init__(self, crum, offset):
+        self.enftype = crum.enftype
+        if crum.enftype == GRAN:
+            self.totaloffset = list(offset)
+        else:
+            self.totaloffset = lockadd(offset, crum.dsp)
+        self.wid = list(crum.wid)
+        self.infotype = crum.infotype
+        self.text = crum.text
+        self.orgl = crum.orgl
+        self.homedoc = crum.homedoc
+
+    def where(self, address, index):
+        left = self.totaloffset[index]
+        return intervalcmp(left, tumbleradd(left, self.wid[index]), address)
+
+
+def retrieverestricted(fullcrum, span1, index1, span2, index2):
+    """Find the bottom crums of a 2D enfilade within span1 x span2.
+    Either span may be None for no restriction on that dimension."""
+    if span1:
+        span1start, span1end = span1[0], tumbleradd(span1[0], span1[1])
+    else:
+        span1start = span1end = ZERO
+    if span2:
+        span2start, span2end = span2[0], tumbleradd(span2[0], span2[1])
+    else:
+        span2start = span2end = ZERO
+    contexts = []
+    _findcbcinarea2d([fullcrum], [ZERO, ZERO], span1start, span1end, index1,
+                     span2start, span2end, index2, contexts)
+    return contexts
+
+def _findcbcinarea2d(crums, offset, span1start, span1end, index1,
+                     span2start, span2end, index2, contexts):
+    for crum in crums:
+        if not _crumqualifies2d(crum, offset, span1start, span1end, index1,
+                                span2start, span2end, index2):
+            continue
+        if crum.height != 0:
+            _findcbcinarea2d(crum.sons, lockadd(offset, crum.dsp),
+                             span1start, span1end, index1,
+                             span2start, span2end, index2, contexts)
+        else:
+            _incontextlistnd(contexts, Context(crum, offset), index1)
+
+def _crumqualifies2d(crum, offset, span1start, span1end, index1,
+                     span2start, span2end, index2):
+    if span1end[2][0] == 0:
+        endcmp = TOMYRIGHT
+    else:
+        endcmp = whereoncrum(crum, offset, span1end, index1)
+    if endcmp <= ONMYLEFTBORDER:
+        return False
+    if whereoncrum(crum, offset, span1start, index1) > THRUME:
+        return False
+    if span2end[2][0] == 0:
+        endcmp = TOMYRIGHT
+    else:
+        endcmp = whereoncrum(crum, offset, span2end, index2)
+    if endcmp < ONMYLEFTBORDER:
+        return False
+    if whereoncrum(crum, offset, span2start, index2) > THRUME:
+        return False
+    return True
+
+def _incontextlistnd(contexts, c, index):
+    """Put c on the list in index order, as context.c does."""
+    grasp = c.totaloffset[index]
+    if not contexts:
+        contexts.append(c)
+        return
+    if contexts[0].where(grasp, index) < THRUME:
+        contexts.insert(0, c)
+        return
+    for k in range(len(contexts) - 1):
+        if contexts[k].where(grasp, index) > ONMYLEFTBORDER and \
+                contexts[k + 1].where(grasp, index) < ONMYLEFTBORDER:
+            contexts.insert(k + 1, c)
+            return
+    contexts.append(c)
+
+def context2span(context, restriction, idx1, idx2):
+    """Clip a context to a restriction span along idx1 and return the
+    corresponding (stream, width) along idx2."""
+    lowerbound = restriction[0]
+    upperbound = tumbleradd(lowerbound, restriction[1])
+    grasp = list(context.totaloffset)
+    reach = lockadd(grasp, context.wid)
+    if tumblercmp(grasp[idx1], lowerbound) == LESS:
+        grasp[idx2] = tumblerincrement(
+            grasp[idx2], 0, tumblerintdiff(lowerbound, grasp[idx1]))
+    if tumblercmp(reach[idx1], upperbound) == GREATER:
+        reach[idx2] = tumblerincrement(
+            reach[idx2], 0, -tumblerintdiff(reach[idx1], upperbound))
+    return (grasp[idx2], tumblersub(reach[idx2], grasp[idx2]))
+
+# ============================================================= GRANFILADE
+
+def findcbcseqcrum(fullcrum, address):
+    """Find the granfilade bottom crum containing address; returns the
+    crum and its offset."""
+    crums = [fullcrum]
+    offset = ZERO
+    while True:
+        last = len(crums) - 1
+        for k, ptr in enumerate(crums):
+            if k == last or whereoncrum(ptr, [offset], address,
+                                        WIDTH) <= THRUME:
+                break
+            offset = tumbleradd(offset, ptr.wid[WIDTH])
+        if ptr.height == 0:
+            return ptr, offset
+        crums = ptr.sons
+
+def isaexistsgr(granf, isa):
+    crum, offset = findcbcseqcrum(granf, isa)
+    return offset == isa
+
+def fetchorglgr(granf, address):
+    """Return the POOM of the orgl at address, or None."""
+    if tumblercmp(granf.wid[WIDTH], address) == LESS:
+        return None
+    crum, offset = findcbcseqcrum(granf, address)
+    if offset != address:
+        return None
+    if crum.infotype != GRANORGL:
+        raise EnfiladeError("I should have found an orgl in fetchorglgr")
+    return crum.orgl
+
+def findpreviousisagr(crum, upperbound, offset=ZERO):
+    """Return the last address in use below upperbound."""
+    while crum.height != 0:
+        sons = crum.sons
+        last = len(sons) - 1
+        for k, ptr in enumerate(sons):
+            where = whereoncrum(ptr, [offset], upperbound, WIDTH)
+            if where == THRUME or where == ONMYRIGHTBORDER or k == last:
+                crum = ptr
+                break
+            offset = tumbleradd(offset, ptr.wid[WIDTH])
+        else:
+            return offset
+    if crum.infotype == GRANTEXT:
+        offset = tumblerincrement(offset, 0, len(crum.text) - 1)
+    return offset
+
+def insertseq(granf, address, infotype, text="", orgl=None):
+    """Insert text or an orgl into the granfilade at address."""
+    ptr, offset = findcbcseqcrum(granf, address)
+    nextaddress = address
+    if infotype == GRANTEXT and ptr.infotype == GRANTEXT and \
+            len(ptr.text) < GRANTEXTLENGTH:
+        remainingroom = GRANTEXTLENGTH - len(ptr.text)
+        if remainingroom > len(text):
+            ptr.text += text
+            return
+        ptr.text += text[:remainingroom]
+        nextaddress = tumblerincrement(nextaddress, 0, remainingroom)
+        text = text[remainingroom:]
+    new = Crum(0, ptr.enftype)
+    adopt(new, RIGHTBRO, ptr)
+    splitsomething = splitcrumupwards(findfather(new))
+    new.infotype = infotype
+    new.text = text
+    new.orgl = orgl
+    if ptr.wid[WIDTH][2][0] == 0:
+        new.wid = [ZERO]
+        ptr.wid = [tumblersub(nextaddress, offset)]
+    else:
+        reach = tumbleradd(offset, ptr.wid[WIDTH])
+        new.wid = [tumblersub(reach, nextaddress)]
+        ptr.wid = [tumblersub(nextaddress, offset)]
+    setwispupwards(findfather(ptr))
+    setwispupwards(findfather(new))
+    if splitcrumupwards(findfather(ptr)):
+        splitsomething = True
+    if splitsomething:
+        recombine(granf)
+
+def retrieveinspan(granf, spanstart, spanend):
+    """Find the granfilade bottom crums overlapping [spanstart, spanend)."""
+    contexts = []
+    _findcbcinspanseq([granf], ZERO, spanstart, spanend, contexts)
+    if tumblercmp(spanend, granf.wid[WIDTH]) == GREATER:
+        contexts.append(_findlastcbcseq(granf))
+    return contexts
+
+def _findcbcinspanseq(crums, offset, spanstart, spanend, contexts):
+    localoffset = offset
+    for crum in crums:
+        if _crumintersectsspanseq(crum, localoffset, spanstart, spanend):
+            if crum.height == 0:
+                # retrie.c uses the first brother's offset here
+                contexts.append(Context(crum, [offset]))
+            else:
+                _findcbcinspanseq(crum.sons, localoffset, spanstart,
+                                  spanend, contexts)
+        localoffset = tumbleradd(localoffset, crum.wid[WIDTH])
+
+def _crumintersectsspanseq(crum, offset, spanstart, spanend):
+    if crum.wid[WIDTH][2][0] == 0:
+        return False
+    return (whereoncrum(crum, [offset], spanstart, WIDTH) < ONMYRIGHTBORDER
+            and whereoncrum(crum, [offset], spanend, WIDTH)
+            > ONMYLEFTBORDER)
+
+def _findlastcbcseq(granf):
+    crums = [granf]
+    offset = ZERO
+    while True:
+        for crum in crums[:-1]:
+            offset = tumbleradd(offset, crum.wid[WIDTH])
+        ptr = crums[-1]
+        if ptr.height == 0:
+            return Context(ptr, [offset])
+        crums = ptr.sons
+
+# hint types and atom types for findisatoinsertgr
+(NODE, ACCOUNT, DOCUMENT, ATOM) = (1, 2, 3, 4)
+(TEXTATOM, LINKATOM) = (1, 2)
+
+def findisatoinsertgr(granf, supertype, subtype, atomtype, hintisa):
+    """Choose the address for a new object under hintisa, or None if an
+    atom is requested under an address that does not exist."""
+    if subtype == ATOM:
+        if not isaexistsgr(granf, hintisa):
+            return None
+        isa = _findisatoinsertmolecule(granf, atomtype, hintisa)
+    else:
+        isa = _findisatoinsertnonmolecule(granf, supertype, subtype, hintisa)
+    return justify(isa)
+
+def _findisatoinsertmolecule(granf, atomtype, hintisa):
+    upperbound = tumblerincrement(hintisa, 2, atomtype + 1)
+    lowerbound = findpreviousisagr(granf, upperbound)
+    if tumblerlength(hintisa) == tumblerlength(lowerbound):
+        isa = tumblerincrement(lowerbound, 2, atomtype)
+        return tumblerincrement(isa, 1, 1)
+    if atomtype == TEXTATOM:
+        return tumblerincrement(lowerbound, 0, 1)
+    if atomtype == LINKATOM:
+        isa = tumblerincrement(hintisa, 2, 2)
+        if tumblercmp(lowerbound, isa) == LESS:
+            return tumblerincrement(isa, 1, 1)
+        return tumblerincrement(lowerbound, 0, 1)
+    raise EnfiladeError("findisatoinsertmoleculegr")
+
+def _findisatoinsertnonmolecule(granf, supertype, subtype, hintisa):
+    depth = 1 if supertype == subtype else 2
+    hintlength = tumblerlength(hintisa)
+    upperbound = tumblerincrement(hintisa, depth - 1, 1)
+    lowerbound = findpreviousisagr(granf, upperbound)
+    if iszero(lowerbound) or \
+            tumblertruncate(lowerbound, hintlength) != hintisa:
+        return tumblerincrement(hintisa, depth, 1)
+    isa = tumblertruncate(lowerbound, hintlength + depth)
+    return tumblerincrement(
+        isa, depth if tumblerlength(isa) == hintlength else 0, 1)
+
+def inserttextgr(granf, hint, textset):
+    """Append a list of strings to the granfilade under hint, a
+    (supertype, subtype, atomtype, hintisa) tuple.  Returns the I-span
+    (stream, width) they occupy, or None."""
+    lsa = findisatoinsertgr(granf, *hint)
+    if lsa is None:
+        return None
+    spanorigin = lsa
+    for text in textset:
+        insertseq(granf, lsa, GRANTEXT, text=text)
+        lsa = tumblerincrement(lsa, 0, len(text))
+    return (spanorigin, tumblersub(lsa, spanorigin))
+
+def createorglgr(granf, hint):
+    """Create an empty POOM in the granfilade; returns its address."""
+    isa = findisatoinsertgr(granf, *hint)
+    if isa is None:
+        return None
+    insertseq(granf, isa, GRANORGL, orgl=createenf(POOM))
+    return isa
+
+def context2vtext(context, ispan):
+    """Return the part of a text context that lies within ispan."""
+    crumistart = context.totaloffset[WIDTH]
+    crumiend = tumblerincrement(crumistart, 0, len(context.text))
+    ispanend = tumbleradd(ispan[0], ispan[1])
+    i = 0
+    vtlength = len(context.text)
+    if tumblercmp(crumistart, ispan[0]) == LESS:
+        i = tumblerintdiff(ispan[0], crumistart)
+        vtlength -= i
+    if tumblercmp(crumiend, ispanend) == GREATER:
+        vtlength -= tumblerintdiff(crumiend, ispanend)
+    return context.text[i:i + abs(vtlength)]
+
+# =================================================================== DUMP
+
+def putnum(num):
+    return str(num)
+
+def puttumbler(t):
+    """Format a tumbler as puttumbler() in putfe.c does (sign dropped)."""
+    mant = t[2]
+    place = NPLACES - 1
+    while place > 0 and mant[place] == 0:
+        place -= 1
+    parts = [putnum(-t[1])]
+    for d in mant[:place + 1]:
+        parts.append(putnum(_signed(d)))
+    return ".".join(parts) + "~"
+
+def dumpnode(node, depth, out):
+    """Append the DUMPSTATE representation of a subtree to out."""
+    out.append("(%d~h%d~e%d~w%d~" % (depth, node.height, node.enftype,
+                                      len(node.wid)))
+    out.extend(puttumbler(t) for t in node.wid)
+    out.append("d%d~" % len(node.dsp))
+    out.extend(puttumbler(t) for t in node.dsp)
+    if node.height > 0:
+        out.append("c%d~" % len(node.sons))
+        for son in node.sons:
+            dumpnode(son, depth + 1, out)
+    else:
+        out.append("c0~")
+        if node.enftype == GRAN:
+            out.append("i%d~" % node.infotype)
+            if node.infotype == GRANTEXT:
+                out.append("t%d~" % len(node.text))
+                out.append(node.text)
+            elif node.infotype == GRANORGL:
+                if node.orgl is not None:
+                    out.append("o1~")
+                    dumpnode(node.orgl, depth + 1, out)
+                else:
+                    out.append("o0~")
+        else:
+            out.append("ih")
+            out.append(puttumbler(node.homedoc))
+    out.append(")~")
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""Differential fuzzer for two FEBE back-ends.
+
+Generates random but valid sequences of inserts, deletes, vcopies,
+pivots, swaps, links and versions from a seeded RNG and runs each one
+against two back-ends in lockstep, one XuSession on each.  After every
+operation its result and the text and V-spans of the documents it
+touched are compared; the sequence stops at the first difference.
+
+A sequence that diverges is shrunk, by removing operations (ddmin) and
+then shortening inserted text, to a small sequence that still diverges
+at the same kind of operation.  That sequence is written to --output as
+a scenario_* function ready to add to febe/scenarios, and the run goes
+on with the next seed.  Sequences are spread over --jobs worker
+processes, each with its own pair of back-ends, which are reset with
+RESETSTATE between sequences and restarted after a failure.
+
+A back-end is the path of a C back-end binary (started with --test-mode)
+or "loopback" for the in-process Python back-end (pybackend.py):
+
+    python fuzz_backends.py                       # C against loopback
+    python fuzz_backends.py --sequences 5000 --jobs 8 --length 60
+    python fuzz_backends.py --backend-b /path/to/other/backend --seed 1000
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+from client import (XuSession, XuConn, XuError, PipeStream, LoopbackStream,
+                    Address, Offset, Span, VSpec, SpecSet,
+                    READ_WRITE, CONFLICT_FAIL, LINK_TYPES, TYPE_NAMES)
+
+DEFAULT_ACCOUNT = Address(1, 1, 0, 1)
+
+# the whole text (1.x) and link (2.x) subspaces of a document
+WHOLE_DOCUMENT = Span(Address(1, 1), Offset(1))
+
+MAX_DOCUMENTS = 6
+MAX_LENGTH = 400
+ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+
+# relative frequency of each kind of operation
+WEIGHTS = {"create": 8, "insert": 30, "delete": 12, "vcopy": 12, "pivot": 6,
+           "swap": 6, "link": 10, "version": 6}
+
+
+# ------------------------------------------------------------- sequences
+#
+# An operation is a tuple naming documents by the order they were created
+# in and positions as character numbers from 1 (V-address 1.pos):
+#
+#   ("create",)                        ("insert", doc, pos, text)
+#   ("delete", doc, pos, width)        ("vcopy", doc, pos, from, start, width)
+#   ("pivot", doc, cut1, cut2, cut3)   ("swap", doc, cut1, cut2, cut3, cut4)
+#   ("link", home, from, start, width, to, start, width, type)
+#   ("version", doc)
+
+class Model:
+    """The text length of every document, for generating operations and
+    for skipping those a shrunk sequence has made invalid."""
+
+    def __init__(self):
+        self.lengths = []
+
+    def valid(self, op):
+        kind, args = op[0], op[1:]
+        if kind == "create":
+            return len(self.lengths) < MAX_DOCUMENTS
+        if not args or args[0] >= len(self.lengths):
+            return False
+        length = self.lengths[args[0]]
+        if kind == "insert":
+            return 1 <= args[1] <= length + 1 and length + len(args[2]) <= MAX_LENGTH
+        if kind == "delete":
+            return args[2] > 0 and 1 <= args[1] and args[1] + args[2] <= length + 1
+        if kind == "vcopy":
+            doc, pos, source, start, width = args
+            return (source < len(self.lengths) and 1 <= pos <= length + 1 and
+                    width > 0 and 1 <= start and
+                    start + width <= self.lengths[source] + 1 and
+                    length + width <= MAX_LENGTH)
+        if kind in ("pivot", "swap"):
+            cuts = args[1:]
+            return (all(a < b for a, b in zip(cuts, cuts[1:])) and
+                    cuts[0] >= 1 and cuts[-1] <= length + 1)
+        if kind == "link":
+            home, source, sstart, swidth, target, tstart, twidth, _ = args
+            return all(doc < len(self.lengths) and width > 0 and 1 <= start and
+                       start + width <= self.lengths[doc] + 1
+                       for doc, start, width in ((source, sstart, swidth),
+                                                 (target, tstart, twidth)))
+        if kind == "version":
+            return len(self.lengths) < MAX_DOCUMENTS
+        return False
+
+    def apply(self, op):
+        kind = op[0]
+        if kind == "create":
+            self.lengths.append(0)
+        elif kind == "insert":
+            self.lengths[op[1]] += len(op[3])
+        elif kind == "delete":
+            self.lengths[op[1]] -= op[3]
+        elif kind == "vcopy":
+            self.lengths[op[1]] += op[5]
+        elif kind == "version":
+            self.lengths.append(self.lengths[op[1]])
+
+
+def span_in(rng, length):
+    """A random (start, width) within a text of the given length."""
+    start = rng.randint(1, length)
+    return start, rng.randint(1, min(length - start + 1, 20))
+
+
+def generate(seed, length):
+    """A random valid sequence of operations."""
+    rng = random.Random(seed)
+    model = Model()
+    ops = []
+    while len(ops) < length:
+        kind = rng.choices(list(WEIGHTS), list(WEIGHTS.values()))[0]
+        if not model.lengths:
+            kind = "create"
+        docs = len(model.lengths)
+        doc = rng.randrange(max(docs, 1))
+        size = model.lengths[doc] if docs else 0
+        texts = [d for d in range(docs) if model.lengths[d]]
+        if kind == "create":
+            op = ("create",)
+        elif kind == "version":
+            op = ("version", doc)
+        elif kind == "insert":
+            n = rng.choice([1, 1, 2, 5, 10, 30])
+            op = ("insert", doc, rng.randint(1, size + 1),
+                  "".join(rng.choice(ALPHABET) for _ in range(n)))
+        elif not size:
+            continue
+        elif kind == "delete":
+            op = ("delete", doc) + span_in(rng, size)
+        elif kind == "vcopy":
+            source = rng.choice(texts)
+            op = ("vcopy", doc, rng.randint(1, size + 1), source) + \
+                 span_in(rng, model.lengths[source])
+        elif kind in ("pivot", "swap"):
+            ncuts = 3 if kind == "pivot" else 4
+            if size + 1 < ncuts:
+                continue
+            op = (kind, doc) + tuple(sorted(rng.sample(range(1, size + 2), ncuts)))
+        else:
+            source, target = rng.choice(texts), rng.choice(texts)
+            op = (("link", doc, source) + span_in(rng, model.lengths[source]) +
+                  (target,) + span_in(rng, model.lengths[target]) +
+                  (rng.randrange(len(LINK_TYPES)),))
+        if model.valid(op):
+            model.apply(op)
+            ops.append(op)
+    return ops
+
+
+# --------------------------------------------------------------- running
+
+def describe(value):
+    """A back-end's answer as plain data, for comparing and printing."""
+    if isinstance(value, (list, tuple)):
+        return [describe(item) for item in value]
+    if value is None or isinstance(value, (str, int)):
+        return value
+    return str(value)
+
+
+class Target:
+    """One back-end and the session on it."""
+
+    def __init__(self, spec, op_timeout):
+        self.spec = spec
+        self.op_timeout = op_timeout
+        self.stream = None
+        self.session = None
+
+    def start(self):
+        # a dropped PipeStream unlinks the FIFO name, which every stream in
+        # this process shares, so the old one must go before the new one
+        # makes its FIFO
+        self.stream = self.session = None
+        if self.spec == "loopback":
+            self.stream = LoopbackStream()
+        else:
+            self.stream = PipeStream(f"{self.spec} --test-mode 2>/dev/null")
+            # both ends are open, so the FIFO's name can go now rather
+            # than be left behind when the pool's workers are terminated
+            try:
+                os.unlink(self.stream.fifo)
+            except FileNotFoundError:
+                pass
+            self.stream.deadline = time.monotonic() + self.op_timeout
+        self.session = XuSession(XuConn(self.stream))
+        self.session.account(DEFAULT_ACCOUNT)
+        self.docs = []
+
+    def stop(self):
+        """Drop the session, killing a back-end that may be stuck."""
+        if self.session is None:
+            return
+        if isinstance(self.stream, PipeStream):
+            try:
+                os.kill(self.stream.inpipe._proc.pid, 9)
+            except OSError:
+                pass
+        try:
+            self.stream.close()
+        except (OSError, XuError):
+            pass
+        self.stream = self.session = None
+
+    def reset(self):
+        """A session on an empty back-end, reusing the running one if it
+        can be reset."""
+        if self.session is not None:
+            try:
+                self.arm()
+                self.session.reset_state()
+                self.session.account(DEFAULT_ACCOUNT)
+                self.docs = []
+                return
+            except (XuError, OSError):
+                self.stop()
+        self.start()
+
+    def arm(self):
+        if isinstance(self.stream, PipeStream):
+            self.stream.deadline = time.monotonic() + self.op_timeout
+
+    def observe(self, doc):
+        session, docid = self.session, self.docs[doc]
+        return [str(session.retrieve_vspanset(docid)),
+                describe(session.retrieve_contents(SpecSet(VSpec(docid, [WHOLE_DOCUMENT]))))]
+
+    def run(self, op):
+        """Apply an operation; return what it answered and the state of
+        the documents it touched."""
+        self.arm()
+        session, docs = self.session, self.docs
+        kind = op[0]
+        result = None
+        if kind == "create":
+            docs.append(session.create_document())
+            session.open_document(docs[-1], READ_WRITE, CONFLICT_FAIL)
+            result = docs[-1]
+            touched = []
+        elif kind == "insert":
+            session.insert(docs[op[1]], Address(1, op[2]), [op[3]])
+            touched = [op[1]]
+        elif kind == "delete":
+            session.delete(docs[op[1]], Address(1, op[2]), Offset(0, op[3]))
+            touched = [op[1]]
+        elif kind == "vcopy":
+            source = SpecSet(VSpec(docs[op[3]], [Span(Address(1, op[4]), Offset(0, op[5]))]))
+            session.vcopy(docs[op[1]], Address(1, op[2]), source)
+            touched = [op[1]]
+        elif kind in ("pivot", "swap"):
+            cuts = [Address(1, cut) for cut in op[2:]]
+            getattr(session, kind)(docs[op[1]], *cuts)
+            touched = [op[1]]
+        elif kind == "link":
+            home, source, sstart, swidth, target, tstart, twidth, type = op[1:]
+            result = session.create_link(
+                docs[home],
+                SpecSet(VSpec(docs[source], [Span(Address(1, sstart), Offset(0, swidth))])),
+                SpecSet(VSpec(docs[target], [Span(Address(1, tstart), Offset(0, twidth))])),
+                SpecSet([LINK_TYPES[type]]))
+            touched = [home]
+        elif kind == "version":
+            session.close_document(docs[op[1]])
+            docs.append(session.create_version(docs[op[1]]))
+            session.open_document(docs[op[1]], READ_WRITE, CONFLICT_FAIL)
+            session.open_document(docs[-1], READ_WRITE, CONFLICT_FAIL)
+            result = docs[-1]
+            touched = [op[1], len(docs) - 1]
+        return [describe(result)] + [self.observe(doc) for doc in touched]
+
+
+class Pair:
+    """Two back-ends run in lockstep."""
+
+    def __init__(self, spec_a, spec_b, op_timeout):
+        self.targets = [Target(spec_a, op_timeout), Target(spec_b, op_timeout)]
+
+    def step(self, target, op):
+        try:
+            return target.run(op)
+        except (XuError, OSError, EOFError) as e:
+            # a crashed C back-end may show up as a broken pipe
+            target.stop()
+            return f"failed: {e}"
+
+    def replay(self, ops):
+        """Run a sequence, skipping operations it has made invalid.
+
+        Returns (ops run, divergence), the divergence being None or
+        (index into ops run, answer of A, answer of B)."""
+        for target in self.targets:
+            target.reset()
+        model = Model()
+        run = []
+        for op in ops:
+            if not model.valid(op):
+                continue
+            model.apply(op)
+            run.append(op)
+            a, b = [self.step(target, op) for target in self.targets]
+            if a != b:
+                return run, (len(run) - 1, a, b)
+            if isinstance(a, str):
+                # both failed alike; nothing more to compare
+                break
+        return run, None
+
+    def close(self):
+        for target in self.targets:
+            target.stop()
+
+
+def shrink(pair, ops, divergence):
+    """Remove operations and shorten text while the sequence still
+    diverges at an operation of the same kind; return the smallest
+    sequence found and its divergence.  If the sequence no longer
+    diverges when replayed (a flaky back-end), it is returned as it is."""
+    kind = ops[divergence[0]][0]
+
+    def diverges(candidate):
+        run, divergence = pair.replay(candidate)
+        if divergence and run[divergence[0]][0] == kind:
+            return run[:divergence[0] + 1], divergence
+        return None
+
+    best = diverges(ops)
+    if best is None:
+        return ops, divergence
+    ops, divergence = best
+    chunk = len(ops) // 2
+    while chunk >= 1:
+        start = 0
+        while start < len(ops) - 1:
+            # the diverging operation is always kept
+            candidate = ops[:start] + ops[start + chunk:-1] + ops[-1:]
+            found = diverges(candidate) if len(candidate) < len(ops) else None
+            if found:
+                ops, divergence = found
+            else:
+                start += chunk
+        chunk //= 2
+    for i, op in enumerate(ops):
+        while op[0] == "insert" and len(op[3]) > 1:
+            shorter = op[:3] + (op[3][:len(op[3]) // 2],)
+            found = diverges(ops[:i] + [shorter] + ops[i + 1:])
+            if not found or len(found[0]) != len(ops):
+                break
+            ops, divergence = found
+            op = shorter
+    return ops, divergence
+
+
+# ----------------------------------------------------------- reproducers
+
+def scenario_source(name, ops, divergence, spec_a, spec_b, seed, original):
+    """A scenario function replaying a shrunk sequence and recording what
+    each operation answered."""
+    index, a, b = divergence
+    docid = lambda doc: f"doc{doc}"
+    vspan = lambda doc, start, width: (f"SpecSet(VSpec({docid(doc)}, [Span(Address(1, {start}), "
+                                       f"Offset(0, {width}))]))")
+    lines = [
+        f"def scenario_{name}(session):",
+        '    """Fuzzer reproducer: the back-ends differ at the last operation.',
+        "",
+        f"    Found by fuzz_backends.py with seed {seed} ({original} operations,",
+        f"    shrunk to {len(ops)}), running {Path(spec_a).name} against {Path(spec_b).name}:",
+        f"      {Path(spec_a).name}: {a!r}"[:200],
+        f"      {Path(spec_b).name}: {b!r}"[:200],
+        '    """',
+        "    operations = []",
+        "",
+    ]
+    ndocs = 0
+    for op in ops:
+        kind = op[0]
+        if kind == "create":
+            doc = docid(ndocs)
+            ndocs += 1
+            lines += [f"    {doc} = session.create_document()",
+                      f"    session.open_document({doc}, READ_WRITE, CONFLICT_FAIL)",
+                      f'    operations.append({{"op": "create_document", "result": str({doc})}})']
+            continue
+        touched = [op[1]]
+        if kind == "insert":
+            lines += [f"    session.insert({docid(op[1])}, Address(1, {op[2]}), [{op[3]!r}])",
+                      f'    operations.append({{"op": "insert", "doc": str({docid(op[1])}), '
+                      f'"address": "1.{op[2]}", "text": {op[3]!r}}})']
+        elif kind == "delete":
+            lines += [f"    session.delete({docid(op[1])}, Address(1, {op[2]}), Offset(0, {op[3]}))",
+                      f'    operations.append({{"op": "delete", "doc": str({docid(op[1])}), '
+                      f'"address": "1.{op[2]}", "width": "0.{op[3]}"}})']
+        elif kind == "vcopy":
+            lines += [f"    session.vcopy({docid(op[1])}, Address(1, {op[2]}), "
+                      f"{vspan(op[3], op[4], op[5])})",
+                      f'    operations.append({{"op": "vcopy", "doc": str({docid(op[1])}), '
+                      f'"address": "1.{op[2]}", "source": str({docid(op[3])}), '
+                      f'"start": "1.{op[4]}", "width": "0.{op[5]}"}})']
+        elif kind in ("pivot", "swap"):
+            cuts = ", ".join(f"Address(1, {cut})" for cut in op[2:])
+            record = ", ".join(f'"cut{i + 1}": "1.{cut}"' for i, cut in enumerate(op[2:]))
+            lines += [f"    session.{kind}({docid(op[1])}, {cuts})",
+                      f'    operations.append({{"op": "{kind}", "doc": str({docid(op[1])}), {record}}})']
+        elif kind == "link":
+            home, source, sstart, swidth, target, tstart, twidth, type = op[1:]
+            type_name = TYPE_NAMES[LINK_TYPES[type]]
+            lines += [f"    link = session.create_link({docid(home)}, "
+                      f"{vspan(source, sstart, swidth)},",
+                      f"                               {vspan(target, tstart, twidth)}, "
+                      f"SpecSet([{type_name.upper()}_TYPE]))",
+                      f'    operations.append({{"op": "create_link", "home": str({docid(home)}), '
+                      f'"type": "{type_name}", "result": str(link)}})']
+        elif kind == "version":
+            doc = docid(ndocs)
+            ndocs += 1
+            lines += [f"    session.close_document({docid(op[1])})",
+                      f"    {doc} = session.create_version({docid(op[1])})",
+                      f"    session.open_document({docid(op[1])}, READ_WRITE, CONFLICT_FAIL)",
+                      f"    session.open_document({doc}, READ_WRITE, CONFLICT_FAIL)",
+                      f'    operations.append({{"op": "create_version", "from": str({docid(op[1])}), '
+                      f'"result": str({doc})}})']
+            touched.append(ndocs - 1)
+        for doc in touched:
+            lines += [f"    operations.append({{\"op\": \"retrieve\", \"doc\": str({docid(doc)}),",
+                      f"                       \"vspanset\": str(session.retrieve_vspanset({docid(doc)})),",
+                      "                       \"contents\": [str(item) for item in session.retrieve_contents(",
+                      f"                           SpecSet(VSpec({docid(doc)}, [Span(Address(1, 1), Offset(1))])))]}})"]
+        lines.append("")
+    lines += ["    return {",
+              f'        "name": "{name}",',
+              f'        "description": "Fuzzer reproducer (seed {seed})",',
+              '        "operations": operations',
+              "    }"]
+    return "\n".join(lines) + "\n"
+
+
+def write_reproducer(output_dir, name, source):
+    """Write a scenario module holding one reproducer; return its path."""
+    path = output_dir / f"{name}.py"
+    path.write_text(
+        f'"""Differential fuzzer reproducer {name}."""\n\n'
+        "from client import Address, Offset, Span, VSpec, SpecSet\n"
+        "from scenarios.common import (READ_WRITE, CONFLICT_FAIL, JUMP_TYPE, QUOTE_TYPE,\n"
+        "                              FOOTNOTE_TYPE, MARGIN_TYPE)\n\n\n"
+        f"{source}\n\n"
+        f'SCENARIOS = [\n    ("fuzz", "{name}", scenario_{name}),\n]\n')
+    return path
+
+
+# ---------------------------------------------------------------- workers
+
+pair = None
+
+
+def start_worker(spec_a, spec_b, op_timeout):
+    global pair
+    pair = Pair(spec_a, spec_b, op_timeout)
+
+
+def fuzz_seed(job):
+    """Run one seed's sequence; return (seed, None) or, if the back-ends
+    diverge, (seed, (original length, shrunk ops, divergence))."""
+    seed, length = job
+    ops = generate(seed, length)
+    run, divergence = pair.replay(ops)
+    if divergence is None:
+        return seed, None
+    shrunk, divergence = shrink(pair, run[:divergence[0] + 1], divergence)
+    return seed, (len(run), shrunk, divergence)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential fuzzing of two FEBE back-ends")
+    parser.add_argument("--backend-a", default="../backend/build/backend",
+                        help='First back-end: a binary, or "loopback" (default C backend)')
+    parser.add_argument("--backend-b", default="loopback",
+                        help='Second back-end: a binary, or "loopback" (default loopback)')
+    parser.add_argument("--seed", type=int, default=0, help="First seed (default 0)")
+    parser.add_argument("--sequences", type=int, default=200,
+                        help="Number of sequences, one per seed (default 200)")
+    parser.add_argument("--length", type=int, default=40,
+                        help="Operations per sequence (default 40)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(),
+                        help="Worker processes, each with a pair of back-ends")
+    parser.add_argument("--op-timeout", type=float, default=5.0,
+                        help="Seconds to wait for a piped back-end's response (default 5)")
+    parser.add_argument("--output", default="../fuzz-repro",
+                        help="Directory for reproducer scenarios")
+    args = parser.parse_args()
+
+    script_dir = Path(__file__).parent
+    specs = []
+    for spec in (args.backend_a, args.backend_b):
+        if spec != "loopback":
+            spec = str((script_dir / spec).resolve())
+            if not Path(spec).exists():
+                print(f"Error: Backend not found at {spec}")
+                print("Run 'make' in the backend directory first.")
+                sys.exit(1)
+        specs.append(spec)
+    output_dir = (script_dir / args.output).resolve()
+
+    jobs = [(seed, args.length) for seed in range(args.seed, args.seed + args.sequences)]
+    found = {}
+    done = 0
+    start = last = time.perf_counter()
+    with multiprocessing.Pool(args.jobs, start_worker, (*specs, args.op_timeout)) as pool:
+        for seed, finding in pool.imap_unordered(fuzz_seed, jobs):
+            done += 1
+            now = time.perf_counter()
+            if finding:
+                original, ops, divergence = finding
+                kind = ops[-1][0]
+                key = (kind, isinstance(divergence[1], str), isinstance(divergence[2], str))
+                found.setdefault(key, []).append(seed)
+                if len(found[key]) == 1:
+                    output_dir.mkdir(parents=True, exist_ok=True)
+                    name = f"fuzz_{kind}_seed{seed}"
+                    source = scenario_source(name, ops, divergence, *specs, seed, original)
+                    path = write_reproducer(output_dir, name, source)
+                    print(f"seed {seed}: diverged at {kind} after {original} operations, "
+                          f"shrunk to {len(ops)}: {path}", flush=True)
+            if now - last >= 5:
+                last = now
+                print(f"{done}/{len(jobs)} sequences, {done / (now - start):.1f}/s", flush=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{done} sequences of {args.length} operations in {elapsed:.1f}s "
+          f"({done / elapsed:.1f}/s with {args.jobs} jobs)")
+    for (kind, failed_a, failed_b), seeds in sorted(found.items()):
+        how = {(True, False): "only A failed", (False, True): "only B failed"}.get(
+            (failed_a, failed_b), "answers differ")
+        print(f"  {kind}: {how} in {len(seeds)} sequences (seeds {', '.join(map(str, seeds[:8]))}"
+              f"{', ...' if len(seeds) > 8 else ''})")
+    if found:
+        print(f"Reproducers written to {output_dir}")
+        sys.exit(1)
+    print("No divergences")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,62 +3,490 @@
 
 Runs test scenarios against the backend in test mode (fresh state per scenario)
 and outputs JSON test cases capturing the expected behavior.
+
+With --loopback the scenarios run against the in-process Python back-end in
+pybackend.py instead, which needs no build and no subprocess; comparing its
+output with compare_golden.py measures how closely it agrees with C.
+
+With --persistent one backend serves every scenario and is put back into its
+just-started state between scenarios with the RESETSTATE request, instead of
+paying for a new process each time.  --verify runs every scenario both ways
+and fails unless the two results are byte-identical.
+
+Every request has a deadline (--op-timeout) and so does every scenario
+(--scenario-timeout).  A backend that misses one is killed and the
+scenario is reported as a timeout; one that exits mid-scenario is
+reported as a crash.  Either way the last request sent is named and the
+run moves on to the next scenario with a new backend.
+
+--scenario selects scenarios by name, category/name, category or glob
+(links/*, *version*) and may be repeated; --scenarios-from reads such
+patterns from a file, one per line.  --changed-since REF keeps only the
+scenarios whose modules changed since a git ref (committed or not).
+
+With --report each scenario's wall time, backend startup time, operation
+count, characters on the wire and backend peak RSS are written to a JSON
+report, and the slowest scenarios are listed at the end of the run.
 """
 
 import argparse
 import json
+import os
+import signal
+import subprocess
 import sys
+import time
+from fnmatch import fnmatchcase
 from pathlib import Path
 
-from client import XuSession, XuConn, PipeStream, Address
-from scenarios import ALL_SCENARIOS
+from client import (XuSession, XuConn, XuError, XuTimeout, PipeStream,
+                    LoopbackStream, Address, REQUEST_NAMES)
+from scenarios.registry import manifest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
 
 # Default account address for test mode
 DEFAULT_ACCOUNT = Address(1, 1, 0, 1)
 
+# Default deadlines in seconds for one request and for one scenario
+DEFAULT_OP_TIMEOUT = 10.0
+DEFAULT_SCENARIO_TIMEOUT = 60.0
+
+
+class WireCounter:
+    """XuConn monitor that counts the requests made and the characters
+    sent and received."""
+
+    def __init__(self):
+        self.nrequests = 0
+        self.nsent = 0
+        self.nreceived = 0
+
+    def begin(self, code):
+        self.nrequests += 1
+
+    def written(self): pass
+    def finish(self): pass
+
+    def sent(self, data):
+        self.nsent += len(data)
+
+    def received(self, data):
+        self.nreceived += len(data)
+
+
+class Watchdog:
+    """XuConn monitor that gives every request a deadline and remembers
+    the last request sent.
+
+    Reads from a PipeStream give up with XuTimeout at the deadline, which
+    is op_timeout after the request began but never past the scenario's
+    own deadline.  An in-process backend cannot be interrupted, so there
+    the scenario's deadline is only checked as each request begins.
+
+    A missed deadline is latched: every later request fails at once with
+    the same XuTimeout, and expired() still reports it if the scenario
+    caught the exception and carried on."""
+
+    def __init__(self, stream, op_timeout=None, scenario_timeout=None):
+        self.stream = stream
+        self.op_timeout = op_timeout
+        self.scenario_timeout = scenario_timeout
+        self.arm()
+
+    def arm(self):
+        """Start the scenario's clock."""
+        self.code = None
+        self.timeout = None
+        self.scenario_deadline = None
+        if self.scenario_timeout:
+            self.scenario_deadline = time.monotonic() + self.scenario_timeout
+        self.set_deadline()
+
+    def disarm(self):
+        """Stop the scenario's clock; requests still have op_timeout."""
+        self.scenario_deadline = None
+        self.set_deadline()
+
+    def set_deadline(self):
+        deadlines = [self.scenario_deadline]
+        if self.op_timeout:
+            deadlines.append(time.monotonic() + self.op_timeout)
+        deadlines = [deadline for deadline in deadlines if deadline is not None]
+        self.stream.deadline = min(deadlines) if deadlines else None
+
+    def begin(self, code):
+        if self.expired():
+            raise XuTimeout(self.expired())
+        self.code = code
+        if self.scenario_deadline and time.monotonic() >= self.scenario_deadline:
+            self.timeout = "scenario deadline passed"
+            raise XuTimeout(self.timeout)
+        self.set_deadline()
+
+    def expired(self):
+        """Why a deadline was missed since arm(), or None."""
+        return self.timeout or getattr(self.stream, "timed_out", None)
+
+    def written(self): pass
+    def finish(self): pass
+    def sent(self, data): pass
+    def received(self, data): pass
+
+    def last_op(self):
+        """The name of the last request sent, or "handshake" if none was."""
+        if self.code is None:
+            return "handshake"
+        return REQUEST_NAMES.get(self.code, str(self.code))
+
+
+def kill_tree(pid):
+    """Kill a process and the command a shell with that pid is running."""
+    try:
+        children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+    except OSError:
+        children = []
+    for child in children:
+        kill_tree(int(child))
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def command_pid(pid):
+    """Return the pid of the command a shell with that pid is running, or
+    pid itself if it has no children."""
+    children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+    return command_pid(int(children[0])) if children else pid
+
+
+def peak_rss_kb(pid):
+    """Return the peak resident set size in kB of a process, or of the
+    command a shell with that pid is running, from /proc (None if gone)."""
+    try:
+        pid = command_pid(pid)
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def reset_peak_rss(pid):
+    """Set a process's peak RSS back to its current RSS, as peak_rss_kb()
+    reads it.  Returns False if the kernel does not allow it."""
+    try:
+        Path(f"/proc/{command_pid(pid)}/clear_refs").write_text("5")
+        return True
+    except (OSError, ValueError):
+        return False
+
 
 class BackendProcess:
     """Manages a backend subprocess in test mode."""
 
-    def __init__(self, backend_path):
+    def __init__(self, backend_path, loopback=False, op_timeout=None,
+                 scenario_timeout=None):
         self.backend_path = backend_path
+        self.loopback = loopback
+        self.op_timeout = op_timeout
+        self.scenario_timeout = scenario_timeout
         self.process = None
+        self.stream = None
         self.session = None
+        self.counter = None
+        self.watchdog = None
+        # Set once a reset could not clear the peak RSS, which from then
+        # on covers every scenario run so far
+        self.rss_cumulative = False
 
     def start(self):
         """Start the backend and establish a session."""
-        # Use PipeStream to communicate with backend
-        stream = PipeStream(f"{self.backend_path} --test-mode")
-        self.session = XuSession(XuConn(stream))
+        if self.loopback:
+            self.stream = LoopbackStream()
+        else:
+            # Use PipeStream to communicate with backend
+            self.stream = PipeStream(f"{self.backend_path} --test-mode")
+            self.process = self.stream.inpipe._proc
+        conn = XuConn(self.stream)
+        self.counter = conn.monitor(WireCounter())
+        self.watchdog = conn.monitor(Watchdog(self.stream, self.op_timeout,
+                                              self.scenario_timeout))
+        self.session = XuSession(conn)
         # Set up default account for creating documents
         self.session.account(DEFAULT_ACCOUNT)
         return self.session
 
+    def traffic(self):
+        """Return the requests made and the characters sent and received
+        so far."""
+        if not self.counter:
+            return 0, 0, 0
+        return self.counter.nrequests, self.counter.nsent, self.counter.nreceived
+
+    def peak_rss_kb(self):
+        """Return the backend's peak RSS in kB, if it can be measured."""
+        if not self.process:
+            return None
+        return peak_rss_kb(self.process.pid)
+
+    def reset(self):
+        """Return a running backend to its just-started state."""
+        self.watchdog.arm()
+        self.session.reset_state()
+        if self.process and not reset_peak_rss(self.process.pid):
+            self.rss_cumulative = True
+        self.session.account(DEFAULT_ACCOUNT)
+        return self.session
+
+    def exited(self):
+        """Return the backend's exit status if it has exited, else None."""
+        if self.loopback:
+            return None if self.stream.backend.alive else 0
+        try:
+            return self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def classify(self, error):
+        """Classify a failed scenario as a "timeout", a "crash" or an
+        "error", killing the backend unless it is still answering.
+
+        Returns (status, detail)."""
+        if isinstance(error, XuTimeout):
+            self.kill()
+            return "timeout", str(error)
+        if self.stream is None or not isinstance(error, (XuError, OSError)):
+            return "error", str(error)
+        status = self.exited()
+        if status is None:
+            return "error", str(error)
+        self.kill()
+        if status < 0 or status > 128:
+            return "crash", f"killed by signal {abs(status) % 128}"
+        return "crash", f"exited with status {status}"
+
+    def kill(self):
+        """Kill the backend and drop its session."""
+        if self.process:
+            kill_tree(self.process.pid)
+        try:
+            self.stream.close()
+        except (OSError, XuError):
+            pass
+        self.session = None
+
     def stop(self):
         """Stop the backend."""
         if self.session and self.session.open:
+            self.watchdog.disarm()
             try:
                 self.session.quit()
             except:
-                pass
+                self.kill()
         self.session = None
 
 
-def run_scenario(backend_path, category, name, scenario_func):
-    """Run a single scenario with a fresh backend."""
-    backend = BackendProcess(backend_path)
+def run_scenario(backend_path, category, name, scenario_func, loopback=False,
+                 backend=None, metrics=None, op_timeout=DEFAULT_OP_TIMEOUT,
+                 scenario_timeout=DEFAULT_SCENARIO_TIMEOUT):
+    """Run a single scenario with a fresh backend.
+
+    If a persistent ``backend`` is given the scenario runs on it after a
+    reset instead.  A scenario that fails may have left it crashed or
+    mid-reply, so it is stopped and the next scenario starts a new one.
+    If a ``metrics`` dict is given it is filled in with the timings and
+    traffic of the run (startup is the reset time for a persistent backend).
+    Its request count covers every request the scenario made, not just the
+    operations it recorded.
+
+    A failed scenario's result has a "status" of "timeout", "crash" or
+    "error" and names the last request sent in "last_op".
+    """
+    persistent = backend is not None
+    if not persistent:
+        backend = BackendProcess(backend_path, loopback, op_timeout,
+                                 scenario_timeout)
+    failed = False
     try:
-        session = backend.start()
-        result = scenario_func(session)
+        started = ready = time.perf_counter()
+        before = (0, 0, 0)
+        try:
+            if backend.session:
+                session = backend.reset()
+            else:
+                session = backend.start()
+            ready = time.perf_counter()
+            before = backend.traffic()
+            result = scenario_func(session)
+            if backend.watchdog.expired():
+                # the scenario caught the timeout and recorded it as an error
+                raise XuTimeout(backend.watchdog.expired())
+        except Exception as e:
+            failed = True
+            last_op = None
+            if backend.watchdog:
+                last_op = backend.watchdog.last_op()
+                if backend.watchdog.expired() and not isinstance(e, XuTimeout):
+                    e = XuTimeout(backend.watchdog.expired())
+            status, detail = backend.classify(e)
+            result = {
+                "name": name,
+                "error": str(e) if detail == str(e) else f"{e} ({detail})",
+                "status": status,
+                "last_op": last_op,
+                "operations": []
+            }
+        if metrics is not None:
+            finished = time.perf_counter()
+            requests, sent, received = backend.traffic()
+            metrics.update({
+                "category": category,
+                "name": name,
+                "status": result["status"] if failed else "ok",
+                "wall": finished - ready,
+                "startup": ready - started,
+                "requests": requests - before[0],
+                "sent": sent - before[1],
+                "received": received - before[2],
+                "peak_rss_kb": backend.peak_rss_kb(),
+                "peak_rss_cumulative": backend.rss_cumulative,
+            })
+        if failed and persistent:
+            backend.stop()
+        elif backend.watchdog:
+            backend.watchdog.disarm()
         return result
-    except Exception as e:
-        return {
-            "name": name,
-            "error": str(e),
-            "operations": []
-        }
     finally:
-        backend.stop()
+        if not persistent:
+            backend.stop()
+
+
+def write_report(report_file, entries, slowest, **settings):
+    """Write per-scenario metrics to a JSON report and print the slowest."""
+    ranked = sorted(entries, key=lambda entry: entry["wall"], reverse=True)
+    report = dict(settings)
+    report["total_wall"] = sum(entry["wall"] + entry["startup"]
+                               for entry in entries)
+    report["scenarios"] = entries
+    report["slowest"] = [f"{entry['category']}/{entry['name']}"
+                         for entry in ranked[:slowest]]
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nSlowest {min(slowest, len(ranked))} scenarios:")
+    for entry in ranked[:slowest]:
+        rss = entry["peak_rss_kb"]
+        rss = f"{rss} kB" if rss is not None else "-"
+        if entry["peak_rss_cumulative"]:
+            rss += "*"
+        print(f"  {entry['wall'] * 1000:8.1f} ms  {entry['requests']:4d} reqs"
+              f"  {entry['sent'] + entry['received']:8d} chars  {rss:>10}"
+              f"  {entry['category']}/{entry['name']}")
+    if any(entry["peak_rss_cumulative"] for entry in ranked[:slowest]):
+        print("  * peak RSS over the backend's whole life; it could not be reset")
+    print(f"Report written to {report_file}")
+
+
+def changed_scenario_files(ref):
+    """Files under febe/scenarios changed since a git ref, including
+    uncommitted and untracked ones."""
+    commands = [["git", "diff", "--name-only", ref, "--", "febe/scenarios"],
+                ["git", "ls-files", "--others", "--exclude-standard", "febe/scenarios"]]
+    changed = set()
+    for command in commands:
+        try:
+            output = subprocess.run(command, cwd=REPO_ROOT, capture_output=True,
+                                    text=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Error: {' '.join(command)} failed: {getattr(e, 'stderr', '') or e}")
+            sys.exit(1)
+        changed.update(line for line in output.splitlines() if line.endswith(".py"))
+    return changed
+
+
+def read_patterns(path):
+    """Scenario patterns from a list file, ignoring blanks and # comments."""
+    patterns = []
+    for line in Path(path).read_text().splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            patterns.append(line)
+    return patterns
+
+
+def matches(pattern, category, name):
+    """Whether a scenario matches a name, category, category/name or glob."""
+    if "/" in pattern:
+        return fnmatchcase(f"{category}/{name}", pattern)
+    return pattern == category or fnmatchcase(name, pattern)
+
+
+def select_scenarios(refs, patterns=None, changed=None):
+    """The manifest entries (see scenarios/registry.py) matching any of
+    the patterns (all if there are none) and, if a set of changed files
+    is given, defined in one of them.
+
+    A changed file that defines no scenarios (a shared helper such as
+    common.py) may affect any of them, so then none are dropped."""
+    if changed is not None:
+        modules = {ref.path for ref in refs}
+        if changed - modules:
+            print(f"Shared scenario code changed ({', '.join(sorted(changed - modules))}); "
+                  "not filtering by module")
+            changed = None
+    return [ref for ref in refs
+            if (not patterns or any(matches(p, ref.category, ref.name) for p in patterns))
+            and (changed is None or ref.path in changed)]
+
+
+def start_persistent(backend_path, loopback=False, op_timeout=DEFAULT_OP_TIMEOUT,
+                     scenario_timeout=DEFAULT_SCENARIO_TIMEOUT):
+    """Start a backend for --persistent, checking that it can be reset."""
+    backend = BackendProcess(backend_path, loopback, op_timeout, scenario_timeout)
+    try:
+        backend.start()
+    except XuError as e:
+        status, detail = backend.classify(e)
+        print(f"Error: {backend_path} failed to start ({status}: {detail}).")
+        sys.exit(1)
+    try:
+        backend.reset()
+    except XuError:
+        print(f"Error: {backend_path} does not support RESETSTATE (37) "
+              "in --test-mode; run without --persistent.")
+        sys.exit(1)
+    return backend
+
+
+def verify_persistent(backend_path, scenarios, loopback=False, **timeouts):
+    """Check that a reset backend gives byte-identical results to fresh ones.
+
+    Returns the number of scenarios whose results differ."""
+    backend = start_persistent(backend_path, loopback, **timeouts)
+    mismatches = 0
+    fresh_time = persistent_time = 0.0
+    for category, name, scenario_func in scenarios:
+        print(f"Verifying {category}/{name}...", end=" ", flush=True)
+        start = time.perf_counter()
+        fresh = run_scenario(backend_path, category, name, scenario_func,
+                             loopback, **timeouts)
+        fresh_time += time.perf_counter() - start
+        start = time.perf_counter()
+        reused = run_scenario(backend_path, category, name, scenario_func,
+                              loopback, backend, **timeouts)
+        persistent_time += time.perf_counter() - start
+        if json.dumps(fresh, indent=2) == json.dumps(reused, indent=2):
+            print("ok")
+        else:
+            print("MISMATCH")
+            mismatches += 1
+    backend.stop()
+    print(f"\n{len(scenarios) - mismatches}/{len(scenarios)} identical; "
+          f"fresh {fresh_time:.2f}s, persistent {persistent_time:.2f}s")
+    return mismatches
 
 
 def main():
@@ -67,14 +495,45 @@ def main():
                         help="Path to backend executable")
     parser.add_argument("--output", default="../golden",
                         help="Output directory for test cases")
-    parser.add_argument("--scenario", help="Run only this scenario")
+    parser.add_argument("--scenario", action="append", default=[],
+                        help="Run only scenarios matching this name, category, "
+                             "category/name or glob (repeatable)")
+    parser.add_argument("--scenarios-from", metavar="FILE",
+                        help="Read --scenario patterns from a file, one per line")
+    parser.add_argument("--changed-since", metavar="REF",
+                        help="Run only scenarios whose modules changed since a git ref")
+    parser.add_argument("--loopback", action="store_true",
+                        help="Use the in-process Python backend (pybackend.py)")
+    parser.add_argument("--persistent", action="store_true",
+                        help="Reuse one backend, resetting it between scenarios")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check --persistent results match fresh backends")
+    parser.add_argument("--report",
+                        help="Write per-scenario timings and resources to this JSON file")
+    parser.add_argument("--slowest", type=int, default=10,
+                        help="Number of slowest scenarios to list with --report")
+    parser.add_argument("--op-timeout", type=float, default=DEFAULT_OP_TIMEOUT,
+                        help="Seconds to wait for one response, 0 for no limit "
+                             f"(default {DEFAULT_OP_TIMEOUT:g})")
+    parser.add_argument("--scenario-timeout", type=float, default=DEFAULT_SCENARIO_TIMEOUT,
+                        help="Seconds allowed for a whole scenario, 0 for no limit "
+                             f"(default {DEFAULT_SCENARIO_TIMEOUT:g})")
     parser.add_argument("--list", action="store_true", help="List available scenarios")
     args = parser.parse_args()
 
+    patterns = list(args.scenario)
+    if args.scenarios_from:
+        patterns += read_patterns(args.scenarios_from)
+    changed = changed_scenario_files(args.changed_since) if args.changed_since else None
+    selected = select_scenarios(manifest(), patterns, changed)
+    if not selected:
+        print("No scenarios selected")
+        sys.exit(0 if changed is not None else 1)
+
     if args.list:
         print("Available scenarios:")
         current_category = None
-        for category, name, _ in ALL_SCENARIOS:
+        for category, name, *_ in selected:
             if category != current_category:
                 print(f"\n  {category}:")
                 current_category = category
@@ -86,25 +545,44 @@ def main():
     backend_path = (script_dir / args.backend).resolve()
     output_dir = (script_dir / args.output).resolve()
 
-    if not backend_path.exists():
+    if not args.loopback and not backend_path.exists():
         print(f"Error: Backend not found at {backend_path}")
         print("Run 'make' in the backend directory first.")
         sys.exit(1)
 
+    # Only the modules of the selected scenarios are imported
+    scenarios = [(ref.category, ref.name, ref.load()) for ref in selected]
+
+    timeouts = {"op_timeout": args.op_timeout,
+                "scenario_timeout": args.scenario_timeout}
+
+    if args.verify:
+        if verify_persistent(str(backend_path), scenarios, args.loopback, **timeouts):
+            sys.exit(1)
+        return
+
     # Create output directories
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Run scenarios
-    for category, name, scenario_func in ALL_SCENARIOS:
-        if args.scenario and args.scenario != name:
-            continue
+    backend = None
+    if args.persistent:
+        backend = start_persistent(str(backend_path), args.loopback, **timeouts)
 
+    # Run scenarios
+    entries = []
+    failures = {}
+    for category, name, scenario_func in scenarios:
         print(f"Running {category}/{name}...", end=" ", flush=True)
 
-        result = run_scenario(str(backend_path), category, name, scenario_func)
+        metrics = {} if args.report else None
+        result = run_scenario(str(backend_path), category, name, scenario_func,
+                              args.loopback, backend, metrics, **timeouts)
+        if metrics is not None:
+            entries.append(metrics)
 
         if "error" in result:
-            print(f"ERROR: {result['error']}")
+            failures[result["status"]] = failures.get(result["status"], 0) + 1
+            print(f"{result['status'].upper()} in {result['last_op']}: {result['error']}")
         else:
             print("ok")
 
@@ -116,8 +594,19 @@ def main():
             with open(output_file, "w") as f:
                 json.dump(result, f, indent=2)
 
+    if backend:
+        backend.stop()
+
+    if failures:
+        print("\nFailed: " + ", ".join(f"{count} {status}"
+                                       for status, count in sorted(failures.items())))
     print(f"\nTests written to {output_dir}")
 
+    if args.report:
+        write_report(args.report, entries, args.slowest,
+                     backend="loopback" if args.loopback else str(backend_path),
+                     persistent=args.persistent)
+
 
 if __name__ == "__main__":
     main()
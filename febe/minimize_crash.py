@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Reduce a sequence of FEBE calls that crashes the backend to a minimal one.
+
+The calls come from a golden scenario, recorded while it runs (--scenario),
+or from a trace file (--trace) with one XuSession call per line as Python,
+e.g. insert(Address(1, 1, 0, 1, 0, 1), Address(1, 1), ['Hello']), which is
+what --save-trace writes.  Addresses are literal, so a trace replays the
+same way on any fresh --test-mode backend.
+
+The calls are replayed on a fresh backend to find the crash: the call
+during which the backend exited (or stopped answering, with --hang).
+Then delta debugging (ddmin) replays subsets and complements of the
+calls, --jobs at a time, each on its own fresh backend, keeping any that
+still crash in the same kind of call, until removing any single call stops
+the crash.  A corrupted heap may end in a different signal once calls are
+removed; --same-status also requires the original signal or exit status.  The result is written as a script in the
+style of febe/tests/debug.
+
+    python minimize_crash.py --scenario links/some_crash
+    python minimize_crash.py --trace crash.trace --jobs 8 --output /tmp/repro.py
+"""
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from client import (XuSession, XuConn, XuError, XuTimeout, PipeStream, Address,
+                    Offset, Span, VSpec, SpecSet, NOSPECS, READ_ONLY, READ_WRITE,
+                    CONFLICT_FAIL, CONFLICT_COPY, ALWAYS_COPY, LINK_TYPES, TYPE_NAMES)
+
+DEFAULT_ACCOUNT = Address(1, 1, 0, 1)
+
+# names a trace line may use
+TRACE_NAMES = {"Address": Address, "Offset": Offset, "Span": Span,
+               "VSpec": VSpec, "SpecSet": SpecSet, "NOSPECS": NOSPECS}
+ACCESS_NAMES = {READ_ONLY: "READ_ONLY", READ_WRITE: "READ_WRITE"}
+COPY_NAMES = {CONFLICT_FAIL: "CONFLICT_FAIL", CONFLICT_COPY: "CONFLICT_COPY",
+              ALWAYS_COPY: "ALWAYS_COPY"}
+LINK_END_NAMES = {1: "LINK_SOURCE", 2: "LINK_TARGET", 3: "LINK_TYPE"}
+
+
+class Name(str):
+    """A constant's name, which renders without quotes."""
+
+    def __repr__(self):
+        return str(self)
+
+
+def render(name, args):
+    """A call as a line of Python, with the usual names for constants."""
+    args = list(args)
+    if name == "open_document" and len(args) == 3:
+        args[1] = Name(ACCESS_NAMES.get(args[1], args[1]))
+        args[2] = Name(COPY_NAMES.get(args[2], args[2]))
+    elif name == "follow_link" and len(args) == 2:
+        args[1] = Name(LINK_END_NAMES.get(args[1], args[1]))
+    text = f"{name}({', '.join(repr(arg) for arg in args)})"
+    for spec in LINK_TYPES:
+        text = text.replace(repr(spec), f"{TYPE_NAMES[spec].upper()}_TYPE")
+    return text
+
+
+def evaluate(line, session):
+    """Make the call a trace line describes."""
+    namespace = dict(TRACE_NAMES, session=session)
+    namespace.update({value: key for key, value in ACCESS_NAMES.items()})
+    namespace.update({value: key for key, value in COPY_NAMES.items()})
+    namespace.update({value: key for key, value in LINK_END_NAMES.items()})
+    namespace.update({f"{TYPE_NAMES[spec].upper()}_TYPE": spec for spec in LINK_TYPES})
+    return eval(f"session.{line}", namespace)
+
+
+class Recorder:
+    """Stands in for an XuSession, recording every call made on it."""
+
+    def __init__(self, session):
+        self.session = session
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self.session, name)
+        if not callable(attr) or name.startswith("_") or name == "quit":
+            return attr
+
+        def call(*args):
+            self.calls.append(render(name, args))
+            return attr(*args)
+        return call
+
+
+class Backend:
+    """A fresh --test-mode backend, killed when done with."""
+
+    def __init__(self, path):
+        self.stream = PipeStream(f"{path} --test-mode 2>/dev/null")
+        # both ends are open, so the FIFO's name is not needed any more
+        os.unlink(self.stream.fifo)
+        self.process = self.stream.inpipe._proc
+        self.session = XuSession(XuConn(self.stream))
+        self.session.account(DEFAULT_ACCOUNT)
+
+    def status(self):
+        """How the backend exited, or None if it is still running."""
+        try:
+            code = self.process.wait(timeout=0.5)
+        except subprocess.TimeoutExpired:
+            return None
+        if code < 0 or code > 128:
+            return f"killed by signal {abs(code) % 128}"
+        return f"exited with status {code}"
+
+    def close(self):
+        try:
+            self.process.kill()
+        except OSError:
+            pass
+        try:
+            self.stream.close()
+        except (OSError, XuError):
+            pass
+
+
+def replay(path, calls, timeout, hang=False):
+    """Run calls on a fresh backend.
+
+    Returns ((index of the crashing call, status) or None, the indexes of
+    calls that failed without crashing it)."""
+    backend = Backend(path)
+    failed = []
+    try:
+        for i, line in enumerate(calls):
+            backend.stream.deadline = time.monotonic() + timeout
+            try:
+                evaluate(line, backend.session)
+            except XuTimeout:
+                return ((i, "stopped answering") if hang else None), failed
+            except (XuError, OSError, ValueError):
+                status = backend.status()
+                if status:
+                    return (i, status), failed
+                failed.append(i)
+        return None, failed
+    finally:
+        backend.close()
+
+
+# ------------------------------------------------------------------- ddmin
+
+settings = {}
+
+
+def start_worker(path, timeout, hang, signature):
+    settings.update(path=path, timeout=timeout, hang=hang, signature=signature)
+
+
+def crashes(calls):
+    """The calls up to the crash if they crash the backend the same way
+    as the original, else None."""
+    crash, _ = replay(settings["path"], calls, settings["timeout"], settings["hang"])
+    if crash is None:
+        return None
+    index, status = crash
+    call, expected = settings["signature"]
+    if calls[index].split("(", 1)[0] != call or expected not in (None, status):
+        return None
+    return calls[:index + 1]
+
+
+def ddmin(calls, pool, progress):
+    """Zeller's ddmin: a 1-minimal subsequence of calls that still crashes,
+    testing each round's subsets and complements in parallel."""
+    n = 2
+    while len(calls) >= 2:
+        size = len(calls) / n
+        chunks = [calls[round(i * size):round((i + 1) * size)] for i in range(n)]
+        complements = [calls[:round(i * size)] + calls[round((i + 1) * size):]
+                       for i in range(n)]
+        candidates = chunks + complements if n > 2 else chunks
+        results = pool.map(crashes, candidates)
+        progress(len(calls), n, len(candidates))
+        reduced = [result for result in results[:n] if result]
+        if reduced:
+            calls, n = reduced[0], 2
+            continue
+        reduced = [result for result in results[n:] if result]
+        if reduced:
+            calls, n = reduced[0], max(n - 1, 2)
+            continue
+        if n >= len(calls):
+            break
+        n = min(len(calls), n * 2)
+    return calls
+
+
+# ------------------------------------------------------------------ output
+
+def debug_script(calls, failed, status, source, original, filename):
+    """A febe/tests/debug script replaying the minimal sequence."""
+    last = calls[-1]
+    lines = [
+        "#!/usr/bin/env python3",
+        '"""',
+        f"Crash reproducer: backend {status} in {last.split('(', 1)[0]}.",
+        "",
+        f"Reduced by minimize_crash.py from {source} ({original} calls)",
+        f"to {len(calls)}; the backend does not crash without any one of them.",
+        "",
+        "Run from the udanax-test-harness directory:",
+        f"  PYTHONPATH=febe python3 febe/tests/debug/{filename}",
+        '"""',
+        "",
+        "import sys",
+        "import os",
+        "sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))",
+        "",
+        "from client import (",
+        "    XuSession, XuConn, XuError, PipeStream, Address, Offset, Span, VSpec, SpecSet,",
+        "    NOSPECS, READ_ONLY, READ_WRITE, CONFLICT_FAIL, CONFLICT_COPY, ALWAYS_COPY,",
+        "    LINK_SOURCE, LINK_TARGET, LINK_TYPE, JUMP_TYPE, QUOTE_TYPE, FOOTNOTE_TYPE,",
+        "    MARGIN_TYPE",
+        ")",
+        "",
+        "BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)),",
+        "                       '..', '..', '..', 'backend', 'build', 'backend')",
+        "DEFAULT_ACCOUNT = Address(1, 1, 0, 1)",
+        "",
+        'stream = PipeStream(f"{BACKEND} --test-mode")',
+        "session = XuSession(XuConn(stream))",
+        "session.account(DEFAULT_ACCOUNT)",
+        "",
+    ]
+    for i, line in enumerate(calls[:-1]):
+        if i in failed:
+            lines += ["try:", f"    session.{line}", "except XuError:",
+                      "    pass  # fails without crashing the backend"]
+        else:
+            lines.append(f"session.{line}")
+    lines += [
+        "",
+        f"# Backend {status} here when minimized",
+        f'print("{last.split("(", 1)[0]}...", end=" ")',
+        "try:",
+        f"    session.{last}",
+        '    print("no crash (FIXED?)")',
+        "except XuError as e:",
+        '    print(f"CRASH: {e}")',
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def record_scenario(path, pattern):
+    """Run a golden scenario on a fresh backend, recording its calls."""
+    from generate_golden import matches
+    from scenarios.registry import manifest
+
+    refs = [ref for ref in manifest() if matches(pattern, ref.category, ref.name)]
+    if len(refs) != 1:
+        print(f"Error: {pattern} matches {len(refs)} scenarios; give exactly one")
+        sys.exit(1)
+    backend = Backend(path)
+    recorder = Recorder(backend.session)
+    try:
+        refs[0].load()(recorder)
+    except Exception:
+        pass
+    finally:
+        backend.close()
+    return f"{refs[0].category}/{refs[0].name}", recorder.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minimize a backend crash reproduction")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--scenario", help="Record the calls of this golden scenario")
+    source.add_argument("--trace", help="Read calls from a file, one per line")
+    parser.add_argument("--backend", default="../backend/build/backend",
+                        help="Path to backend executable")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(),
+                        help="Replays run at once, each on its own backend")
+    parser.add_argument("--timeout", type=float, default=5.0,
+                        help="Seconds to wait for a response (default 5)")
+    parser.add_argument("--hang", action="store_true",
+                        help="Count a backend that stops answering as crashed")
+    parser.add_argument("--same-status", action="store_true",
+                        help="Keep only replays ending in the original signal or status")
+    parser.add_argument("--save-trace", metavar="FILE",
+                        help="Write the calls before minimizing them")
+    parser.add_argument("--output",
+                        help="Debug script to write (default tests/debug/crash_<name>.py)")
+    args = parser.parse_args()
+
+    script_dir = Path(__file__).parent
+    backend_path = str((script_dir / args.backend).resolve())
+    if not Path(backend_path).exists():
+        print(f"Error: Backend not found at {backend_path}")
+        print("Run 'make' in the backend directory first.")
+        sys.exit(1)
+
+    if args.scenario:
+        name, calls = record_scenario(backend_path, args.scenario)
+    else:
+        name = args.trace
+        calls = [line.strip() for line in Path(args.trace).read_text().splitlines()
+                 if line.strip() and not line.lstrip().startswith("#")]
+    if args.save_trace:
+        Path(args.save_trace).write_text("\n".join(calls) + "\n")
+        print(f"Trace written to {args.save_trace}")
+
+    crash, _ = replay(backend_path, calls, args.timeout, args.hang)
+    if crash is None:
+        print(f"{name}: {len(calls)} calls, none crashes the backend")
+        sys.exit(1)
+    index, status = crash
+    call = calls[index].split("(", 1)[0]
+    print(f"{name}: backend {status} in call {index + 1} of {len(calls)} ({call})")
+
+    start = time.perf_counter()
+    progress = lambda length, n, tests: print(
+        f"  {length} calls, {n} parts: {tests} replays", flush=True)
+    with multiprocessing.Pool(args.jobs, start_worker,
+                              (backend_path, args.timeout, args.hang,
+                               (call, status if args.same_status else None))) as pool:
+        minimal = ddmin(calls[:index + 1], pool, progress)
+    _, failed = replay(backend_path, minimal, args.timeout, args.hang)
+    print(f"Reduced to {len(minimal)} of {index + 1} calls in {time.perf_counter() - start:.1f}s")
+
+    stem = "".join(c if c.isalnum() else "_" for c in Path(name).stem)
+    output = Path(args.output) if args.output else \
+        script_dir / "tests" / "debug" / f"crash_{stem}.py"
+    output.write_text(debug_script(minimal, set(failed), status, name, len(calls), output.name))
+    print(f"Debug script written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1462 @@
+"""In-process reference back-end speaking the FEBE protocol.
+
+Backend is a Python transliteration of the request handling in backend/
+(be.c, fns.c, get1fe.c, get2fe.c, putfe.c, do1.c, do2.c, orglinks.c,
+sporgl.c, spanf1.c, spanf2.c, correspond.c, granf2.c and bert.c) on top of
+the enfilades in enfilade.py.  It answers the requests that the golden
+scenarios use with the same bytes as the C back-end started with
+--test-mode, including its failure replies ("?") and the requests that
+make it crash.
+
+Requests are executed as soon as they are complete, so a client can drive
+it through a LoopbackStream (see client.py) without any process or pipe:
+
+    session = client.loopbackconnect()
+"""
+
+from enfilade import *
+
+# request codes (requests.h)
+(INSERT, RETRIEVEDOCVSPANSET, COPY, REARRANGE, RETRIEVEV) = (0, 1, 2, 3, 5)
+(SHOWRELATIONOF2VERSIONS, CREATENEWDOCUMENT, DELETEVSPAN,
+ CREATENEWVERSION, RETRIEVEDOCVSPAN, QUIT) = (10, 11, 12, 13, 14, 16)
+(FOLLOWLINK, FINDDOCSCONTAINING, CREATELINK, RETRIEVEENDSETS,
+ FINDLINKSFROMTOTHREE) = (18, 22, 27, 28, 30)
+(XACCOUNT, OPEN, CLOSE, RESETSTATE, CREATENODE_OR_ACCOUNT, DUMPSTATE) = \
+    (34, 35, 36, 37, 38, 39)
+NREQUESTS = 40
+
+# item ids (xanadu.h)
+(TEXTID, ISPANID, VSPANID, VSPECID, NODEID, ADDRESSID, SPORGLID) = range(7)
+
+# span types in the spanfilade
+(LINKFROMSPAN, LINKTOSPAN, LINKTHREESPAN, DOCISPAN) = (1, 2, 3, 4)
+
+# BERT access types and open modes (common.h)
+(NOBERTREQUIRED, READBERT, WRITEBERT) = (0, 1, 2)
+(BERTMODEONLY, BERTMODECOPYIF, BERTMODECOPY) = (1, 2, 3)
+
+DEFAULTACCOUNT = maketumbler([1, 1, 0, 1])
+
+# stdio buffer size; output of a request that crashes is lost up to the
+# last full buffer
+BUFSIZ = 8192
+
+
+class BackendExit(Exception):
+    """The back-end process would have exited here."""
+    pass
+
+
+class _Starved(Exception):
+    """The rest of the current request has not been written yet."""
+    pass
+
+
+class Item:
+    """A member of a linked item set: span, vspec, sporgl, text or address.
+
+    The C item structs share one header; the fields used by each kind are
+    stream and width (spans), stream and vspanset (vspecs, stream being
+    the document), stream, width and homedoc (sporgls), text (text items)
+    and stream (addresses).  An Item with no itemid serves as the head
+    of a list, standing in for a pointer to the first member."""
+
+    __slots__ = ("next", "itemid", "stream", "width", "vspanset",
+                 "homedoc", "text")
+
+    def __init__(self, itemid=None, stream=ZERO, width=ZERO):
+        self.next = None
+        self.itemid = itemid
+        self.stream = stream
+        self.width = width
+        self.vspanset = None
+        self.homedoc = ZERO
+        self.text = ""
+
+    def __repr__(self):
+        return "<Item %s %s %s>" % (self.itemid, tumblerstr(self.stream),
+                                    tumblerstr(self.width))
+
+def items(first):
+    """Iterate over a linked item set."""
+    while first is not None:
+        yield first
+        first = first.next
+
+def onitemlist(item, slot):
+    """Append item to the end of the list that slot heads; return it."""
+    item.next = None
+    if slot.next is None:
+        slot.next = item
+    else:
+        temp = slot.next
+        while temp.next is not None:
+            temp = temp.next
+        temp.next = item
+    return item
+
+
+class SpanPair:
+    __slots__ = ("stream1", "stream2", "widthofspan", "nextspanpair")
+
+    def __init__(self, stream1=ZERO, stream2=ZERO, widthofspan=ZERO):
+        self.stream1 = stream1
+        self.stream2 = stream2
+        self.widthofspan = widthofspan
+        self.nextspanpair = None
+
+
+class BertEntry:
+    __slots__ = ("connection", "created", "modified", "type", "count")
+
+    def __init__(self, connection, created, type):
+        self.connection = connection
+        self.created = created
+        self.modified = False
+        self.type = type
+        self.count = 1
+
+
+def _int32(num):
+    num &= 0xffffffff
+    return num - 0x100000000 if num & 0x80000000 else num
+
+def _short(num):
+    num &= 0xffff
+    return num - 0x10000 if num & 0x8000 else num
+
+
+# ================================================================ BACKEND
+class Backend:
+    """A single-user back-end with an in-memory granfilade and spanfilade.
+
+    Bytes given to write() are parsed and executed as soon as a request is
+    complete; the replies are collected for read().  After a request that
+    crashes the C back-end, or after QUIT, the back-end is dead: read()
+    returns only what had been flushed and write() raises BrokenPipeError.
+    """
+
+    def __init__(self):
+        self.granf = createenf(GRAN)
+        self.spanf = createenf(SPAN)
+        self.bert = {}
+        self.account = DEFAULTACCOUNT
+        self.connection = 0
+        self.input = bytearray()
+        self.pos = 0
+        self.eof = 0
+        self.output = []
+        self.outbuf = ""
+        self.outpos = 0
+        self.reply = []
+        self.charinbuff = 0
+        self.charbuff = ""
+        self.established = 0
+        self.alive = 1
+        self.error = None
+        self.requests = 0
+
+    def __repr__(self):
+        state = self.alive and "alive" or "dead"
+        return "<%s %s after %d requests>" % (
+            self.__class__.__name__, state, self.requests)
+
+    # ---------------------------------------------------------- stream side
+    def write(self, data):
+        if not self.alive:
+            raise BrokenPipeError("back-end has exited")
+        self.input.extend(data)
+        self.run()
+
+    def read(self, length):
+        if self.output:
+            self.outbuf = self.outbuf[self.outpos:] + "".join(self.output)
+            self.outpos = 0
+            self.output = []
+        data = self.outbuf[self.outpos:self.outpos + length]
+        self.outpos = self.outpos + len(data)
+        return data
+
+    def close(self):
+        self.eof = 1
+        self.run()
+        self.alive = 0
+
+    def run(self):
+        """Execute every complete request waiting in the input."""
+        while self.alive and self.pos < len(self.input) or \
+                self.alive and self.eof:
+            start = self.pos
+            self.reply = []
+            try:
+                if self.established:
+                    self.xanadu()
+                else:
+                    self.establishprotocol()
+            except _Starved:
+                self.pos = start
+                break
+            except BackendExit:
+                self.output.extend(self.reply)
+                self.alive = 0
+            except Exception as error:
+                reply = "".join(self.reply)
+                self.output.append(reply[:(len(reply) - 1) // BUFSIZ
+                                          * BUFSIZ])
+                self.error = error
+                self.alive = 0
+            else:
+                self.output.extend(self.reply)
+        del self.input[:self.pos]
+        self.pos = 0
+
+    def establishprotocol(self):
+        self.charinbuff = 0
+        while self.pullc() != "\n": pass
+        ch = self.pullc()
+        while ch == "\n":
+            ch = self.pullc()
+        if ch == "P" and self.pullc() == "0" and self.pullc() == "~":
+            self.reply.append("\nP0~")
+            self.established = 1
+        else:
+            self.reply.append("\nP?~")
+            raise BackendExit("bad protocol")
+
+    def xanadu(self):
+        request = self.getrequest()
+        if request is not None:
+            self.requests = self.requests + 1
+            REQUESTFNS.get(request, Backend.nullfun)(self)
+
+    # ------------------------------------------------------------- input
+    def pullc(self):
+        if self.charinbuff:
+            self.charinbuff = 0
+            return self.charbuff
+        if self.pos >= len(self.input):
+            if self.eof:
+                raise BackendExit("EOF in pullc")
+            raise _Starved
+        ch = self.input[self.pos] & 0x7f
+        self.pos = self.pos + 1
+        return chr(ch)
+
+    def pushc(self, ch):
+        self.charinbuff = 1
+        self.charbuff = ch
+
+    def getrequest(self):
+        self.charinbuff = 0
+        num, flag = 0, 0
+        while 1:
+            c = self.pullc()
+            if c == "\0" or not c.isdigit(): break
+            num = _int32(num * 10 + ord(c) - 48)
+            flag = 1
+        if flag and c in "~\n" and 0 <= num < NREQUESTS:
+            return num
+        return None
+
+    def getnum(self):
+        num, flag = 0, 0
+        while 1:
+            c = self.pullc()
+            if c == "\0" or not c.isdigit(): break
+            num = _int32(num * 10 + ord(c) - 48)
+            flag = 1
+        self.pushc(c)
+        return flag, num
+
+    def getnumber(self):
+        num, flag = 0, 0
+        while 1:
+            c = self.pullc()
+            if c == "\0" or not c.isdigit(): break
+            num = _int32(num * 10 + ord(c) - 48)
+            flag = 1
+        return flag and c in "~\n", num
+
+    def eatchar(self, c):
+        m = self.pullc()
+        if m != c:
+            self.pushc(m)
+            return 0
+        return 1
+
+    def gettumbler(self):
+        """Return (ok, tumbler); the tumbler is what was read so far."""
+        flag, num = self.getnum()
+        exp = _short(-num)
+        mantissa = [0] * NPLACES
+        i = 0
+        while 1:
+            c = self.pullc()
+            if c != ".":
+                self.pushc(c)
+                break
+            flag, value = self.getnum()
+            if not flag: break
+            if i > NPLACES:
+                return 0, (0, exp, tuple(mantissa))
+            if i < NPLACES:
+                mantissa[i] = value & DIGITMASK
+            i = i + 1
+        t = (0, exp, tuple(mantissa))
+        return self.pullc() in "~\n", t
+
+    def getspan(self, itemid):
+        span = Item(itemid)
+        ok, span.stream = self.gettumbler()
+        if ok:
+            ok, span.width = self.gettumbler()
+        return ok, span
+
+    def getspanset(self, itemid):
+        head = slot = Item()
+        ok, num = self.getnumber()
+        if not ok:
+            return 0, None
+        while num > 0:
+            num = num - 1
+            ok, span = self.getspan(itemid)
+            if not ok:
+                return 0, head.next
+            slot.next = slot = span
+        return 1, head.next
+
+    def getvspec(self):
+        vspec = Item(VSPECID)
+        ok, vspec.stream = self.gettumbler()
+        if ok:
+            ok, vspec.vspanset = self.getspanset(VSPANID)
+        return ok, vspec
+
+    def getspecset(self):
+        head = slot = Item()
+        ok, num = self.getnumber()
+        if not ok:
+            return 0, None
+        while num > 0:
+            num = num - 1
+            c = self.pullc()
+            if c not in "sv":
+                return 0, head.next
+            c1 = self.pullc()
+            if c1 not in "~\n":
+                return 0, head.next
+            if c == "s":
+                ok, item = self.getspan(ISPANID)
+            else:
+                ok, item = self.getvspec()
+            if not ok:
+                return 0, head.next
+            slot.next = slot = item
+        return 1, head.next
+
+    def gettextset(self):
+        textset = []
+        ok, num = self.getnumber()
+        if not ok:
+            return 0, textset
+        while num > 0:
+            num = num - 1
+            if not self.eatchar("t"):
+                return 0, textset
+            ok, length = self.getnumber()
+            if not ok:
+                return 0, textset
+            textset.append("".join([self.pullc() for i in range(length)]))
+        return 1, textset
+
+    def getcutseq(self):
+        ok, ncuts = self.getnumber()
+        if not (ok and ncuts in (3, 4)):
+            return 0, []
+        cuts = []
+        for i in range(ncuts):
+            ok, cut = self.gettumbler()
+            cuts.append(cut)
+            if not ok:
+                return 0, cuts
+        return 1, cuts
+
+    # ------------------------------------------------------------ output
+    def putnumber(self, num):
+        self.reply.append("%d~" % num)
+
+    def puttumbler(self, t):
+        self.reply.append(puttumbler(t))
+
+    def putspan(self, span):
+        self.reply.append(puttumbler(span.stream) + puttumbler(span.width))
+
+    def putitemset(self, itemset):
+        count = 0
+        item = itemset
+        while item is not None:
+            while item.itemid == TEXTID and item.next is not None and \
+                    item.next.itemid == TEXTID:
+                item = item.next
+            count = count + 1
+            item = item.next
+        self.putnumber(count)
+        item = itemset
+        while item is not None:
+            if item.itemid == TEXTID:
+                texts = []
+                while 1:
+                    texts.append(item.text)
+                    if item.next is None or item.next.itemid != TEXTID:
+                        break
+                    item = item.next
+                text = "".join(texts)
+                self.reply.append("t%d~%s" % (len(text), text))
+            else:
+                self.putitem(item)
+            item = item.next
+
+    def putitem(self, item):
+        if item.itemid == ISPANID:
+            self.reply.append("s~")
+            self.putspan(item)
+        elif item.itemid == VSPANID:
+            self.putspan(item)
+        elif item.itemid == VSPECID:
+            self.reply.append("v~")
+            self.puttumbler(item.stream)
+            self.putitemset(item.vspanset)
+        elif item.itemid == ADDRESSID:
+            self.puttumbler(item.stream)
+
+    def putspanpairset(self, pairset):
+        pairs = []
+        while pairset is not None:
+            pairs.append(pairset)
+            pairset = pairset.nextspanpair
+        self.putnumber(len(pairs))
+        for pair in pairs:
+            self.reply.append(puttumbler(pair.stream1) +
+                              puttumbler(pair.stream2) +
+                              puttumbler(pair.widthofspan))
+
+    def putrequestfailed(self):
+        self.reply.append("?")
+
+    # ---------------------------------------------------------- requests
+    def nullfun(self):
+        self.putrequestfailed()
+
+    def insert(self):
+        ok, docisa = self.gettumbler()
+        vsa, textset = ZERO, []
+        if ok:
+            ok, vsa = self.gettumbler()
+            if ok:
+                ok, textset = self.gettextset()
+        self.putnumber(INSERT)
+        self.doinsert(docisa, vsa, textset)
+
+    def retrievedocvspanset(self):
+        ok, docisa = self.gettumbler()
+        if ok:
+            ok, vspanset = self.doretrievedocvspanset(docisa)
+        if not ok:
+            return self.putrequestfailed()
+        self.putnumber(RETRIEVEDOCVSPANSET)
+        self.putitemset(vspanset)
+
+    def copy(self):
+        ok, docisa = self.gettumbler()
+        if ok:
+            ok, vsa = self.gettumbler()
+        if ok:
+            ok, specset = self.getspecset()
+        if not (ok and self.docopy(docisa, vsa, specset)):
+            return self.putrequestfailed()
+        self.putnumber(COPY)
+
+    def rearrange(self):
+        ok, docisa = self.gettumbler()
+        cuts = []
+        if ok:
+            ok, cuts = self.getcutseq()
+        self.putnumber(REARRANGE)
+        self.dorearrange(docisa, cuts)
+
+    def retrievev(self):
+        ok, specset = self.getspecset()
+        if ok:
+            ok, vstuffset = self.doretrievev(specset)
+        if not ok:
+            return self.putrequestfailed()
+        self.putnumber(RETRIEVEV)
+        self.putitemset(vstuffset)
+
+    def showrelationof2versions(self):
+        ok, version1 = self.getspecset()
+        if ok:
+            ok, version2 = self.getspecset()
+        if ok:
+            ok, pairs = self.doshowrelationof2versions(version1, version2)
+        if not ok:
+            return self.putrequestfailed()
+        self.putnumber(SHOWRELATIONOF2VERSIONS)
+        self.putspanpairset(pairs)
+
+    def createnewdocument(self):
+        isa = self.docreatenewdocument()
+        if isa is None:
+            return self.putrequestfailed()
+        self.putnumber(CREATENEWDOCUMENT)
+        self.puttumbler(isa)
+
+    def deletevspan(self):
+        ok, docisa = self.gettumbler()
+        vspan = Item(VSPANID)
+        if ok:
+            ok, vspan = self.getspan(VSPANID)
+        self.putnumber(DELETEVSPAN)
+        self.dodeletevspan(docisa, vspan)
+
+    def createnewversion(self):
+        ok, originaldocisa = self.gettumbler()
+        if ok:
+            ok, newdocisa = self.docreatenewversion(originaldocisa,
+                                                    originaldocisa)
+        if not ok:
+            return self.putrequestfailed()
+        self.putnumber(CREATENEWVERSION)
+        self.puttumbler(newdocisa)
+
+    def retrievedocvspan(self):
+        ok, docisa = self.gettumbler()
+        if ok:
+            ok, vspan = self.doretrievedocvspan(docisa)
+        if not ok:
+            return self.putrequestfailed()
+        self.putnumber(RETRIEVEDOCVSPAN)
+        self.putspan(vspan)
+
+    def quitxanadu(self):
+        self.putnumber(QUIT)
+        raise BackendExit("quit")
+
+    def followlink(self):
+        ok, whichend = self.getnumber()
+        if ok:
+            ok, linkisa = self.gettumbler()
+        if ok:
+            ok, specset = self.dofollowlink(linkisa, whichend)
+        if not ok:
+            return self.putrequestfailed()
+        self.putnumber(FOLLOWLINK)
+        self.putitemset(specset)
+
+    def finddocscontaining(self):
+        ok, specset = self.getspecset()
+        if ok:
+            ok, addressset = self.dofinddocscontaining(specset)
+        if not ok:
+            return self.putrequestfailed()
+        self.putnumber(FINDDOCSCONTAINING)
+        self.putitemset(addressset)
+
+    def createlink(self):
+        ok, docisa = self.gettumbler()
+        if ok:
+            ok, fromspecset = self.getspecset()
+        if ok:
+            ok, tospecset = self.getspecset()
+        if ok:
+            ok, threespecset = self.getspecset()
+        if ok:
+            linkisa = self.docreatelink(docisa, fromspecset, tospecset,
+                                        threespecset)
+        if not ok or linkisa is None:
+            return self.putrequestfailed()
+        self.putnumber(CREATELINK)
+        self.puttumbler(linkisa)
+
+    def retrieveendsets(self):
+        ok, specset = self.getspecset()
+        if ok:
+            ok, endsets = self.doretrieveendsets(specset)
+        if not ok:
+            return self.putrequestfailed()
+        self.putnumber(RETRIEVEENDSETS)
+        for endset in endsets:
+            self.putitemset(endset)
+
+    def findlinksfromtothree(self):
+        ok, fromset = self.getspecset()
+        if ok:
+            ok, toset = self.getspecset()
+        if ok:
+            ok, threeset = self.getspecset()
+        if ok:
+            ok, homeset = self.getspanset(ISPANID)
+        if ok:
+            ok, linkset = self.dofindlinksfromtothree(fromset, toset,
+                                                      threeset, homeset)
+        if not ok:
+            return self.putrequestfailed()
+        self.putnumber(FINDLINKSFROMTOTHREE)
+        self.putitemset(linkset)
+
+    def xaccount(self):
+        ok, self.account = self.gettumbler()
+        self.putnumber(XACCOUNT)
+
+    def myopen(self):
+        ok, t = self.gettumbler()
+        typeok, type = self.getnumber()
+        modeok, mode = self.getnumber()
+        newt = None
+        if type != 0:
+            newt = self.doopen(t, type, mode)
+        if newt is None:
+            return self.putrequestfailed()
+        self.putnumber(OPEN)
+        self.puttumbler(newt)
+
+    def myclose(self):
+        ok, t = self.gettumbler()
+        self.doclose(t)
+        self.putnumber(CLOSE)
+
+    def createnode_or_account(self):
+        ok, t = self.gettumbler()
+        isa = self.docreatenode_or_account(t)
+        if isa is None:
+            return self.putrequestfailed()
+        self.putnumber(CREATENODE_OR_ACCOUNT)
+        self.puttumbler(isa)
+
+    def dumpstate(self):
+        self.putnumber(DUMPSTATE)
+        out = ["g~1~"]
+        dumpnode(self.granf, 0, out)
+        out.append("s~1~")
+        dumpnode(self.spanf, 0, out)
+        self.reply.extend(out)
+
+    def resetstate(self):
+        # like the C back-end, the account set by XACCOUNT survives
+        self.granf = createenf(GRAN)
+        self.spanf = createenf(SPAN)
+        self.bert = {}
+        self.putnumber(RESETSTATE)
+
+    # -------------------------------------------------------------- BERT
+    def isthisusersdocument(self, tp):
+        return tumbleraccounteq(tp, self.account)
+
+    def checkforopen(self, tp, type, connection):
+        if type == NOBERTREQUIRED:
+            return 1
+        foundnonread = 0
+        for entry in self.bert.get(tp, []):
+            if connection == entry.connection:
+                if entry.type == READBERT:
+                    return type == READBERT and READBERT or -1
+                if entry.type == WRITEBERT:
+                    return WRITEBERT
+            elif entry.type != READBERT:
+                foundnonread = 1
+        if not foundnonread and (type == READBERT or
+                                 self.isthisusersdocument(tp)):
+            return 0
+        return -1
+
+    def addtoopen(self, tp, connection, created, type):
+        self.bert.setdefault(tp, []).insert(
+            0, BertEntry(connection, created, type))
+
+    def removefromopen(self, tp, connection):
+        entries = self.bert.get(tp, [])
+        for entry in entries:
+            if entry.connection == connection:
+                entry.count = entry.count - 1
+                if entry.count == 0:
+                    entries.remove(entry)
+                    if not entries:
+                        del self.bert[tp]
+                return
+
+    def incrementopen(self, tp, connection):
+        for entry in self.bert.get(tp, []):
+            if entry.connection == connection:
+                entry.count = entry.count + 1
+
+    def logbertmodified(self, tp, connection):
+        for entry in self.bert.get(tp, []):
+            if entry.connection == connection:
+                entry.modified = True
+                return
+
+    def doopen(self, tp, type, mode):
+        if mode == BERTMODECOPY:
+            ok, newtp = self.docreatenewversion(tp, self.account)
+            self.addtoopen(newtp, self.connection, True, type)
+            return newtp
+        state = self.checkforopen(tp, type, self.connection)
+        if state == 0:
+            self.addtoopen(tp, self.connection, False, type)
+            return tp
+        if mode == BERTMODECOPYIF:
+            if state != -1 and type != WRITEBERT and state != WRITEBERT:
+                self.incrementopen(tp, self.connection)
+                return tp
+            ok, newtp = self.docreatenewversion(tp, self.account)
+            self.addtoopen(newtp, self.connection, True, type)
+            return newtp
+        if mode == BERTMODEONLY:
+            if state == -1 or state == WRITEBERT:
+                return None
+            self.incrementopen(tp, self.connection)
+            return tp
+        raise EnfiladeError("DEFAULT CASE IN DOOPEN")
+
+    def doclose(self, tp):
+        self.removefromopen(tp, self.connection)
+        return True
+
+    def findorgl(self, isa, type):
+        if self.checkforopen(isa, type, self.connection) <= 0:
+            return None
+        return fetchorglgr(self.granf, isa)
+
+    # --------------------------------------------------------- do1.c
+    def doinsert(self, docisa, vsa, textset):
+        hint = (DOCUMENT, ATOM, TEXTATOM, docisa)
+        ispan = inserttextgr(self.granf, hint, textset)
+        if ispan is None:
+            return False
+        return self.docopy(docisa, vsa, Item(ISPANID, *ispan))
+
+    def docopy(self, docisa, vsa, specset):
+        ok, ispanset = self.specset2ispanset(specset, NOBERTREQUIRED)
+        if not ok:
+            return False
+        orgl = self.findorgl(docisa, WRITEBERT)
+        return orgl is not None and \
+            self.insertpm(docisa, orgl, vsa, ispanset) and \
+            self.insertspanf(docisa, ispanset, DOCISPAN)
+
+    def docopyinternal(self, docisa, vsa, specset):
+        ok, ispanset = self.specset2ispanset(specset, NOBERTREQUIRED)
+        if not ok:
+            return False
+        orgl = self.findorgl(docisa, NOBERTREQUIRED)
+        return orgl is not None and \
+            self.insertpm(docisa, orgl, vsa, ispanset) and \
+            self.insertspanf(docisa, ispanset, DOCISPAN)
+
+    def dorearrange(self, docisa, cuts):
+        orgl = self.findorgl(docisa, WRITEBERT)
+        if orgl is None:
+            return False
+        rearrangend(orgl, cuts, V)
+        self.logbertmodified(docisa, self.connection)
+        return True
+
+    def dodeletevspan(self, docisa, vspan):
+        orgl = self.findorgl(docisa, WRITEBERT)
+        if orgl is None or iszero(vspan.width):
+            return False
+        deletend(orgl, vspan.stream, vspan.width, V)
+        self.logbertmodified(docisa, self.connection)
+        return True
+
+    def docreatenewdocument(self):
+        return createorglgr(self.granf, (ACCOUNT, DOCUMENT, 0, self.account))
+
+    def docreatenode_or_account(self, isa):
+        return createorglgr(self.granf, (NODE, NODE, 0, isa))
+
+    def docreatenewversion(self, isa, wheretoput):
+        """Return (ok, newisa); newisa may be set even when ok is false."""
+        if tumbleraccounteq(isa, wheretoput) and \
+                self.isthisusersdocument(isa):
+            hint = (DOCUMENT, DOCUMENT, 0, isa)
+        else:
+            hint = (ACCOUNT, DOCUMENT, 0, wheretoput)
+        newisa = createorglgr(self.granf, hint)
+        if newisa is None:
+            return False, ZERO
+        orgl = self.findorgl(isa, NOBERTREQUIRED)
+        if orgl is None:
+            return False, newisa
+        vspan = Item(VSPANID, orgl.dsp[V], orgl.wid[V])
+        vspec = Item(VSPECID, isa)
+        vspec.vspanset = vspan
+        self.addtoopen(newisa, self.connection, True, WRITEBERT)
+        self.docopyinternal(newisa, vspan.stream, vspec)
+        self.logbertmodified(newisa, self.connection)
+        self.doclose(newisa)
+        return True, newisa
+
+    def doretrievedocvspan(self, docisa):
+        orgl = self.findorgl(docisa, READBERT)
+        if orgl is None:
+            return False, None
+        return True, Item(VSPANID, orgl.dsp[V], orgl.wid[V])
+
+    def doretrievedocvspanset(self, docisa):
+        orgl = self.findorgl(docisa, READBERT)
+        if orgl is None:
+            return False, None
+        if isemptyenfilade(orgl):
+            return True, None
+        return True, self.retrievevspansetpm(orgl)
+
+    def doretrievev(self, specset):
+        ok, ispanset = self.specset2ispanset(specset, READBERT)
+        if not ok:
+            return False, None
+        return True, self.ispanset2vstuffset(ispanset)
+
+    def dofinddocscontaining(self, specset):
+        ok, ispanset = self.specset2ispanset(specset, NOBERTREQUIRED)
+        if not ok:
+            return False, None
+        return True, self.finddocscontainingsp(ispanset)
+
+    def docreatelink(self, docisa, fromspecset, tospecset, threespecset):
+        linkisa = createorglgr(self.granf,
+                               (DOCUMENT, ATOM, LINKATOM, docisa))
+        if linkisa is None:
+            return None
+        ispan = Item(ISPANID, linkisa,
+                     tumblerincrement(ZERO, tumblerlength(linkisa) - 1, 1))
+        linkvsa = self.findnextlinkvsa(docisa)
+        if not self.docopy(docisa, linkvsa, ispan):
+            return None
+        link = self.findorgl(linkisa, NOBERTREQUIRED)
+        if link is None:
+            return None
+        ok, fromsporglset = self.specset2sporglset(fromspecset,
+                                                   NOBERTREQUIRED)
+        if not ok:
+            return None
+        ok, tosporglset = self.specset2sporglset(tospecset, NOBERTREQUIRED)
+        if not ok:
+            return None
+        ok, threesporglset = self.specset2sporglset(threespecset,
+                                                    NOBERTREQUIRED)
+        if not ok:
+            return None
+        fromvsa = maketumbler([1, 1])
+        tovsa = maketumbler([2, 1])
+        threevsa = maketumbler([3, 1])
+        if not (self.insertpm(linkisa, link, fromvsa, fromsporglset) and
+                self.insertpm(linkisa, link, tovsa, tosporglset)):
+            return None
+        if threesporglset is not None and \
+                not self.insertpm(linkisa, link, threevsa, threesporglset):
+            return None
+        if not (self.insertspanf(linkisa, fromsporglset, LINKFROMSPAN) and
+                self.insertspanf(linkisa, tosporglset, LINKTOSPAN)):
+            return None
+        if threesporglset is not None and \
+                not self.insertspanf(linkisa, threesporglset, LINKTHREESPAN):
+            return None
+        return linkisa
+
+    def findnextlinkvsa(self, docisa):
+        firstlink = maketumbler([2, 1])
+        ok, vspan = self.doretrievedocvspan(docisa)
+        vspanreach = ok and tumbleradd(vspan.stream, vspan.width) or ZERO
+        if tumblercmp(vspanreach, firstlink) == LESS:
+            return firstlink
+        return vspanreach
+
+    def dofollowlink(self, linkisa, whichend):
+        ok, sporglset = self.link2sporglset(linkisa, whichend,
+                                            NOBERTREQUIRED)
+        if not ok:
+            return False, None
+        return True, self.linksporglset2specset(sporglset.homedoc,
+                                                sporglset, NOBERTREQUIRED)
+
+    def doretrieveendsets(self, specset):
+        ok, sporglset = self.specset2sporglset(specset, NOBERTREQUIRED)
+        if not ok:
+            return False, None
+        homedoc = specset is not None and specset.stream or None
+        endsets = []
+        for spantype in (LINKFROMSPAN, LINKTOSPAN, LINKTHREESPAN):
+            space = (maketumbler([spantype]), maketumbler([1]))
+            found = self.retrievesporglsetinrange(sporglset, space)
+            endsets.append(self.linksporglset2specset(homedoc, found,
+                                                      NOBERTREQUIRED))
+        return True, endsets
+
+    def dofindlinksfromtothree(self, fromset, toset, threeset, homeset):
+        return True, self.findlinksfromtothreesp(fromset, toset, threeset)
+
+    def doshowrelationof2versions(self, version1, version2):
+        onezero = maketumbler([1])
+        for specset in (version1, version2):
+            for vspec in items(specset):
+                if vspec.itemid != VSPECID:
+                    continue
+                head = slot = Item()
+                for vspan in items(vspec.vspanset):
+                    if tumblercmp(vspan.stream, onezero) != LESS:
+                        slot.next = slot = Item(VSPANID, vspan.stream,
+                                                vspan.width)
+                vspec.vspanset = head.next
+        ok1, ispanset1 = self.specset2ispanset(version1, READBERT)
+        ok2, ispanset2 = self.specset2ispanset(version2, READBERT)
+        if not (ok1 and ok2):
+            return False, None
+        commonispans = intersectspansets(ispanset1, ispanset2, ISPANID)
+        return True, self.ispansetandspecsets2spanpairset(
+            commonispans, version1, version2)
+
+    # ----------------------------------------------------- orglinks.c
+    def insertpm(self, orglisa, orgl, vsa, sporglset):
+        if iszero(vsa):
+            return False
+        if tumblercmp(vsa, ZERO) == LESS:
+            raise EnfiladeError("insertpm called with negative vsa")
+        self.logbertmodified(orglisa, self.connection)
+        lstream = lwidth = homedoc = ZERO
+        for item in items(sporglset):
+            if item.itemid == ISPANID:
+                lstream, lwidth, homedoc = item.stream, item.width, ZERO
+            elif item.itemid == SPORGLID:
+                lstream, lwidth, homedoc = item.stream, item.width, \
+                    item.homedoc
+            if iszero(lwidth):
+                raise EnfiladeError("zero width in insertpm")
+            shift = tumblerlength(vsa) - 1
+            widthv = tumblerincrement(ZERO, shift,
+                                      tumblerintdiff(lwidth, ZERO))
+            if iszero(widthv):
+                raise EnfiladeError("zero V width in insertpm")
+            insertnd(orgl, [lstream, vsa], [lwidth, widthv], homedoc, V)
+            vsa = tumbleradd(vsa, widthv)
+        return True
+
+    def retrievevspansetpm(self, orgl):
+        head = Item()
+        wid = orgl.wid[V]
+        if is1story(wid):
+            self.putvspaninlist((orgl.dsp[V], wid), head)
+            return head.next
+        linkwid = justify((wid[0], wid[1], (wid[2][0], 0) + wid[2][2:]))
+        maxwid = self.maxtextwid(orgl, ZERO, ZERO)
+        textwid = (maxwid[0], maxwid[1], (0,) + maxwid[2][1:])
+        self.putvspaninlist((ZERO, textwid), head)
+        self.putvspaninlist((linkwid, linkwid), head)
+        return head.next
+
+    def maxtextwid(self, crum, voffset, maxwid):
+        if _istextcrum(crum):
+            return tumblermax(tumbleradd(voffset, crum.dsp[V]), maxwid)
+        localvoffset = tumbleradd(voffset, crum.dsp[V])
+        for son in crum.sons:
+            if not _islinkcrum(son):
+                maxwid = self.maxtextwid(son, localvoffset, maxwid)
+        return maxwid
+
+    def putvspaninlist(self, span, head):
+        stream, width = span
+        ptr = head.next
+        if ptr is None:
+            head.next = Item(VSPANID, stream, width)
+            return
+        last = None
+        newspanend = tumbleradd(stream, width)
+        while ptr is not None:
+            oldspanend = tumbleradd(ptr.stream, ptr.width)
+            spancmp = tumblercmp(stream, oldspanend)
+            if spancmp == EQUAL:
+                ptr.width = tumbleradd(ptr.width, width)
+                return
+            if spancmp == GREATER:
+                last, ptr = ptr, ptr.next
+                continue
+            spancmp = tumblercmp(ptr.stream, newspanend)
+            if spancmp == EQUAL:
+                ptr.stream = stream
+                ptr.width = tumbleradd(width, ptr.width)
+                return
+            if spancmp == GREATER:
+                new = Item(VSPANID, stream, width)
+                new.next = ptr
+                if ptr is not head.next:
+                    last.next = new
+                else:
+                    head.next = new
+                return
+            startcmp = tumblercmp(stream, ptr.stream)
+            endcmp = tumblercmp(newspanend, oldspanend)
+            if startcmp > LESS and endcmp < GREATER:
+                return
+            if startcmp == EQUAL:
+                if endcmp == GREATER:
+                    ptr.width = width
+                    return
+            elif startcmp == LESS:
+                ptr.stream = stream
+                if endcmp == GREATER:
+                    ptr.width = width
+                else:
+                    ptr.width = tumblersub(oldspanend, stream)
+            elif endcmp == GREATER:
+                ptr.width = tumblersub(newspanend, ptr.stream)
+                return
+            last, ptr = ptr, ptr.next
+        last.next = Item(VSPANID, stream, width)
+
+    def permute(self, orgl, restrictionset, restrictionindex, slot,
+                targetindex):
+        save = slot
+        for restriction in items(restrictionset):
+            slot = self.span2spanset(orgl, restriction, restrictionindex,
+                                     slot, targetindex)
+        return save
+
+    def span2spanset(self, orgl, restriction, restrictionindex, slot,
+                     targetindex):
+        span = (restriction.stream, restriction.width)
+        contexts = retrieverestricted(orgl, span, restrictionindex, None,
+                                      targetindex)
+        for context in contexts:
+            stream, width = context2span(context, span, restrictionindex,
+                                         targetindex)
+            slot = onitemlist(Item(_index2itemid(targetindex, context),
+                                   stream, width), slot)
+        return slot
+
+    def vspanset2ispanset(self, orgl, vspanset, slot):
+        return self.permute(orgl, vspanset, V, slot, I)
+
+    def ispan2vspanset(self, orgl, ispan, slot):
+        return self.permute(orgl, ispan, I, slot, V)
+
+    def ispanset2vstuffset(self, ispanset):
+        head = slot = Item()
+        for ispan in items(ispanset):
+            span = (ispan.stream, ispan.width)
+            contexts = retrieveinspan(self.granf, ispan.stream,
+                                      tumbleradd(ispan.stream, ispan.width))
+            for context in contexts:
+                if context.infotype == GRANTEXT:
+                    vstuff = Item(TEXTID)
+                    vstuff.text = context2vtext(context, span)
+                    if not vstuff.text:
+                        continue
+                elif context.infotype == GRANORGL:
+                    vstuff = Item(ADDRESSID, context.totaloffset[WIDTH])
+                else:
+                    continue
+                slot.next = slot = vstuff
+        return head.next
+
+    # -------------------------------------------------------- sporgl.c
+    def specset2ispanset(self, specset, type):
+        head = slot = Item()
+        for item in items(specset):
+            if item.itemid == ISPANID:
+                slot.next = slot = item
+            elif item.itemid == VSPECID:
+                if iszero(item.stream):
+                    raise EnfiladeError("retrieve called with docisa 0")
+                orgl = self.findorgl(item.stream, type)
+                if orgl is None:
+                    return False, head.next
+                slot = self.vspanset2ispanset(orgl, item.vspanset, slot)
+        return True, head.next
+
+    def specset2sporglset(self, specset, type):
+        head = slot = Item()
+        for item in items(specset):
+            if item.itemid == ISPANID:
+                slot.next = slot = item
+            elif item.itemid == VSPECID:
+                slot = self.vspanset2sporglset(item.stream, item.vspanset,
+                                               slot, type)
+                if slot is None:
+                    return False, head.next
+        slot.next = None
+        return True, head.next
+
+    def vspanset2sporglset(self, docisa, vspanset, slot, type):
+        orgl = self.findorgl(docisa, type)
+        if orgl is None:
+            return None
+        ispanset = Item()
+        for vspan in items(vspanset):
+            self.vspanset2ispanset(orgl, vspan, ispanset)
+            for ispan in items(ispanset.next):
+                sporgl = Item(SPORGLID, ispan.stream, ispan.width)
+                sporgl.homedoc = docisa
+                slot.next = slot = sporgl
+            ispanset.next = None
+        return slot
+
+    def link2sporglset(self, linkisa, whichend, type):
+        orgl = self.findorgl(linkisa, type)
+        if orgl is None:
+            return False, None
+        vspan = (tumblerincrement(ZERO, 0, whichend),
+                 tumblerincrement(ZERO, 0, 1))
+        contexts = retrieverestricted(orgl, vspan, V, None, I)
+        if not contexts:
+            return False, None
+        head = slot = Item()
+        for context in contexts:
+            slot.next = slot = _contextintosporgl(context, I)
+        return True, head.next
+
+    def linksporglset2specset(self, homedoc, sporglset, type):
+        head = slot = Item()
+        sporgl = sporglset
+        while sporgl is not None:
+            if iszero(sporgl.homedoc):
+                if iszero(sporgl.width):
+                    raise EnfiladeError("zero width in "
+                                        "linksporglset2specset")
+                spec = Item(ISPANID, sporgl.stream, sporgl.width)
+            else:
+                spec = Item(VSPECID, homedoc)
+                vspanset = Item()
+                sporgl = self.sporglset2vspanset(homedoc, sporgl, vspanset,
+                                                 type)
+                spec.vspanset = vspanset.next
+            slot.next = slot = spec
+            sporgl = sporgl.next
+        return head.next
+
+    def sporglset2vspanset(self, homedoc, sporgl, slot, type):
+        """Convert a run of sporgls from one document to V-spans in
+        homedoc; returns the last sporgl consumed."""
+        orgl = self.findorgl(homedoc, type)
+        while 1:
+            self.ispan2vspanset(orgl, Item(ISPANID, sporgl.stream,
+                                           sporgl.width), slot)
+            nextsporgl = sporgl.next
+            if nextsporgl is None or nextsporgl.itemid != SPORGLID or \
+                    nextsporgl.homedoc != sporgl.homedoc:
+                return sporgl
+            sporgl = nextsporgl
+            if iszero(sporgl.width):
+                raise EnfiladeError("zero width in sporglset2vspanset")
+
+    # -------------------------------------------------------- spanf1.c
+    def insertspanf(self, isa, sporglset, spantype):
+        origin = prefixtumbler(isa, spantype)
+        for item in items(sporglset):
+            if item.itemid == ISPANID:
+                lstream, lwidth, homedoc = item.stream, item.width, isa
+            elif item.itemid == SPORGLID:
+                lstream, lwidth, homedoc = item.stream, item.width, \
+                    item.homedoc
+            elif item.itemid == TEXTID:
+                lstream, homedoc = isa, isa
+                lwidth = justify((0, 0, (0, len(item.text)) + NOPLACES[2:]))
+            else:
+                raise EnfiladeError("insertspanf: bad itemid")
+            insertnd(self.spanf, [origin, lstream], [ZERO, lwidth], homedoc,
+                     SPANRANGE)
+        return True
+
+    def finddocscontainingsp(self, ispanset):
+        docspace = (maketumbler([DOCISPAN]), maketumbler([1]))
+        head = slot = Item()
+        for ispan in items(ispanset):
+            contexts = retrieverestricted(
+                self.spanf, docspace, ORGLRANGE,
+                (ispan.stream, ispan.width), SPANRANGE)
+            for context in contexts:
+                docid = beheadtumbler(context.totaloffset[ORGLRANGE])
+                if _isinlinklist(head.next, docid):
+                    continue
+                slot = onitemlist(Item(ADDRESSID, docid), slot)
+        return head.next
+
+    def findlinksfromtothreesp(self, fromset, toset, threeset):
+        endsets = [(fromset, LINKFROMSPAN), (toset, LINKTOSPAN),
+                   (threeset, LINKTHREESPAN)]
+        sporglsets = []
+        for specset, spantype in endsets:
+            if specset is not None:
+                ok, sporglset = self.specset2sporglset(specset,
+                                                       NOBERTREQUIRED)
+                sporglsets.append(sporglset)
+            else:
+                sporglsets.append(None)
+        linksets = []
+        for (specset, spantype), sporglset in zip(endsets, sporglsets):
+            if specset is None:
+                linksets.append(None)
+                continue
+            linkset = self.sporglset2linkset(sporglset, spantype)
+            if linkset is None:
+                return None
+            linksets.append(linkset)
+        return _intersectlinksets(*linksets)
+
+    def sporglset2linkset(self, sporglset, spantype):
+        head = Item()
+        orglrange = (prefixtumbler(ZERO, spantype),
+                     prefixtumbler(maketumbler([100]), 0))
+        for sporgl in items(sporglset):
+            contexts = retrieverestricted(
+                self.spanf, (sporgl.stream, sporgl.width), SPANRANGE,
+                orglrange, ORGLRANGE)
+            for context in contexts:
+                _onlinklist(head,
+                            beheadtumbler(context.totaloffset[ORGLRANGE]))
+        return head.next
+
+    def retrievesporglsetinrange(self, sporglset, whichspace):
+        head = slot = Item()
+        for sporgl in items(sporglset):
+            contexts = retrieverestricted(
+                self.spanf, (sporgl.stream, sporgl.width), SPANRANGE,
+                whichspace, ORGLRANGE)
+            for context in contexts:
+                slot.next = slot = _contextintosporgl(context, SPANRANGE)
+        return head.next
+
+    # ----------------------------------------------------- correspond.c
+    def ispansetandspecsets2spanpairset(self, ispanset, specset1,
+                                        specset2):
+        if ispanset is None:
+            return None
+        specset1, specset2 = self.restrictspecsetsaccordingtoispans(
+            ispanset, specset1, specset2)
+        return _makespanpairset(ispanset, specset1, specset2)
+
+    def restrictspecsetsaccordingtoispans(self, ispanset, specset1,
+                                          specset2):
+        s1 = self.restrictvspecsetovercommonispans(ispanset, specset1)
+        if s1 is not None and specset1 is not None:
+            specset1 = _removespansnotinoriginal(s1, specset1)
+        s2 = self.restrictvspecsetovercommonispans(ispanset, specset2)
+        if s2 is not None and specset2 is not None:
+            specset2 = _removespansnotinoriginal(s2, specset2)
+        return specset1, specset2
+
+    def restrictvspecsetovercommonispans(self, ispanset, specset):
+        head = slot = Item()
+        for ispan in items(ispanset):
+            while specset is not None:
+                orgl = self.findorgl(specset.stream, READBERT)
+                if orgl is None:
+                    raise EnfiladeError("restrictvspecsetovercommonispans")
+                docvspanset = Item()
+                self.ispan2vspanset(orgl, ispan, docvspanset)
+                vspec = Item(VSPECID, specset.stream)
+                vspec.vspanset = docvspanset.next
+                slot.next = slot = vspec
+                specset = specset.next
+        slot.next = None
+        return head.next
+
+
+def _index2itemid(index, context):
+    if context.enftype == POOM:
+        return index == I and ISPANID or VSPANID
+    return ISPANID
+
+def _istextcrum(crum):
+    return crum.dsp[V][2][1] == 0 and is1story(crum.wid[V])
+
+def _islinkcrum(crum):
+    return crum.dsp[V][2][0] == 1 and crum.dsp[V][2][1] != 0
+
+def _contextintosporgl(context, index):
+    if iszero(context.wid[index]):
+        raise EnfiladeError("zero width in contextintosporgl")
+    sporgl = Item(SPORGLID, context.totaloffset[index], context.wid[index])
+    sporgl.homedoc = context.homedoc
+    return sporgl
+
+def _isinlinklist(linkset, isa):
+    for link in items(linkset):
+        if link.stream == isa:
+            return True
+    return False
+
+def _onlinklist(head, isa):
+    new = Item(ADDRESSID, isa)
+    if head.next is None:
+        head.next = new
+        return
+    temp = head.next
+    while temp.next is not None:
+        if temp.stream == isa:
+            return
+        temp = temp.next
+    temp.next = new
+
+def _intersectlinksets(linkset1, linkset2, linkset3):
+    present = [ls for ls in (linkset1, linkset2, linkset3) if ls]
+    if not present:
+        return None
+    if len(present) == 1:
+        return present[0]
+    head = slot = Item()
+    first, second = present[0], present[1]
+    third = len(present) == 3 and present[2] or None
+    for temp1 in items(first):
+        for temp2 in items(second):
+            if third is not None:
+                for temp3 in items(third):
+                    if temp1.stream == temp2.stream == temp3.stream:
+                        slot.next = slot = Item(ADDRESSID, temp1.stream)
+            elif temp1.stream == temp2.stream:
+                slot.next = slot = Item(ADDRESSID, temp1.stream)
+    return head.next
+
+def intersectspansets(set1, set2, spantype):
+    if set1 is None or set2 is None:
+        return None
+    head = slot = Item()
+    for span1 in items(set1):
+        for span2 in items(set2):
+            span = _comparespans(span1, span2, spantype)
+            if span is not None:
+                slot.next = slot = span
+    return head.next
+
+def _comparespans(span1, span2, spantype):
+    if iszero(span1.width) or iszero(span2.width):
+        return None
+    return _spanintersection(span1, span2, spantype)
+
+def _spanintersection(aspan, bspan, spantype):
+    aend = tumbleradd(aspan.stream, aspan.width)
+    bend = tumbleradd(bspan.stream, bspan.width)
+    if tumblercmp(bspan.stream, aend) != LESS or \
+            tumblercmp(aspan.stream, bend) != LESS:
+        return None
+    cmp = tumblercmp(aspan.stream, bspan.stream)
+    if cmp == EQUAL:
+        stream = aspan.stream
+        if tumblercmp(aend, bend) == GREATER:
+            width = bspan.width
+        else:
+            width = aspan.width
+    elif cmp == GREATER:
+        stream = aspan.stream
+        if tumblercmp(aend, bend) == GREATER:
+            width = tumblersub(bend, aspan.stream)
+        else:
+            width = aspan.width
+    else:
+        stream = bspan.stream
+        if tumblercmp(bend, aend) == GREATER:
+            width = tumblersub(aend, bspan.stream)
+        else:
+            width = bspan.width
+    return Item(spantype, stream, width)
+
+def _removespansnotinoriginal(original, specset):
+    first = last = None
+    for new in items(specset):
+        for old in items(original):
+            if tumblercmp(new.stream, old.stream) != EQUAL:
+                continue
+            okspec = Item(VSPECID, new.stream)
+            okspec.vspanset = intersectspansets(new.vspanset, old.vspanset,
+                                                VSPANID)
+            if first is None:
+                first = okspec
+            else:
+                last.next = okspec
+            last = okspec
+    if last is None:
+        raise EnfiladeError("removespansnotinoriginal: no common document")
+    last.next = None
+    return first
+
+def _makespanpairset(ispanset, specset1, specset2):
+    specsets = [specset1, specset2]
+    head = slot = SpanPair()
+    for ispan in items(ispanset):
+        if slot is None:
+            raise EnfiladeError("makespanpairset: null pair set")
+        slot.nextspanpair = _makespanpairsforispan(ispan.width, specsets)
+        slot = slot.nextspanpair
+    if slot is None:
+        raise EnfiladeError("makespanpairset: null pair set")
+    slot.nextspanpair = None
+    return head.nextspanpair
+
+def _makespanpairsforispan(iwidth, specsets):
+    head = slot = SpanPair()
+    sum = ZERO
+    spec1, spec2 = specsets
+    span1, span2 = spec1.vspanset, spec2.vspanset
+    while span1 is not None and span2 is not None and \
+            tumblercmp(iwidth, sum) == GREATER:
+        cmp = tumblercmp(span1.width, span2.width)
+        if cmp != GREATER:
+            slot.nextspanpair = _makespanpair(spec1, span1, spec2, span2,
+                                              span1.width)
+            sum = tumbleradd(sum, span1.width)
+            if cmp == EQUAL:
+                span2 = span2.next
+            else:
+                span2.stream = tumbleradd(span2.stream, span1.width)
+                span2.width = tumblersub(span2.width, span1.width)
+            span1 = span1.next
+        else:
+            slot.nextspanpair = _makespanpair(spec1, span1, spec2, span2,
+                                              span2.width)
+            sum = tumbleradd(sum, span2.width)
+            span1.stream = tumbleradd(span1.stream, span2.width)
+            span1.width = tumblersub(span1.width, span2.width)
+            span2 = span2.next
+        spec1.vspanset = span1
+        spec2.vspanset = span2
+        if span1 is None:
+            spec1 = specsets[0] = spec1.next
+            if spec1 is not None:
+                span1 = spec1.vspanset
+        if span2 is None:
+            spec2 = specsets[1] = spec2.next
+            if spec2 is not None:
+                span2 = spec2.vspanset
+        slot = slot.nextspanpair
+    return head.nextspanpair
+
+def _makespanpair(spec1, span1, spec2, span2, width):
+    return SpanPair(docidandvstream2tumbler(spec1.stream, span1.stream),
+                    docidandvstream2tumbler(spec2.stream, span2.stream),
+                    width)
+
+
+REQUESTFNS = {
+    INSERT: Backend.insert,
+    RETRIEVEDOCVSPANSET: Backend.retrievedocvspanset,
+    COPY: Backend.copy,
+    REARRANGE: Backend.rearrange,
+    RETRIEVEV: Backend.retrievev,
+    SHOWRELATIONOF2VERSIONS: Backend.showrelationof2versions,
+    CREATENEWDOCUMENT: Backend.createnewdocument,
+    DELETEVSPAN: Backend.deletevspan,
+    CREATENEWVERSION: Backend.createnewversion,
+    RETRIEVEDOCVSPAN: Backend.retrievedocvspan,
+    QUIT: Backend.quitxanadu,
+    FOLLOWLINK: Backend.followlink,
+    FINDDOCSCONTAINING: Backend.finddocscontaining,
+    CREATELINK: Backend.createlink,
+    RETRIEVEENDSETS: Backend.retrieveendsets,
+    FINDLINKSFROMTOTHREE: Backend.findlinksfromtothree,
+    XACCOUNT: Backend.xaccount,
+    OPEN: Backend.myopen,
+    CLOSE: Backend.myclose,
+    CREATENODE_OR_ACCOUNT: Backend.createnode_or_account,
+    RESETSTATE: Backend.resetstate,
+    DUMPSTATE: Backend.dumpstate,
+}
@@ -0,0 +1,75 @@
+"""Manifest of the golden scenarios, for running some without importing all.
+
+The manifest lists every scenario of ALL_SCENARIOS, in order, as its
+category, name, module, function and source file.  It is built by
+importing the whole package once and cached in manifest.json beside this
+file with the sizes and mtimes of the package's sources, so it is
+rebuilt whenever a scenario module changes and otherwise costs only a
+stat of each.
+ScenarioRef.load() imports just the module a scenario is defined in.
+"""
+
+import importlib
+import json
+import os
+from collections import namedtuple
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+REPO_ROOT = PACKAGE_DIR.parent.parent
+MANIFEST_PATH = PACKAGE_DIR / "manifest.json"
+
+
+class ScenarioRef(namedtuple("ScenarioRef", "category name module function path")):
+    """A scenario in the manifest; path is relative to the repository root."""
+
+    def load(self):
+        """Import the scenario's module and return the scenario function."""
+        return getattr(importlib.import_module(self.module), self.function)
+
+
+def sources_stats():
+    """The mtime and size of each of the package's sources, by path."""
+    stats = {}
+    for path in sorted(PACKAGE_DIR.rglob("*.py")):
+        st = path.stat()
+        stats[path.relative_to(PACKAGE_DIR).as_posix()] = [st.st_mtime_ns, st.st_size]
+    return stats
+
+
+def build():
+    """Import every scenario and describe it."""
+    import inspect
+    from . import ALL_SCENARIOS
+
+    refs = []
+    for category, name, func in ALL_SCENARIOS:
+        module = importlib.import_module(func.__module__)
+        if getattr(module, func.__name__, None) is not func:
+            raise ValueError(f"{category}/{name}: {func.__module__}.{func.__name__} "
+                             "is not the scenario function")
+        path = Path(inspect.getsourcefile(func)).resolve().relative_to(REPO_ROOT)
+        refs.append(ScenarioRef(category, name, func.__module__, func.__name__,
+                                path.as_posix()))
+    return refs
+
+
+def manifest(rebuild=False):
+    """The scenarios as ScenarioRefs, rebuilding the manifest if it is stale."""
+    sources = sources_stats()
+    if not rebuild:
+        try:
+            cached = json.loads(MANIFEST_PATH.read_text())
+            if cached.get("sources") == sources:
+                return [ScenarioRef(*entry) for entry in cached["scenarios"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    refs = build()
+    data = {"sources": sources, "scenarios": [list(ref) for ref in refs]}
+    try:
+        temp = MANIFEST_PATH.with_suffix(f".{os.getpid()}.tmp")
+        temp.write_text(json.dumps(data, indent=1) + "\n")
+        os.replace(temp, MANIFEST_PATH)
+    except OSError:
+        pass
+    return refs
@@ -3,6 +3,11 @@
 
 # Ported to Python 3 - January 2026
 
+import io
+import json
+import time
+import zlib
+
 from client import *
 
 def verify(result, expected=True):
@@ -189,4 +194,174 @@ verify(btype, SpecSet([VSpec(Address(1, 1, 0, 1, 0, 2),
                               Span(Address(1, 1), Offset(0, 1)),
                               Span(Address(1, 1), Offset(0, 1))])]))
 
+# in-process back-end
+x = loopbackconnect()
+x.account(Address(1, 1, 0, 1))
+doc = x.create_document()
+verify(doc, Address(1, 1, 0, 1, 0, 1))
+mydoc = x.open_document(doc, READ_WRITE, CONFLICT_FAIL)
+x.insert(mydoc, Address(1, 1), ["hello", " world"])
+specset = SpecSet(VSpec(mydoc, [Span(Address(1, 1), Offset(0, 11))]))
+verify(x.retrieve_contents(specset), ["hello world"])
+x.delete(mydoc, Address(1, 1), Offset(0, 6))
+verify(x.retrieve_vspanset(mydoc),
+       VSpec(mydoc, [Span(Address(1, 1), Offset(0, 5))]))
+x.close_document(mydoc)
+
+# a reset back-end allocates from scratch again
+x.reset_state()
+verify(x.create_document(), Address(1, 1, 0, 1, 0, 1))
+x.quit()
+
+# per-opcode timings
+x = loopbackconnect()
+stats = x.enable_stats()
+x.account(Address(1, 1, 0, 1))
+doc = x.create_document()
+mydoc = x.open_document(doc, READ_WRITE, CONFLICT_FAIL)
+x.insert(mydoc, Address(1, 1), ["hello"])
+x.insert(mydoc, Address(1, 6), [" world"])
+verify(stats.histogram(0).count, 2)
+verify(stats.histogram(0, "sent").max, len("0~0.1.1.0.1.0.1~0.1.1~1~t6~ world"))
+verify(stats.histogram(11, "received").max, len("11~0.1.1.0.1.0.1~"))
+report = json.loads(json.dumps(stats.to_dict()))
+verify(report["opcodes"]["0"]["name"], "insert")
+verify(report["opcodes"]["0"]["wait"]["count"], 2)
+h = Histogram()
+for value in range(1, 1001): h.record(value)
+verify(h.bucket(1000), (992, 1007))
+verify((h.percentile(50), h.percentile(100)), (503, 1000))
+x.quit()
+
+# structured tracing
+x = loopbackconnect()
+tracer = x.enable_tracing(XuTracer(capacity=3, every=2))
+x.account(Address(1, 1, 0, 1))
+for i in range(8):
+    x.create_document()
+records = list(tracer)
+verify(len(records), 3)
+verify([record.opcode for record in records], [11, 11, 11])
+verify(records[0].size, len("11~0.1.1.0.1.0.1~"))
+verify(records[0].digest, zlib.crc32(b"11~"))
+trace = json.loads(json.dumps(tracer.to_chrome_trace()))
+verify([event["ph"] for event in trace["traceEvents"]], ["M", "X", "X", "X"])
+verify(trace["traceEvents"][1]["name"], "create_document")
+x.quit()
+
+# coalescing inserts typed at the end of a document
+x = loopbackconnect()
+stats = x.enable_stats()
+x.account(Address(1, 1, 0, 1))
+mydoc = x.open_document(x.create_document(), READ_WRITE, CONFLICT_FAIL)
+buf = WriteBuffer(x)
+for ch in "hello world":
+    buf.append(mydoc, [ch])
+verify(buf.end(mydoc), Address(1, 12))
+verify(0 in stats.opcodes, False)
+verify(buf.retrieve_vspanset(mydoc),
+       VSpec(mydoc, [Span(Address(1, 1), Offset(0, 11))]))
+verify((stats.histogram(0).count, stats.histogram(1).count), (1, 2))
+buf.insert(mydoc, Address(1, 1), [">"])
+buf.insert(mydoc, Address(1, 3), ["!"])
+verify(buf.nflushes, 2)
+buf.delete(mydoc, Address(1, 1), Offset(0, 1))
+verify(buf.end(mydoc), Address(1, 13))
+buf.append(mydoc, ["."])
+specset = SpecSet(VSpec(mydoc, [Span(Address(1, 1), Offset(0, 13))]))
+verify(buf.retrieve_contents(specset), ["h!ello world."])
+buf.close_document(mydoc)
+
+# ... flushed on the size and age limits
+now = [0.0]
+buf = WriteBuffer(x, max_chars=4, max_delay=1.0, clock=lambda: now[0])
+mydoc = x.open_document(mydoc, READ_WRITE, CONFLICT_FAIL)
+for ch in "abcde":
+    buf.insert(mydoc, buf.end(mydoc), [ch])
+verify((buf.ninserts, buf.nflushes), (5, 1))
+now[0] = 1.0
+buf.poll()
+verify((buf.pending, buf.nflushes), (None, 2))
+x.quit()
+
+# large inserts are streamed as bounded strings in pipelined requests
+verify(list(text_segments("abcdefg", 3)), ["abc", "def", "g"])
+verify(list(text_segments(["ab", "cdefg", "h"], 3)), ["abc", "def", "gh"])
+verify(list(text_segments(io.StringIO("abcdefg"), 3)), ["abc", "def", "g"])
+x = loopbackconnect()
+stats = x.enable_stats()
+x.account(Address(1, 1, 0, 1))
+mydoc = x.open_document(x.create_document(), READ_WRITE, CONFLICT_FAIL)
+text = "".join(chr(65 + i % 26) for i in range(2500))
+end = x.insert_large(mydoc, Address(1, 1), (text[i:i + 7] for i in range(0, 2500, 7)),
+                     chunk_size=1000, segment_size=300, window=2)
+verify(end, Address(1, 2501))
+verify(stats.histogram(0).count, 3)
+verify(x.retrieve_vspanset(mydoc), VSpec(mydoc, [Span(Address(1, 1), Offset(0, 2500))]))
+specset = SpecSet(VSpec(mydoc, [Span(Address(1, 1), Offset(0, 2500))]))
+verify("".join(x.retrieve_contents(specset)), text)
+before = stats.histogram(0).count
+x.insert_large(mydoc, end, "abcdefghij", chunk_size=4)
+verify(stats.histogram(0).count - before, 3)
+mydoc = x.open_document(x.create_document(), READ_WRITE, CONFLICT_FAIL)
+buf = WriteBuffer(x)
+buf.append(mydoc, ["abc"])
+verify(buf.insert_large(mydoc, buf.end(mydoc), "XYZ"), Address(1, 7))
+buf.append(mydoc, ["!"])
+specset = SpecSet(VSpec(mydoc, [Span(Address(1, 1), Offset(0, 7))]))
+verify(buf.retrieve_contents(specset), ["abcXYZ!"])
+x.quit()
+
+# reads from a piped back-end give up at the stream's deadline
+stream = PipeStream("sleep 10")
+stream.deadline = time.monotonic() + 0.1
+try:
+    stream.read(1)
+    verify(False)
+except XuTimeout:
+    print("ok")
+# and after a missed deadline a late reply is never read
+stream.deadline = None
+try:
+    stream.read(1)
+    verify(False)
+except XuTimeout:
+    print("ok")
+stream.inpipe._proc.kill()
+stream.close()
+
+# a back-end that exits before the handshake is a closed stream, not a
+# reply to wait for until the deadline
+stream = PipeStream("sh -c 'head -c 1 >/dev/null; exit 3'")
+stream.deadline = time.monotonic() + 10
+try:
+    XuConn(stream).handshake()
+    verify(False)
+except XuTimeout:
+    verify(False)
+except XuError:
+    print("ok")
+stream.close()
+
+# the fuzzer restarts a piped back-end, whose FIFO name is shared, many times
+from fuzz_backends import Target
+target = Target("sh -c 'sleep 1'", 0.1)
+for attempt in range(2):
+    try:
+        target.start()
+        verify(False)
+    except XuTimeout:
+        print("ok")
+    target.stop()
+
+# requests that crash the C back-end close the loopback stream too
+x = loopbackconnect()
+x.account(Address(1, 1, 0, 1))
+try:
+    x.retrieve_contents(SpecSet(VSpec(Address(0), [Span(Address(1, 1),
+                                                        Offset(0, 1))])))
+    verify(False)
+except XuError:
+    print("ok")
+
 print("All tests passed!")
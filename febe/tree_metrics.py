@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Tree health metrics from a DUMPSTATE snapshot.
+
+XuSession.dump_state returns every crum of the granfilade and spanfilade,
+with the POOM of each document in memory hanging off its granfilade
+bottom crum.  metrics() reduces such a snapshot to numbers that show the
+trees degrading: for each tree the height, the crum counts, a histogram
+of the fan-out of the upper crums and the occupancy of each level (sons
+over the most a crum at that height may hold, as in backend/genf.c); the
+count and size of the POOMs, per document; and how fragmented the text
+atoms are (text crums over the fewest that could hold each document's
+text).
+
+Run as a script it samples a back-end, once or every --interval seconds,
+printing a line per sample or writing JSON lines:
+
+    python tree_metrics.py --tcp localhost:55146 --interval 10 --json health.jsonl
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from client import (XuSession, XuConn, PipeStream, TcpStream, LoopbackStream,
+                    Address)
+
+DEFAULT_ACCOUNT = Address(1, 1, 0, 1)
+
+# backend/enf.h and common.h
+MAXUCINLOAF = 6
+MAXBCINLOAF = 1
+MAX2DBCINLOAF = 4
+GRANTEXTLENGTH = 950
+
+# granfilade bottom crum infotypes
+GRANTEXT, GRANORGL = 1, 2
+
+
+def capacity(enftype, height):
+    """The most sons a crum of this kind and height holds before it splits."""
+    if height > 1:
+        return MAXUCINLOAF
+    return MAXBCINLOAF if enftype == "GRAN" else MAX2DBCINLOAF
+
+
+def tree_metrics(root):
+    """Height, crum counts, fan-out histogram and per-level occupancy of
+    one enfilade.  POOMs under the granfilade are not included."""
+    result = {"height": root["height"] if root else 0, "crums": 0, "bottom": 0}
+    fanout, levels = {}, {}
+    stack = [root] if root else []
+    while stack:
+        node = stack.pop()
+        result["crums"] += 1
+        children = node.get("children")
+        if not children:
+            result["bottom"] += 1
+            continue
+        sons = len(children)
+        fanout[sons] = fanout.get(sons, 0) + 1
+        level = levels.setdefault(node["height"], {"crums": 0, "sons": 0})
+        level["crums"] += 1
+        level["sons"] += sons
+        stack.extend(children)
+    upper = sum(fanout.values())
+    result["mean_fanout"] = (result["crums"] - 1) / upper if upper else 0.0
+    result["max_fanout"] = max(fanout, default=0)
+    result["fanout"] = dict(sorted(fanout.items()))
+    for height, level in levels.items():
+        level["occupancy"] = level["sons"] / (level["crums"] *
+                                              capacity(root["enftype"], height))
+    result["levels"] = dict(sorted(levels.items(), reverse=True))
+    return result
+
+
+def granf_leaves(granf):
+    """(address, bottom crum) for each granfilade bottom crum, in address
+    order.  A crum's address is the sum of the widths to its left."""
+    position = []
+    stack = [granf] if granf else []
+    while stack:
+        node = stack.pop()
+        children = node.get("children")
+        if children:
+            stack.extend(reversed(children))
+            continue
+        yield Address(position), node
+        width = list(map(int, node["wid"][0].split(".")))
+        for i, digit in enumerate(width):
+            if digit:
+                position = (position + [0] * (i + 1 - len(position)))[:i + 1]
+                position[i] += digit
+                position += width[i + 1:]
+                break
+
+
+def is_link(address):
+    """Whether an orgl's address is a link's (doc.0.2.n), not a document's."""
+    return address.digits.count(0) > 2
+
+
+def metrics(state):
+    """Aggregate a dump_state() snapshot into tree health metrics."""
+    granf = state.get("granf")
+    pooms, links, swapped = {}, 0, 0
+    text = {}
+    for address, leaf in granf_leaves(granf):
+        infotype = leaf.get("infotype")
+        if infotype == GRANTEXT:
+            counts = text.setdefault(address.split()[0], [0, 0])
+            counts[0] += 1
+            counts[1] += len(leaf.get("text", ""))
+        elif infotype == GRANORGL:
+            if is_link(address):
+                links += 1
+            elif leaf.get("orgl") is None:
+                swapped += 1
+            else:
+                poom = tree_metrics(leaf["orgl"])
+                pooms[str(address)] = {key: poom[key] for key in
+                                       ("height", "crums", "bottom", "max_fanout")}
+    sizes = [poom["crums"] for poom in pooms.values()]
+    # a document's text atoms cannot be shared with another document's
+    fewest = sum(-(-chars // GRANTEXTLENGTH) for _, chars in text.values())
+    atoms = sum(atoms for atoms, _ in text.values())
+    return {
+        "granf": tree_metrics(granf),
+        "spanf": tree_metrics(state.get("spanf")),
+        "pooms": {
+            "count": len(pooms),
+            "not_in_memory": swapped,
+            "links": links,
+            "crums": sum(sizes),
+            "max_crums": max(sizes, default=0),
+            "max_height": max((poom["height"] for poom in pooms.values()), default=0),
+            "bottom": sum(poom["bottom"] for poom in pooms.values()),
+            "documents": pooms,
+        },
+        "text": {
+            "atoms": atoms,
+            "chars": sum(chars for _, chars in text.values()),
+            "fragmentation": atoms / fewest if fewest else 1.0,
+        },
+    }
+
+
+def summary(result):
+    """One line for a sample."""
+    trees = " ".join(
+        f"{tree} h{result[tree]['height']} n{result[tree]['crums']} "
+        f"f{result[tree]['mean_fanout']:.1f}/{result[tree]['max_fanout']}"
+        for tree in ("granf", "spanf"))
+    pooms, text = result["pooms"], result["text"]
+    return (f"{trees}  pooms {pooms['count']} n{pooms['crums']} "
+            f"bottom {pooms['bottom']} max h{pooms['max_height']} n{pooms['max_crums']}  "
+            f"text {text['atoms']} atoms x{text['fragmentation']:.2f}")
+
+
+def connect(args):
+    if args.loopback:
+        stream = LoopbackStream()
+    elif args.tcp:
+        host, port = args.tcp.rsplit(":", 1)
+        stream = TcpStream(host, int(port))
+    else:
+        backend_path = (Path(__file__).parent / args.backend).resolve()
+        if not backend_path.exists():
+            print(f"Error: Backend not found at {backend_path}")
+            print("Run 'make' in the backend directory first.")
+            sys.exit(1)
+        stream = PipeStream(f"{backend_path} --test-mode")
+    session = XuSession(XuConn(stream))
+    session.account(DEFAULT_ACCOUNT)
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample enfilade health metrics")
+    parser.add_argument("--backend", default="../backend/build/backend",
+                        help="Path to backend executable (started in test mode)")
+    parser.add_argument("--tcp", metavar="HOST:PORT",
+                        help="Connect to a running backenddaemon instead")
+    parser.add_argument("--loopback", action="store_true",
+                        help="Use the in-process Python backend (pybackend.py)")
+    parser.add_argument("--interval", type=float,
+                        help="Seconds between samples (default: one sample)")
+    parser.add_argument("--count", type=int,
+                        help="Stop after this many samples")
+    parser.add_argument("--json", metavar="FILE",
+                        help="Append each sample as a JSON line ('-' for stdout)")
+    args = parser.parse_args()
+
+    session = connect(args)
+    out = None
+    if args.json:
+        out = sys.stdout if args.json == "-" else open(args.json, "a")
+    samples = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            state = session.dump_state()
+            dumped = time.perf_counter()
+            result = metrics(state)
+            result["time"] = time.time()
+            result["dump_seconds"] = dumped - start
+            result["metrics_seconds"] = time.perf_counter() - dumped
+            if out:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+            if out is not sys.stdout:
+                print(f"{time.strftime('%H:%M:%S')}  {summary(result)}  "
+                      f"({result['dump_seconds'] * 1000:.1f}+"
+                      f"{result['metrics_seconds'] * 1000:.1f} ms)", flush=True)
+            samples += 1
+            if args.interval is None or samples == args.count:
+                break
+            time.sleep(max(0.0, args.interval - (time.perf_counter() - start)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out and out is not sys.stdout:
+            out.close()
+        session.quit()
+
+
+if __name__ == "__main__":
+    main()
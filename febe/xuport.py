@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""Bulk import and export of documents, versions and links over FEBE.
+
+A corpus is a JSON-lines file with one record per line:
+
+  {"type": "document", "id": "intro", "text": "..."}
+  {"type": "document", "id": "big", "path": "big.txt"}
+  {"type": "version", "id": "intro-v2", "of": "intro", "text": "..."}
+  {"type": "link", "home": "intro", "link_type": "jump",
+   "source": [["intro", "1.7", "0.6"]], "target": [["big", "1.1", "0.9"]]}
+
+Ids are any strings; records refer to earlier records by id.  "path" is
+relative to the corpus file and is streamed rather than read whole.  A
+version is created with CREATEVERSION from its document as imported; if
+it has text that differs, the version's text is replaced.  Link ends are
+lists of [id, start, width], start and width being V-space tumblers.
+A directory can be imported too: every file under it is a document,
+with its path (minus the suffix) as its id.
+
+Import streams each document's text with insert_large (bounded strings,
+pipelined inserts) and can write the ids' addresses to a JSON map.
+Export starts from the given documents (or those in such a map) and
+walks outwards: each document's text and links are read with
+RETRIEVECONTENTS, each link's ends with FOLLOWLINK, and other documents
+are found through versions, link ends, FINDDOCUMENTS and FINDLINKS on
+its text.  Records are written as JSON lines as they are read, in an
+order import accepts.  Neither back-end answers FOLLOWLINK for a link's
+type (see RETRIEVEENDSETS too), so exported links have "link_type": null.
+
+Progress goes to stderr once a second, and both directions end with
+record counts, characters, requests and throughput.
+
+    python xuport.py import corpus.jsonl --map ids.json
+    python xuport.py import corpus/ --test-mode --export /tmp/out.jsonl
+    python xuport.py export --map ids.json -o out.jsonl
+    python xuport.py export --doc 1.1.0.1.0.1 --tcp localhost:55146
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+from client import (XuSession, XuConn, PipeStream, TcpStream, LoopbackStream,
+                    Address, Offset, Span, VSpec, SpecSet, NOSPECS, XuError,
+                    READ_ONLY, READ_WRITE, CONFLICT_FAIL, CONFLICT_COPY,
+                    LINK_SOURCE, LINK_TARGET, LINK_TYPE, TYPE_NAMES,
+                    TYPES_BY_NAME, text_segments)
+
+DEFAULT_ACCOUNT = Address(1, 1, 0, 1)
+
+# the whole text (1.x) and link (2.x) subspaces of a document
+TEXT_SPAN = Span(Address(1, 1), Offset(1))
+LINK_SPAN = Span(Address(2, 1), Offset(1))
+
+
+class Progress:
+    """Counts what has been moved and reports it to stderr."""
+
+    def __init__(self, verb, session, interval=1.0, out=sys.stderr):
+        self.verb = verb
+        self.stats = session.enable_stats()
+        self.interval = interval
+        self.out = out
+        self.counts = {"document": 0, "version": 0, "link": 0}
+        self.chars = 0
+        self.start = self.last = time.perf_counter()
+
+    def record(self, kind, chars=0):
+        self.counts[kind] += 1
+        self.chars += chars
+        now = time.perf_counter()
+        if now - self.last >= self.interval:
+            self.last = now
+            print(self.line(now), file=self.out, flush=True)
+
+    def requests(self):
+        return sum(histograms["total"].count
+                   for histograms in self.stats.opcodes.values())
+
+    def line(self, now):
+        elapsed = now - self.start
+        counts = ", ".join(f"{n} {kind}s" for kind, n in self.counts.items())
+        return (f"{self.verb} {counts}; {self.chars:,} chars in {elapsed:.1f}s "
+                f"({self.chars / max(elapsed, 1e-9) / 1e6:.2f} MB/s, "
+                f"{self.requests():,} requests)")
+
+    def finish(self):
+        print(self.line(time.perf_counter()), file=self.out, flush=True)
+
+
+# ------------------------------------------------------------------ import
+
+def read_corpus(path):
+    """Yield the records of a JSON-lines corpus or a directory of files."""
+    if path.is_dir():
+        for file in sorted(p for p in path.rglob("*") if p.is_file()):
+            yield {"type": "document",
+                   "id": file.relative_to(path).with_suffix("").as_posix(),
+                   "path": str(file.relative_to(path))}
+        return
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: {e}")
+
+
+def hashed_text(text, digest):
+    """Yield text in pieces, adding each to a hash as it goes."""
+    for piece in text_segments(text, 65536):
+        digest.update(piece.encode())
+        yield piece
+
+
+class Importer:
+    """Loads corpus records into a session, keeping the address and the
+    text hash of every document and version by id."""
+
+    def __init__(self, session, base_dir, progress, chunk_size, window):
+        self.session = session
+        self.base_dir = base_dir
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.window = window
+        self.addresses = {}
+        self.texts = {}
+
+    def address(self, id):
+        try:
+            return self.addresses[id]
+        except KeyError:
+            raise ValueError(f"unknown id {id!r}")
+
+    def fill(self, docid, record):
+        """Insert a record's text into an open document; return its
+        (sha256, length)."""
+        digest = hashlib.sha256()
+        if "path" in record:
+            with open(self.base_dir / record["path"]) as f:
+                end = self.session.insert_large(
+                    docid, Address(1, 1), hashed_text(f, digest),
+                    chunk_size=self.chunk_size, window=self.window)
+        else:
+            end = self.session.insert_large(
+                docid, Address(1, 1), hashed_text(record.get("text", ""), digest),
+                chunk_size=self.chunk_size, window=self.window)
+        return digest.hexdigest(), end[1] - 1
+
+    def load(self, record):
+        kind = record.get("type")
+        if kind == "document":
+            docid = self.session.create_document()
+            self.session.open_document(docid, READ_WRITE, CONFLICT_FAIL)
+            sha, length = self.fill(docid, record)
+            self.session.close_document(docid)
+        elif kind == "version":
+            of = record["of"]
+            docid = self.session.create_version(self.address(of))
+            sha, length = self.texts[of]
+            if "text" in record or "path" in record:
+                if "text" not in record or \
+                   hashlib.sha256(record["text"].encode()).hexdigest() != sha:
+                    self.session.open_document(docid, READ_WRITE, CONFLICT_FAIL)
+                    if length:
+                        self.session.delete(docid, Address(1, 1), Offset(0, length))
+                    sha, length = self.fill(docid, record)
+                    self.session.close_document(docid)
+        elif kind == "link":
+            home = self.address(record["home"])
+            self.session.open_document(home, READ_WRITE, CONFLICT_FAIL)
+            type_name = record.get("link_type")
+            self.session.create_link(
+                home, self.specset(record.get("source", [])),
+                self.specset(record.get("target", [])),
+                SpecSet([TYPES_BY_NAME[type_name]]) if type_name else NOSPECS)
+            self.session.close_document(home)
+            self.progress.record("link")
+            return
+        else:
+            raise ValueError(f"unknown record type {kind!r}")
+        self.addresses[record["id"]] = docid
+        self.texts[record["id"]] = sha, length
+        self.progress.record(kind, length)
+
+    def specset(self, ends):
+        specs = {}
+        for id, start, width in ends:
+            specs.setdefault(id, []).append(Span(Address(start), Offset(width)))
+        return SpecSet([VSpec(self.address(id), spans) for id, spans in specs.items()])
+
+
+# ------------------------------------------------------------------ export
+
+def tumbler_ends(specset, ids):
+    """A link end as [id, start, width] lists, naming documents by id."""
+    ends = []
+    for vspec in specset:
+        for span in vspec.spans:
+            ends.append([ids(vspec.docid), str(span.start), str(span.width)])
+    return ends
+
+
+def export_corpus(session, seeds, names, out, progress):
+    """Walk outwards from the seed documents, writing a record for every
+    document, version and link reached.  Versions are held back until
+    their document is written, and links until the end."""
+    ids = lambda docid: names.get(docid, str(docid))
+    queue = deque(seeds)
+    seen = set(seeds)
+    written = set()
+    held = {}
+    links = {}
+
+    def reach(docid):
+        if docid not in seen:
+            seen.add(docid)
+            queue.append(docid)
+
+    def write(docid, record):
+        out.write(json.dumps(record) + "\n")
+        written.add(docid)
+        progress.record(record["type"], len(record["text"]))
+        for version in held.pop(docid, []):
+            write(*version)
+
+    while queue:
+        docid = queue.popleft()
+        try:
+            session.open_document(docid, READ_ONLY, CONFLICT_COPY)
+        except XuError:
+            print(f"warning: cannot open {docid}, skipped", file=sys.stderr)
+            continue
+        text = "".join(session.retrieve_contents(SpecSet(VSpec(docid, [TEXT_SPAN]))))
+        linkids = session.retrieve_contents(SpecSet(VSpec(docid, [LINK_SPAN])))
+        if text:
+            textspec = SpecSet(VSpec(docid, [Span(Address(1, 1), Offset(0, len(text)))]))
+            for other in session.find_documents(textspec):
+                reach(other)
+            for linkid in (session.find_links(textspec) +
+                           session.find_links(NOSPECS, textspec)):
+                reach(linkid.split()[0])
+        for linkid in linkids:
+            if not isinstance(linkid, Address) or linkid in links:
+                continue
+            ends = [session.follow_link(linkid, end)
+                    for end in (LINK_SOURCE, LINK_TARGET, LINK_TYPE)]
+            for specset in ends[:2]:
+                for vspec in specset:
+                    reach(vspec.docid)
+            link_type = None
+            for vspec in ends[2]:
+                link_type = TYPE_NAMES.get(vspec, link_type)
+            links[linkid] = (docid, ends, link_type)
+        session.close_document(docid)
+
+        parent = None
+        if docid[-2] != 0:
+            parent = Address(docid.digits[:-1])
+            reach(parent)
+        if parent is None:
+            write(docid, {"type": "document", "id": ids(docid), "text": text})
+        else:
+            record = (docid, {"type": "version", "id": ids(docid),
+                              "of": ids(parent), "text": text})
+            if parent in written:
+                write(*record)
+            else:
+                held.setdefault(parent, []).append(record)
+
+    for docid, record in held.items():
+        print(f"warning: {len(record)} versions of unreadable {docid} skipped",
+              file=sys.stderr)
+    for linkid, (home, ends, link_type) in links.items():
+        if not all(vspec.docid in written for specset in ends[:2] for vspec in specset):
+            print(f"warning: link {linkid} reaches unexported documents, skipped",
+                  file=sys.stderr)
+            continue
+        record = {"type": "link", "id": str(linkid), "home": ids(home),
+                  "link_type": link_type,
+                  "source": tumbler_ends(ends[0], ids),
+                  "target": tumbler_ends(ends[1], ids)}
+        out.write(json.dumps(record) + "\n")
+        progress.record("link")
+
+
+# -------------------------------------------------------------------- main
+
+def connect(args):
+    if args.loopback:
+        stream = LoopbackStream()
+    elif args.tcp:
+        host, port = args.tcp.rsplit(":", 1)
+        stream = TcpStream(host, int(port))
+    else:
+        backend_path = (Path(__file__).parent / args.backend).resolve()
+        if not backend_path.exists():
+            print(f"Error: Backend not found at {backend_path}")
+            print("Run 'make' in the backend directory first.")
+            sys.exit(1)
+        stream = PipeStream(f"{backend_path}{' --test-mode' if args.test_mode else ''}")
+    session = XuSession(XuConn(stream))
+    session.account(DEFAULT_ACCOUNT)
+    return session
+
+
+def export_to(session, path, seeds, names):
+    progress = Progress("exported", session)
+    if path == "-":
+        export_corpus(session, seeds, names, sys.stdout, progress)
+    else:
+        with open(path, "w") as out:
+            export_corpus(session, seeds, names, out, progress)
+    progress.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk FEBE import and export")
+    parser.add_argument("--backend", default="../backend/build/backend",
+                        help="Path to backend executable")
+    parser.add_argument("--test-mode", action="store_true",
+                        help="Start the backend in test mode (in-memory storage)")
+    parser.add_argument("--tcp", metavar="HOST:PORT",
+                        help="Connect to a running backenddaemon instead")
+    parser.add_argument("--loopback", action="store_true",
+                        help="Use the in-process Python backend (pybackend.py)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("import", help="Load a corpus")
+    load.add_argument("corpus", type=Path, help="JSON-lines file or directory")
+    load.add_argument("--map", help="Write each id's address to this JSON file")
+    load.add_argument("--chunk-size", type=int, default=65536,
+                      help="Characters per INSERT request (default 65536)")
+    load.add_argument("--window", type=int, default=16,
+                      help="INSERT requests in flight (default 16)")
+    load.add_argument("--export", metavar="FILE",
+                      help="Then export what was imported, over the same session")
+
+    dump = commands.add_parser("export", help="Write documents reachable from seeds")
+    dump.add_argument("--doc", action="append", default=[],
+                      help="Document address to start from (repeatable)")
+    dump.add_argument("--map", help="Start from the documents in an import map, "
+                                    "naming them by id")
+    dump.add_argument("-o", "--output", default="-", help="Output file (default stdout)")
+    args = parser.parse_args()
+
+    session = connect(args)
+
+    if args.command == "import":
+        base_dir = args.corpus if args.corpus.is_dir() else args.corpus.parent
+        progress = Progress("imported", session)
+        importer = Importer(session, base_dir, progress, args.chunk_size, args.window)
+        for record in read_corpus(args.corpus):
+            importer.load(record)
+        progress.finish()
+        if args.map:
+            Path(args.map).write_text(json.dumps(
+                {id: str(docid) for id, docid in importer.addresses.items()}, indent=2) + "\n")
+        if args.export:
+            names = {docid: id for id, docid in importer.addresses.items()}
+            export_to(session, args.export, list(importer.addresses.values()), names)
+    else:
+        names = {}
+        seeds = [Address(doc) for doc in args.doc]
+        if args.map:
+            for id, docid in json.loads(Path(args.map).read_text()).items():
+                names[Address(docid)] = id
+                seeds.append(Address(docid))
+        if not seeds:
+            parser.error("export needs --doc or --map")
+        export_to(session, args.output, seeds, names)
+
+    session.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,14 @@ Stage 2 of the KB pipeline:
 No parsing, no grouping, no regex. Just reads all analysis files in
 numeric order and concatenates them. The organize step handles the rest.
 
+--incremental skips the stage when assembled.md is newer than every
+analysis file and than the analyzed directory itself (which changes when
+files are added or removed), so an unchanged KB costs only a few stats.
+
 Usage:
     python scripts/assemble-findings-kb.py
     python scripts/assemble-findings-kb.py --dry-run
+    python scripts/assemble-findings-kb.py --incremental
 """
 
 import argparse
@@ -26,6 +31,15 @@ ANALYZED_DIR = HARNESS_ROOT / "knowledge-base" / "analyzed"
 ASSEMBLED_PATH = HARNESS_ROOT / "knowledge-base" / "assembled.md"
 
 
+def is_up_to_date(files):
+    """Whether assembled.md postdates every analysis file and the directory."""
+    if not ASSEMBLED_PATH.exists():
+        return False
+    assembled = ASSEMBLED_PATH.stat().st_mtime_ns
+    newest = max([ANALYZED_DIR.stat().st_mtime_ns] + [f.stat().st_mtime_ns for _, f in files])
+    return assembled > newest
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Concatenate analysis files for the organize step"
@@ -34,6 +48,10 @@ def main():
         "--dry-run", action="store_true",
         help="Show stats without writing"
     )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Skip if assembled.md is newer than every analysis file"
+    )
     args = parser.parse_args()
 
     if not ANALYZED_DIR.exists():
@@ -52,6 +70,10 @@ def main():
         print("No analysis files found", file=sys.stderr)
         sys.exit(1)
 
+    if args.incremental and not args.dry_run and is_up_to_date(files):
+        print(f"Assembled file is up to date ({len(files)} analysis files)")
+        return
+
     # Concatenate (skip empty files)
     parts = []
     empty = []
@@ -9,32 +9,66 @@ Stage 4 of the KB pipeline:
   4. audit (this script) — mechanical checks + miscategorization review
 
 Python handles: invented categories, category imbalance, cross-reference
-integrity. Opus handles: miscategorization detection (the only check that
-requires understanding content).
+integrity, over entries streamed from kb-formal.md by kb_parser.py.
+Cross-references are checked against the KB index (kb_index.py), which
+also names the other files citing each dead reference. Golden files,
+scenarios and op types cited by findings are checked against the cached
+evidence index (evidence_index.py).
+Opus handles: miscategorization detection (the only check that requires
+understanding content). The review is started first and the mechanical
+checks run while it is in flight. With --shard, each category section
+is reviewed in its own call, --concurrency at a time, and the reports
+are merged into miscategorized.md. Section reports are cached in
+knowledge-base/audit-shards/ by content hash, so a re-audit only reviews
+the sections that changed.
+
+The report records the SHA-256 of the KB it audited, a SHA-256 over the
+other inputs of the checks (the findings, bugs and analyses that name
+citing files, and the scenarios and golden files that evidence citations
+resolve against) and whether the miscategorization review ran.
+--incremental skips the audit when neither hash changed since a report
+that covers what this run would check.
+
+The audit has three parts, which --only runs one at a time so the
+pipeline can run the first two in parallel:
+  checks — mechanical checks, saved to knowledge-base/audit-checks.json
+  review — the miscategorization review, written to miscategorized.md
+  report — audit.md from the saved checks and the review
 
 Usage:
-    python scripts/audit-findings-kb.py [--skip-opus]
+    python scripts/audit-findings-kb.py [--skip-opus] [--incremental]
+    python scripts/audit-findings-kb.py --shard [--concurrency 4]
+    python scripts/audit-findings-kb.py --only checks|review|report [--skip-opus]
 """
 
 import argparse
+import hashlib
 import json
-import os
 import re
 import subprocess
 import sys
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from pathlib import Path
 
+import evidence_index
+from claude_runner import MODEL, claude_command, token_usage
+from kb_index import SOURCES, IndexUnavailable, KBIndex
+from kb_parser import parse_kb, read_lines
+
 HARNESS_ROOT = Path(__file__).resolve().parent.parent
 KB_PATH = HARNESS_ROOT / "knowledge-base" / "kb-formal.md"
 AUDIT_PATH = HARNESS_ROOT / "knowledge-base" / "audit.md"
+CHECKS_PATH = HARNESS_ROOT / "knowledge-base" / "audit-checks.json"
+MISCATEGORIZED_PATH = HARNESS_ROOT / "knowledge-base" / "miscategorized.md"
+SHARDS_DIR = HARNESS_ROOT / "knowledge-base" / "audit-shards"
+KB_REL_PATH = "knowledge-base/kb-formal.md"
+MISCATEGORIZED_REL_PATH = "knowledge-base/miscategorized.md"
 PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
 PROMPT_PATH = PROMPTS_DIR / "kb-audit-instructions.md"
 
-MODEL = "claude-opus-4-6"
-
 STANDARD_PREFIXES = {"SS", "PRE", "ST", "FC", "INV", "INT", "EC"}
 
 
@@ -43,31 +77,6 @@ def abort(message):
     sys.exit(1)
 
 
-def parse_kb(text):
-    """Parse kb-formal.md into a list of (entry_id, body) tuples."""
-    entries = []
-    lines = text.split("\n")
-    i = 0
-    while i < len(lines):
-        m = re.match(r"^### ([A-Z]+-[A-Z0-9-]+)", lines[i])
-        if m:
-            entry_id = m.group(1)
-            body_lines = []
-            i += 1
-            while i < len(lines):
-                if re.match(r"^### ", lines[i]):
-                    break
-                if re.match(r"^## ", lines[i]):
-                    break
-                body_lines.append(lines[i])
-                i += 1
-            body = "\n".join(body_lines).strip()
-            entries.append((entry_id, body))
-            continue
-        i += 1
-    return entries
-
-
 def check_invented_categories(entries):
     """Find entries with non-standard prefixes."""
     invented = defaultdict(list)
@@ -121,9 +130,40 @@ def check_cross_references(entries):
     return dead_refs
 
 
-def run_mechanical_checks(text):
+def check_cross_references_indexed():
+    """Dead citations from the KB index, each with the other files citing it.
+
+    Returns None if the index is unavailable.
+    """
+    try:
+        index = KBIndex()
+    except IndexUnavailable as e:
+        print(f"  KB index unavailable ({e}), checking references in memory")
+        return None
+    with index:
+        index.update()
+        return [(src, ref, index.citing_files(ref)) for src, ref in index.dead_references()]
+
+
+def check_evidence_citations():
+    """Golden, scenario, module and op citations in findings that match
+    no scenario, from the cached evidence index.
+
+    Returns (citation count, dangling citations), or None if the index
+    cannot be built.
+    """
+    try:
+        index, _ = evidence_index.EvidenceIndex.load()
+    except evidence_index.IndexUnavailable as e:
+        print(f"  Evidence index unavailable ({e})")
+        return None
+    citations = list(index.citations())
+    return len(citations), [c for c in citations if not c.targets]
+
+
+def run_mechanical_checks(path=KB_PATH):
     """Run all mechanical checks and return report sections."""
-    entries = parse_kb(text)
+    entries = list(parse_kb(read_lines(path)))
     total = len(entries)
     finding_count = len(set(
         m.group(1)
@@ -162,40 +202,37 @@ def run_mechanical_checks(text):
         sections.append(("Category Imbalance", table + "\nNo imbalance flags."))
 
     # Cross-reference integrity
-    dead_refs = check_cross_references(entries)
+    dead_refs = check_cross_references_indexed()
+    if dead_refs is None:
+        dead_refs = [(src, ref, []) for src, ref in check_cross_references(entries)]
     if dead_refs:
         lines = []
-        for src, ref in dead_refs:
-            lines.append(f"- `{src}` cites `[{ref}]` — not found")
+        for src, ref, citing in dead_refs:
+            also = f" (also cited in {', '.join(citing)})" if citing else ""
+            lines.append(f"- `{src}` cites `[{ref}]` — not found{also}")
         sections.append(("Cross-Reference Integrity", "\n".join(lines)))
     else:
         sections.append(("Cross-Reference Integrity", "All references valid."))
 
-    return total, finding_count, sections
-
-
-def run_opus_miscategorization():
-    """Run Opus to check for miscategorized entries."""
-    if not PROMPT_PATH.exists():
-        print(f"WARNING: Prompt not found: {PROMPT_PATH}", file=sys.stderr)
-        return None
-
-    prompt = PROMPT_PATH.read_text()
+    # Golden evidence cited by findings
+    evidence = check_evidence_citations()
+    if evidence is None:
+        sections.append(("Evidence Citations", "*Not checked — febe/scenarios could not be imported.*"))
+    elif evidence[1]:
+        lines = [f"- `{c.path}:{c.line}` cites {c.kind} `{c.text}` — matches no scenario"
+                 for c in evidence[1]]
+        sections.append(("Evidence Citations", "\n".join(lines)))
+    else:
+        sections.append(("Evidence Citations",
+                         f"None — all {evidence[0]} golden and scenario citations resolve."))
 
-    cmd = [
-        "claude", "--print",
-        "--model", MODEL,
-        "--output-format", "json",
-        "--permission-mode", "bypassPermissions",
-    ]
+    return total, finding_count, sections
 
-    env = os.environ.copy()
-    env.pop("CLAUDECODE", None)
-    env["CLAUDE_CODE_EFFORT_LEVEL"] = "max"
 
-    kb_size = KB_PATH.stat().st_size
-    print(f"Running miscategorization review ({kb_size:,} bytes)")
-    print(f"Model: {MODEL} | Thinking: max")
+def run_review_call(prompt, label=None):
+    """Run one review call. Returns True if claude exited cleanly."""
+    cmd, env = claude_command()
+    prefix = f"  {label}: " if label else ""
 
     start = time.time()
 
@@ -212,58 +249,223 @@ def run_opus_miscategorization():
     elapsed = time.time() - start
 
     if result.returncode != 0:
-        print(f"WARNING: Opus exited {result.returncode} ({elapsed:.0f}s)", file=sys.stderr)
+        print(f"WARNING: {label + ': ' if label else ''}Opus exited {result.returncode} ({elapsed:.0f}s)", file=sys.stderr)
+        return False
+
+    usage = token_usage(result.stdout)
+    if usage is None:
+        print(f"{prefix}Done. {elapsed:.0f}s [no token data]")
+    else:
+        print(f"{prefix}Done. {elapsed:.0f}s | in:{usage['input_tokens']:,} "
+              f"out:{usage['output_tokens']:,} ${usage['cost_usd']:.4f}")
+    return True
+
+
+def run_opus_miscategorization():
+    """Run Opus to check for miscategorized entries."""
+    if not PROMPT_PATH.exists():
+        print(f"WARNING: Prompt not found: {PROMPT_PATH}", file=sys.stderr)
         return None
 
-    try:
-        data = json.loads(result.stdout)
-        usage = data.get("usage", {})
-        cost = data.get("total_cost_usd", 0)
-        inp = (
-            usage.get("input_tokens", 0)
-            + usage.get("cache_read_input_tokens", 0)
-            + usage.get("cache_creation_input_tokens", 0)
-        )
-        out = usage.get("output_tokens", 0)
-        print(f"Done. {elapsed:.0f}s | in:{inp:,} out:{out:,} ${cost:.4f}")
-    except (json.JSONDecodeError, KeyError):
-        print(f"Done. {elapsed:.0f}s [no token data]")
+    prompt = PROMPT_PATH.read_text()
+
+    kb_size = KB_PATH.stat().st_size
+    print(f"Running miscategorization review ({kb_size:,} bytes)")
+    print(f"Model: {MODEL} | Thinking: max")
+
+    # A stale review must not stand in for this one if the call fails
+    if MISCATEGORIZED_PATH.exists():
+        MISCATEGORIZED_PATH.unlink()
+
+    if not run_review_call(prompt):
+        return None
 
     # Read the output file that Opus wrote
-    miscat_path = HARNESS_ROOT / "knowledge-base" / "miscategorized.md"
-    if miscat_path.exists():
-        return miscat_path.read_text()
+    if MISCATEGORIZED_PATH.exists():
+        return MISCATEGORIZED_PATH.read_text()
 
     return None
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Audit the findings KB")
-    parser.add_argument("--skip-opus", action="store_true",
-                        help="Skip the Opus miscategorization check (mechanical only)")
-    args = parser.parse_args()
+def kb_sections(path=KB_PATH):
+    """(heading, text, entry count) for each ## section of the KB that
+    has entries, in file order."""
+    sections = []
+    heading = None
+    lines = []
+
+    def flush():
+        count = sum(1 for _ in parse_kb(lines))
+        if heading is not None and count:
+            sections.append((heading, "\n".join(lines) + "\n", count))
+
+    for line in read_lines(path):
+        if line.startswith("## "):
+            flush()
+            heading = line[3:].strip()
+            lines = [line]
+        elif heading is not None:
+            lines.append(line)
+    flush()
+    return sections
+
+
+def shard_prompt(prompt, heading, count, section_path, review_path):
+    """The review prompt pointed at one section instead of the whole KB."""
+    section_rel = section_path.relative_to(HARNESS_ROOT).as_posix()
+    review_rel = review_path.relative_to(HARNESS_ROOT).as_posix()
+    prompt = prompt.replace(KB_REL_PATH, section_rel).replace(MISCATEGORIZED_REL_PATH, review_rel)
+    return prompt + (
+        f"\n## Scope\n\n"
+        f"This call reviews one category section of the KB, \"{heading}\" "
+        f"({count} entries), copied to `{section_rel}`. The other sections are "
+        f"reviewed separately. Read only that file and write the report to "
+        f"`{review_rel}`, with {{total}} = {count}.\n"
+    )
 
-    if not KB_PATH.exists():
-        abort(f"KB not found: {KB_PATH}")
 
-    text = KB_PATH.read_text()
+def merge_reviews(reviews):
+    """One miscategorization report from per-section reports.
+
+    `reviews` is (entry count, report text) per section. The ### blocks
+    of each report are kept in section order and the counts re-totalled.
+    """
+    total = sum(count for count, _ in reviews)
+    blocks = []
+    for _, text in reviews:
+        m = re.search(r"^### ", text, re.M)
+        if m:
+            blocks.append(text[m.start():].strip())
+    flagged = sum(len(re.findall(r"^### ", block, re.M)) for block in blocks)
+
+    lines = ["# Miscategorized Entries", ""]
+    if flagged:
+        lines.append(f"{flagged} entries flagged out of {total} reviewed "
+                     f"({len(reviews)} sections reviewed separately).")
+        lines.append("")
+        lines.append("\n\n".join(blocks))
+    else:
+        lines.append(f"No miscategorizations detected. All {total} entries match their category prefix.")
+    return "\n".join(lines) + "\n"
+
+
+def run_sharded_miscategorization(concurrency):
+    """Review each category section in its own call, `concurrency` at a
+    time, and merge the reports into miscategorized.md.
+
+    Each section's report is cached under its content hash, so after an
+    edit only the sections that changed are reviewed again. Returns None
+    if any section has no report.
+    """
+    if not PROMPT_PATH.exists():
+        print(f"WARNING: Prompt not found: {PROMPT_PATH}", file=sys.stderr)
+        return None
+
+    prompt = PROMPT_PATH.read_text()
+    sections = kb_sections()
+
+    print(f"Running miscategorization review in {len(sections)} sections")
+    print(f"Model: {MODEL} | Thinking: max | Concurrency: {concurrency}")
+
+    if MISCATEGORIZED_PATH.exists():
+        MISCATEGORIZED_PATH.unlink()
+    SHARDS_DIR.mkdir(parents=True, exist_ok=True)
+
+    shards = []
+    jobs = []
+    for heading, text, count in sections:
+        key = hashlib.sha256(f"{MODEL}\n{prompt}\n{text}".encode()).hexdigest()[:16]
+        slug = re.sub(r"[^a-z0-9]+", "-", heading.lower()).strip("-")
+        section_path = SHARDS_DIR / f"section-{slug}-{key}.md"
+        review_path = SHARDS_DIR / f"review-{slug}-{key}.md"
+        cached = review_path.exists() and review_path.read_text().strip()
+        print(f"  {heading}: {count} entries{' [cached]' if cached else ''}")
+        if not cached:
+            section_path.write_text(text)
+            jobs.append((heading, shard_prompt(prompt, heading, count, section_path, review_path),
+                         review_path))
+        shards.append((heading, count, section_path, review_path))
+
+    def review(job):
+        heading, shard, review_path = job
+        if not run_review_call(shard, heading) and review_path.exists():
+            review_path.unlink()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(review, jobs))
+
+    missing = [heading for heading, _, _, review_path in shards
+               if not review_path.exists() or not review_path.read_text().strip()]
+    if missing:
+        print(f"WARNING: no review written for {', '.join(missing)}", file=sys.stderr)
+        return None
+
+    current = {path for shard in shards for path in shard[2:]}
+    for path in SHARDS_DIR.glob("*.md"):
+        if path not in current:
+            path.unlink()
 
-    # Mechanical checks
-    print("Running mechanical checks...")
-    total, finding_count, sections = run_mechanical_checks(text)
+    merged = merge_reviews([(count, review_path.read_text())
+                            for _, count, _, review_path in shards])
+    MISCATEGORIZED_PATH.write_text(merged)
+    return merged
+
+
+def run_review(args):
+    """The miscategorization review, sharded or in one call."""
+    if args.shard:
+        return run_sharded_miscategorization(args.concurrency)
+    return run_opus_miscategorization()
+
+
+def inputs_hash():
+    """SHA-256 over what the checks read besides the KB: the files the KB
+    index covers and the evidence index's sources."""
+    h = hashlib.sha256(evidence_index.sources_hash().encode())
+    for kind, pattern in SOURCES:
+        if kind == "kb":
+            continue
+        for path in sorted(HARNESS_ROOT.glob(pattern)):
+            if path.is_file():
+                h.update(path.relative_to(HARNESS_ROOT).as_posix().encode())
+                h.update(hashlib.sha256(path.read_bytes()).digest())
+    return h.hexdigest()
+
+
+def audited_state():
+    """(kb_sha256, inputs_sha256, review) recorded by the previous audit,
+    or None."""
+    if not AUDIT_PATH.exists():
+        return None
+    with AUDIT_PATH.open() as f:
+        for line in f:
+            m = re.match(r"^<!-- audited: kb-sha256=([0-9a-f]+)"
+                         r"(?: inputs-sha256=([0-9a-f]+))? review=(\w+) -->", line)
+            if m:
+                return m.group(1), m.group(2), m.group(3)
+            if line.startswith("## "):
+                break
+    return None
+
+
+def print_checks(total, finding_count, sections):
     print(f"  {total} entries, {finding_count} findings referenced")
     for name, content in sections:
         issues = "OK" if ("None" in content or "All references valid" in content or "No imbalance" in content) else "issues found"
         print(f"  {name}: {issues}")
 
-    # Opus miscategorization check
-    miscat_section = None
-    if not args.skip_opus:
-        miscat_section = run_opus_miscategorization()
 
-    # Write audit report
+def write_report(kb_hash, inputs, total, finding_count, sections, miscat_section, skip_opus):
+    """Write audit.md from the mechanical sections and the review."""
     report = []
+    if miscat_section:
+        review = "done"
+    elif skip_opus:
+        review = "skipped"
+    else:
+        review = "failed"
     report.append(f"# KB Audit — {date.today().isoformat()}")
+    report.append(f"<!-- audited: kb-sha256={kb_hash} inputs-sha256={inputs} review={review} -->")
     report.append("")
     report.append(f"KB: {total} entries, {finding_count} findings referenced")
     report.append("")
@@ -273,7 +475,7 @@ def main():
     report.append("")
     if miscat_section:
         report.append(miscat_section)
-    elif args.skip_opus:
+    elif skip_opus:
         report.append("*Skipped (--skip-opus flag).*")
     else:
         report.append("*Opus check failed or timed out. Run again or review manually.*")
@@ -291,5 +493,77 @@ def main():
     print(f"\nAudit written to {AUDIT_PATH} ({len(audit_text):,} bytes)")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Audit the findings KB")
+    parser.add_argument("--skip-opus", action="store_true",
+                        help="Skip the Opus miscategorization check (mechanical only)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip if the KB and the files it is checked against are unchanged")
+    parser.add_argument("--only", choices=["checks", "review", "report"],
+                        help="Run one part of the audit (see above)")
+    parser.add_argument("--shard", action="store_true",
+                        help="Review each category section in its own call")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Section reviews to run at once with --shard (default 4)")
+    args = parser.parse_args()
+
+    if not KB_PATH.exists():
+        abort(f"KB not found: {KB_PATH}")
+
+    kb_hash = hashlib.sha256(KB_PATH.read_bytes()).hexdigest()
+
+    if args.only == "checks":
+        print("Running mechanical checks...")
+        inputs = inputs_hash()
+        total, finding_count, sections = run_mechanical_checks()
+        print_checks(total, finding_count, sections)
+        CHECKS_PATH.write_text(json.dumps({
+            "kb_sha256": kb_hash,
+            "inputs_sha256": inputs,
+            "total": total,
+            "finding_count": finding_count,
+            "sections": sections,
+        }, indent=2) + "\n")
+        print(f"\nChecks written to {CHECKS_PATH}")
+        return
+
+    if args.only == "review":
+        if run_review(args) is None:
+            print("WARNING: no review written; the report will say so", file=sys.stderr)
+        return
+
+    if args.only == "report":
+        if not CHECKS_PATH.exists():
+            abort(f"Checks not found: {CHECKS_PATH} (run --only checks first)")
+        checks = json.loads(CHECKS_PATH.read_text())
+        if checks["kb_sha256"] != kb_hash:
+            abort(f"{CHECKS_PATH} is for a different KB (run --only checks again)")
+        miscat_section = None
+        if not args.skip_opus and MISCATEGORIZED_PATH.exists():
+            miscat_section = MISCATEGORIZED_PATH.read_text()
+        write_report(kb_hash, checks.get("inputs_sha256"), checks["total"], checks["finding_count"],
+                     [tuple(s) for s in checks["sections"]], miscat_section, args.skip_opus)
+        return
+
+    inputs = inputs_hash()
+    if args.incremental:
+        state = audited_state()
+        if state and state[:2] == (kb_hash, inputs) and (state[2] == "done" or args.skip_opus):
+            print(f"Audit is up to date ({AUDIT_PATH})")
+            return
+
+    # Start the Opus review first; the mechanical checks run while it is out
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        review = None if args.skip_opus else pool.submit(run_review, args)
+
+        print("Running mechanical checks...")
+        total, finding_count, sections = run_mechanical_checks()
+        print_checks(total, finding_count, sections)
+
+        miscat_section = review.result() if review else None
+
+    write_report(kb_hash, inputs, total, finding_count, sections, miscat_section, args.skip_opus)
+
+
 if __name__ == "__main__":
     main()
@@ -9,10 +9,23 @@ Stage 1 of the KB pipeline:
   4. audit (audit-findings-kb.py) — review the full KB for quality
 
 Each finding gets its own Opus call with max thinking. Analysis files are
-written to knowledge-base/analyzed/{NNN}.md. Existing analysis files are
-skipped unless --reanalyze is used.
+written to knowledge-base/analyzed/{NNN}.md. knowledge-base/analyzed/manifest.json
+records the SHA-256 of the finding and of the instructions behind each
+analysis; by default only findings that are new, or whose finding file or
+instructions changed since their analysis, are analyzed. Analyses written
+before the manifest existed are left alone until --adopt records them.
 
-Any failure aborts immediately. Analysis files already written are kept.
+Any failure aborts immediately. Analysis files already written are kept;
+a file written by an analysis that failed or was killed is removed, so
+the finding is analyzed again next time.
+
+With --concurrency N, up to N findings are analyzed at once. Results are
+still printed in finding order, and the first failure kills the other
+running analyses, records every one that succeeded, and aborts.
+
+The claude CLI is looked up on PATH, so a stub executable placed first on
+PATH (one that writes the analysis file named in the prompt and prints a
+JSON usage record) exercises the script without model calls.
 
 Usage:
     python scripts/build-findings-kb.py                # Analyze all new findings
@@ -20,24 +33,28 @@ Usage:
     python scripts/build-findings-kb.py --reanalyze 036,042  # Re-analyze specific findings
     python scripts/build-findings-kb.py --bootstrap    # Delete all analyses and redo
     python scripts/build-findings-kb.py --dry-run      # Show what would be analyzed
+    python scripts/build-findings-kb.py --adopt        # Record existing analyses as current
+    python scripts/build-findings-kb.py --concurrency 4  # Analyze 4 findings at a time
 """
 
 import argparse
+import hashlib
 import json
-import os
 import re
 import subprocess
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from claude_runner import MODEL, Cancelled, RunningProcesses, claude_command, token_usage
+
 HARNESS_ROOT = Path(__file__).resolve().parent.parent
 FINDINGS_DIR = HARNESS_ROOT / "findings"
 ANALYZED_DIR = HARNESS_ROOT / "knowledge-base" / "analyzed"
 PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
 PROMPT_PATH = PROMPTS_DIR / "findings-kb-instructions.md"
-
-MODEL = "claude-opus-4-6"
+MANIFEST_PATH = ANALYZED_DIR / "manifest.json"
 
 
 def abort(message, finding_num=None):
@@ -65,6 +82,54 @@ def is_analyzed(finding_num):
     return (ANALYZED_DIR / f"{finding_num:04d}.md").exists()
 
 
+def file_hash(path):
+    """SHA-256 of a file's contents."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class Manifest:
+    """The hashes of the inputs behind each analysis, keyed by finding file
+    name (several findings can share a number)."""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.entries = json.loads(path.read_text()) if path.exists() else {}
+        self.instructions_hash = file_hash(PROMPT_PATH)
+
+    def status(self, finding_num, finding_path):
+        """Why a finding needs analyzing, or None if its analysis is current."""
+        if not is_analyzed(finding_num):
+            return "new"
+        entry = self.entries.get(finding_path.name)
+        if entry is None:
+            return "unrecorded"
+        if entry["finding_sha256"] != file_hash(finding_path):
+            return "finding changed"
+        if entry["instructions_sha256"] != self.instructions_hash:
+            return "instructions changed"
+        return None
+
+    def record(self, finding_num, finding_path):
+        """Record a finding's analysis as current, and save."""
+        self.entries[finding_path.name] = {
+            "analysis": f"{finding_num:04d}.md",
+            "finding_sha256": file_hash(finding_path),
+            "instructions_sha256": self.instructions_hash,
+        }
+        self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix(".tmp")
+        temp.write_text(json.dumps(self.entries, indent=2, sort_keys=True) + "\n")
+        temp.replace(self.path)
+
+    def clear(self):
+        self.entries = {}
+        if self.path.exists():
+            self.path.unlink()
+
+
 def build_prompt(finding_num, finding_path):
     """Build prompt from template with variable substitution."""
     return (
@@ -74,76 +139,162 @@ def build_prompt(finding_num, finding_path):
     )
 
 
-def analyze_finding(finding_num, finding_path, usage):
-    """Run claude --print to analyze one finding. Aborts on any failure."""
-    prompt = build_prompt(finding_num, finding_path)
+def output_stamp(path):
+    """(mtime, size) of an analysis file, or None if there is none."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def discard_output(finding_num, outcome):
+    """Delete the analysis file a failed or killed analysis wrote, so the
+    next run analyzes the finding again instead of finding it unrecorded."""
+    if outcome["returncode"] != 0 and outcome["wrote"]:
+        path = ANALYZED_DIR / f"{finding_num:04d}.md"
+        path.unlink(missing_ok=True)
+        print(f"  Removed {path.name}, written by an analysis that did not finish")
 
-    cmd = [
-        "claude", "--print",
-        "--model", MODEL,
-        "--output-format", "json",
-        "--permission-mode", "bypassPermissions",
-    ]
 
-    env = os.environ.copy()
-    env.pop("CLAUDECODE", None)
-    env["CLAUDE_CODE_EFFORT_LEVEL"] = "max"
+def analyze_finding(finding_num, finding_path, running):
+    """Run claude --print to analyze one finding.
+
+    Returns a dict with the elapsed time, the exit status and stderr, and the
+    token usage (None if claude reported none). Does not print or abort, so
+    it can run in a worker thread; see report_analysis.
+    """
+    prompt = build_prompt(finding_num, finding_path)
+    analysis_path = ANALYZED_DIR / f"{finding_num:04d}.md"
+    before = output_stamp(analysis_path)
 
+    cmd, env = claude_command()
     start = time.time()
 
-    result = subprocess.run(
+    proc = running.start(
         cmd,
-        input=prompt,
-        capture_output=True,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
         text=True,
         env=env,
         cwd=str(HARNESS_ROOT),
-        timeout=None,
     )
-
-    elapsed = time.time() - start
-
-    if result.returncode != 0:
+    try:
+        stdout, stderr = proc.communicate(input=prompt)
+    finally:
+        running.finished(proc)
+
+    return {
+        "elapsed": time.time() - start,
+        "returncode": proc.returncode,
+        "stderr": stderr,
+        "usage": token_usage(stdout),
+        "wrote": output_stamp(analysis_path) != before,
+    }
+
+
+def report_analysis(finding_num, finding_path, outcome, usage, manifest):
+    """Print one analysis result, add its usage and record it in the
+    manifest. Aborts on any failure."""
+    elapsed = outcome["elapsed"]
+
+    if outcome["returncode"] != 0:
+        discard_output(finding_num, outcome)
         stderr_lines = ""
-        if result.stderr:
+        if outcome["stderr"]:
             stderr_lines = "\n".join(
                 f"    {line}"
-                for line in result.stderr.strip().split("\n")[:5]
+                for line in outcome["stderr"].strip().split("\n")[:5]
             )
         abort(
-            f"claude exited {result.returncode} ({elapsed:.0f}s)\n{stderr_lines}",
+            f"claude exited {outcome['returncode']} ({elapsed:.0f}s)\n{stderr_lines}",
             finding_num,
         )
 
-    # Parse usage stats (best-effort)
-    try:
-        data = json.loads(result.stdout)
-        raw_usage = data.get("usage", {})
-        cost = data.get("total_cost_usd", 0)
-        inp = (
-            raw_usage.get("input_tokens", 0)
-            + raw_usage.get("cache_read_input_tokens", 0)
-            + raw_usage.get("cache_creation_input_tokens", 0)
-        )
-        out = raw_usage.get("output_tokens", 0)
+    if outcome["usage"] is not None:
+        inp = outcome["usage"]["input_tokens"]
+        out = outcome["usage"]["output_tokens"]
+        cost = outcome["usage"]["cost_usd"]
 
         usage["input_tokens"] += inp
         usage["output_tokens"] += out
         usage["cost_usd"] += cost
 
         print(f"  {elapsed:.0f}s | in:{inp:,} out:{out:,} ${cost:.4f}")
-    except (json.JSONDecodeError, KeyError):
+    else:
         print(f"  {elapsed:.0f}s [no token data]")
 
-    # Verify the analysis file was written
+    # Verify the analysis file was written by this call: a finding being
+    # re-analyzed still has the file from its last analysis
     analysis_path = ANALYZED_DIR / f"{finding_num:04d}.md"
-    if not analysis_path.exists():
+    if not outcome["wrote"] or not analysis_path.exists():
         abort(
-            f"Analysis file not created at {analysis_path}. "
+            f"Analysis file not written at {analysis_path}. "
             f"The model may have failed to write the file.",
             finding_num,
         )
 
+    manifest.record(finding_num, finding_path)
+
+
+def analyze_concurrently(to_process, concurrency, usage, manifest):
+    """Analyze findings on a pool of workers, reporting in finding order.
+
+    On the first failure the pending analyses are cancelled and the
+    running claude processes killed. Every analysis that succeeded, before
+    or after the failure in finding order, is still reported and recorded,
+    and files written by the killed ones are removed. Then it aborts.
+    """
+    running = RunningProcesses()
+    outcomes = {}
+    reported = 0
+
+    def report_ready():
+        nonlocal reported
+        while reported < len(to_process) and reported in outcomes:
+            num, path = to_process[reported]
+            print(f"\n[{reported + 1}/{len(to_process)}] Finding {num:04d}: {path.name}")
+            report_analysis(num, path, outcomes[reported], usage, manifest)
+            reported += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(analyze_finding, num, path, running): i
+            for i, (num, path) in enumerate(to_process)
+        }
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                outcome = future.result()
+                if outcome["returncode"] != 0 or not outcome["wrote"]:
+                    running.cancel()
+                    for pending in futures:
+                        pending.cancel()
+                    for other, j in futures.items():
+                        if j != i and j not in outcomes and not other.cancelled():
+                            try:
+                                outcomes[j] = other.result()
+                            except Cancelled:
+                                pass
+                    for j in sorted(j for j in outcomes if j >= reported):
+                        num, path = to_process[j]
+                        if outcomes[j]["returncode"] != 0:
+                            discard_output(num, outcomes[j])
+                        elif outcomes[j]["wrote"] and is_analyzed(num):
+                            print(f"\n[{j + 1}/{len(to_process)}] Finding {num:04d}: {path.name}")
+                            report_analysis(num, path, outcomes[j], usage, manifest)
+                    num, path = to_process[i]
+                    print(f"\n[{i + 1}/{len(to_process)}] Finding {num:04d}: {path.name}")
+                    report_analysis(num, path, outcome, usage, manifest)  # aborts
+                outcomes[i] = outcome
+                report_ready()
+        except BaseException:
+            running.cancel()
+            for pending in futures:
+                pending.cancel()
+            raise
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -165,6 +316,14 @@ def main():
         "--dry-run", action="store_true",
         help="Show what would be analyzed without running"
     )
+    parser.add_argument(
+        "--concurrency", type=int, default=1,
+        help="Number of findings to analyze at once (default 1)"
+    )
+    parser.add_argument(
+        "--adopt", action="store_true",
+        help="Record existing analyses missing from the manifest as current"
+    )
     args = parser.parse_args()
 
     if not FINDINGS_DIR.exists():
@@ -174,6 +333,17 @@ def main():
         abort(f"Prompt not found: {PROMPT_PATH}")
 
     findings = get_all_findings()
+    manifest = Manifest()
+
+    if args.adopt:
+        adopted = [(num, path) for num, path in findings
+                   if manifest.status(num, path) == "unrecorded"]
+        for num, path in adopted:
+            print(f"  {num:04d}: {path.name} [adopted]")
+            if not args.dry_run:
+                manifest.record(num, path)
+        print(f"Adopted {len(adopted)} analyses")
+        return
 
     # Determine which findings to process
     if args.reanalyze:
@@ -189,6 +359,7 @@ def main():
             elif ANALYZED_DIR.exists():
                 for f in ANALYZED_DIR.glob("*.md"):
                     f.unlink()
+                manifest.clear()
                 print("Deleted all analysis files for bootstrap")
 
         if args.from_num is not None:
@@ -196,7 +367,13 @@ def main():
         elif args.bootstrap:
             to_process = findings
         else:
-            to_process = [(num, path) for num, path in findings if not is_analyzed(num)]
+            statuses = [(num, path, manifest.status(num, path)) for num, path in findings]
+            to_process = [(num, path) for num, path, status in statuses
+                          if status not in (None, "unrecorded")]
+            unrecorded = [num for num, path, status in statuses if status == "unrecorded"]
+            if unrecorded:
+                print(f"{len(unrecorded)} analyses are not in the manifest and were "
+                      f"left alone; --adopt records them as current")
 
     if not to_process:
         print("All findings are analyzed")
@@ -204,11 +381,11 @@ def main():
 
     print(f"Analyzing {len(to_process)} findings "
           f"({to_process[0][0]:04d}–{to_process[-1][0]:04d})")
-    print(f"Model: {MODEL} | Thinking: max")
+    print(f"Model: {MODEL} | Thinking: max | Concurrency: {args.concurrency}")
 
     if args.dry_run:
         for num, path in to_process:
-            status = "reanalyze" if is_analyzed(num) else "new"
+            status = manifest.status(num, path) or "reanalyze"
             print(f"  {num:04d}: {path.name} [{status}]")
         return
 
@@ -218,10 +395,16 @@ def main():
     total_start = time.time()
     processed = 0
 
-    for i, (num, path) in enumerate(to_process):
-        print(f"\n[{i + 1}/{len(to_process)}] Finding {num:04d}: {path.name}")
-        analyze_finding(num, path, usage)  # aborts on any failure
-        processed += 1
+    if args.concurrency > 1:
+        analyze_concurrently(to_process, args.concurrency, usage, manifest)  # aborts on any failure
+        processed = len(to_process)
+    else:
+        running = RunningProcesses()
+        for i, (num, path) in enumerate(to_process):
+            print(f"\n[{i + 1}/{len(to_process)}] Finding {num:04d}: {path.name}")
+            outcome = analyze_finding(num, path, running)
+            report_analysis(num, path, outcome, usage, manifest)  # aborts on any failure
+            processed += 1
 
     total_elapsed = time.time() - total_start
     avg = total_elapsed / processed
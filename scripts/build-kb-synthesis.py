@@ -9,27 +9,49 @@ at once, enabling cross-finding synthesis and cross-references.
 This is separate from the formal KB pipeline (kb-pipeline.py) which
 analyzes findings incrementally.
 
+--map-reduce is for when all findings no longer fit one context. Findings
+are packed in order into batches under a token budget (estimated offline,
+no API call). The batches are synthesized in parallel into partial
+syntheses, then one reduce call merges the partials into kb-synthesis.md.
+Partials are cached in knowledge-base/synthesis-cache/ under the hash of
+their prompt, so adding a finding re-runs only the last batch and the
+reduce. The reduce is skipped when no partial changed.
+
 Usage:
     python scripts/build-kb-synthesis.py
     python scripts/build-kb-synthesis.py --dry-run
+    python scripts/build-kb-synthesis.py --map-reduce --dry-run
+    python scripts/build-kb-synthesis.py --map-reduce --batch-tokens 60000 --concurrency 4
 """
 
 import argparse
+import hashlib
 import json
-import os
 import re
 import subprocess
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from claude_runner import MODEL, Cancelled, RunningProcesses, claude_command, token_usage
+
 HARNESS_ROOT = Path(__file__).resolve().parent.parent
 FINDINGS_DIR = HARNESS_ROOT / "findings"
 KB_PATH = HARNESS_ROOT / "knowledge-base" / "kb-synthesis.md"
 PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
 PROMPT_PATH = PROMPTS_DIR / "kb-synthesis-instructions.md"
+BATCH_PROMPT_PATH = PROMPTS_DIR / "kb-synthesis-batch-instructions.md"
+REDUCE_PROMPT_PATH = PROMPTS_DIR / "kb-synthesis-reduce-instructions.md"
+CACHE_DIR = HARNESS_ROOT / "knowledge-base" / "synthesis-cache"
+REDUCE_STAMP_PATH = CACHE_DIR / "reduce.json"
+
+DEFAULT_BATCH_TOKENS = 60000
+DEFAULT_CONCURRENCY = 4
 
-MODEL = "claude-opus-4-6"
+# Pieces a BPE tokenizer keeps apart: runs of letters, single digits,
+# and single punctuation characters
+TOKEN_PIECE_RE = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]")
 
 
 def abort(message):
@@ -48,14 +70,246 @@ def get_all_findings():
     return findings
 
 
+def estimate_tokens(text):
+    """Estimate the token count of `text` without a tokenizer.
+
+    Each word costs one token per 4 letters (at least one), and each
+    digit and punctuation character one token. This errs high for prose
+    and code, which is the safe side for a budget.
+    """
+    return sum(
+        (len(piece) + 3) // 4 if piece[0].isalpha() else 1
+        for piece in TOKEN_PIECE_RE.findall(text)
+    )
+
+
+def format_findings(findings):
+    """The findings as they are injected into a prompt."""
+    return "\n\n".join(f"--- Finding {num:04d} ---\n{text}" for num, text in findings)
+
+
+def make_batches(findings, budget):
+    """Pack findings, in order, into batches of at most `budget` tokens.
+
+    A finding larger than the budget gets a batch of its own. Packing in
+    order keeps earlier batches unchanged when findings are appended.
+    """
+    batches = []
+    current = []
+    used = 0
+    for num, text in findings:
+        tokens = estimate_tokens(format_findings([(num, text)]))
+        if current and used + tokens > budget:
+            batches.append(current)
+            current = []
+            used = 0
+        current.append((num, text))
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def batch_prompt(template, batch, target_kb):
+    """The map prompt for one batch, still holding {{output_path}}.
+
+    Nothing in it depends on the other batches, so the hash of this text
+    is the batch's cache key. The caller fills in the output path, which
+    is named after that hash.
+    """
+    prompt = template.replace("{{findings}}", format_findings(batch))
+    prompt = prompt.replace("{{finding_count}}", str(len(batch)))
+    prompt = prompt.replace("{{first_finding}}", f"{batch[0][0]:04d}")
+    prompt = prompt.replace("{{last_finding}}", f"{batch[-1][0]:04d}")
+    prompt = prompt.replace("{{target_kb}}", str(target_kb))
+    return prompt
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def run_claude(prompt, running):
+    """Run one claude call. Returns (elapsed, returncode, stderr, summary),
+    where summary is the token/cost line, or None if it was cancelled."""
+    cmd, env = claude_command()
+    start = time.time()
+    try:
+        proc = running.start(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env,
+            cwd=str(HARNESS_ROOT),
+        )
+    except Cancelled:
+        return None
+    try:
+        stdout, stderr = proc.communicate(input=prompt)
+    finally:
+        running.finished(proc)
+    elapsed = time.time() - start
+
+    usage = token_usage(stdout)
+    if usage is None:
+        summary = f"{elapsed:.0f}s [no token data]"
+    else:
+        summary = (f"{elapsed:.0f}s | in:{usage['input_tokens']:,} "
+                   f"out:{usage['output_tokens']:,} ${usage['cost_usd']:.4f}")
+    return elapsed, proc.returncode, stderr, summary
+
+
+def check_call(label, result, output_path):
+    """Abort if a call failed or did not write its output."""
+    elapsed, returncode, stderr, summary = result
+    if returncode != 0:
+        stderr_lines = ""
+        if stderr:
+            stderr_lines = "\n".join(
+                f"    {line}" for line in stderr.strip().split("\n")[:5]
+            )
+        abort(f"{label}: claude exited {returncode} ({elapsed:.0f}s)\n{stderr_lines}")
+    if not output_path.exists() or not output_path.read_text().strip():
+        abort(f"{label}: {output_path} was not written")
+    print(f"  {label}: done. {summary}")
+
+
+def call_succeeded(future):
+    """Whether a finished map call ran and claude exited cleanly."""
+    if future.cancelled() or future.exception() is not None:
+        return False
+    result = future.result()
+    return result is not None and result[1] == 0
+
+
+def synthesize_batches(jobs, concurrency):
+    """Run the map calls for uncached batches, in parallel.
+
+    The first failure kills the calls still running and aborts. Partials
+    from calls that succeeded stay cached for the next run; anything a
+    failed or killed call wrote is deleted, so that it is not taken for a
+    cached partial.
+    """
+    running = RunningProcesses()
+    futures = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(run_claude, prompt, running): (label, path)
+                       for label, prompt, path in jobs}
+            try:
+                for future in as_completed(futures):
+                    label, path = futures[future]
+                    result = future.result()
+                    if result is None:
+                        continue
+                    if result[1] != 0 or not path.exists():
+                        running.cancel()
+                    check_call(label, result, path)
+            except BaseException:
+                running.cancel()
+                for pending in futures:
+                    pending.cancel()
+                raise
+    finally:
+        for future, (label, path) in futures.items():
+            if not call_succeeded(future) and path.exists():
+                path.unlink()
+                print(f"  {label}: removed {path.name}, written by a call that did not finish")
+
+
+def map_reduce(findings, budget, concurrency, dry_run):
+    """Synthesize findings in token-budgeted batches, then merge them."""
+    for path in (BATCH_PROMPT_PATH, REDUCE_PROMPT_PATH):
+        if not path.exists():
+            abort(f"Prompt not found: {path}")
+    batch_template = BATCH_PROMPT_PATH.read_text()
+    reduce_template = REDUCE_PROMPT_PATH.read_text()
+
+    batches = make_batches(findings, budget)
+    # Partials about a tenth of their input (~4 bytes per token), so the
+    # reduce prompt stays far smaller than the findings
+    target_kb = max(10, budget * 4 // 10 // 1000)
+
+    print(f"Findings: {len(findings)} ({findings[0][0]:04d}–{findings[-1][0]:04d})")
+    print(f"Batches: {len(batches)} (budget {budget:,} tokens, estimated offline)")
+    print(f"Model: {MODEL} | Thinking: max | Concurrency: {concurrency}")
+
+    jobs = []
+    partials = []
+    for i, batch in enumerate(batches, 1):
+        prompt = batch_prompt(batch_template, batch, target_kb)
+        key = content_hash(MODEL + "\n" + prompt)
+        path = CACHE_DIR / f"batch-{key[:16]}.md"
+        prompt = prompt.replace("{{output_path}}", str(path.relative_to(HARNESS_ROOT)))
+        cached = path.exists() and path.read_text().strip()
+        label = f"Batch {i} ({batch[0][0]:04d}–{batch[-1][0]:04d})"
+        print(f"  {label}: {len(batch)} findings, ~{estimate_tokens(prompt):,} tokens"
+              f"{' [cached]' if cached else ''}")
+        if not cached:
+            jobs.append((label, prompt, path))
+        partials.append(path)
+
+    if dry_run:
+        print(f"\nDry run — {len(jobs)} of {len(batches)} batches would run, then the reduce")
+        return
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    if jobs:
+        print(f"\nSynthesizing {len(jobs)} of {len(batches)} batches...")
+        synthesize_batches(jobs, min(concurrency, len(jobs)))
+
+    partials_text = "\n\n".join(
+        f"--- Batch {i} ---\n{path.read_text()}" for i, path in enumerate(partials, 1)
+    )
+    prompt = reduce_template.replace("{{partials}}", partials_text)
+    prompt = prompt.replace("{{batch_count}}", str(len(batches)))
+    prompt = prompt.replace("{{finding_count}}", str(len(findings)))
+    prompt = prompt.replace("{{last_finding}}", f"{findings[-1][0]:04d}")
+    key = content_hash(MODEL + "\n" + prompt)
+
+    stamp = json.loads(REDUCE_STAMP_PATH.read_text()) if REDUCE_STAMP_PATH.exists() else {}
+    if stamp.get("key") == key and KB_PATH.exists():
+        print(f"\nReduce: partials unchanged, {KB_PATH} is up to date")
+        return
+
+    print(f"\nReduce: merging {len(batches)} partials (~{estimate_tokens(prompt):,} tokens)")
+    KB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    if KB_PATH.exists():
+        KB_PATH.unlink()
+    check_call("Reduce", run_claude(prompt, RunningProcesses()), KB_PATH)
+    REDUCE_STAMP_PATH.write_text(json.dumps({"key": key, "batches": len(batches)}) + "\n")
+
+    # Drop partials no longer part of any batch
+    current = set(partials)
+    for path in CACHE_DIR.glob("batch-*.md"):
+        if path not in current:
+            path.unlink()
+
+    kb_size = KB_PATH.stat().st_size
+    print(f"KB written to {KB_PATH} ({kb_size:,} bytes)")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Build the synthesis KB — all findings in one Opus context"
     )
     parser.add_argument("--dry-run", action="store_true",
                         help="Show stats without running")
+    parser.add_argument("--map-reduce", action="store_true",
+                        help="Synthesize token-budgeted batches in parallel, then merge them")
+    parser.add_argument("--batch-tokens", type=int, default=DEFAULT_BATCH_TOKENS,
+                        help=f"Estimated tokens of findings per batch (default {DEFAULT_BATCH_TOKENS:,})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Batches to synthesize at once (default {DEFAULT_CONCURRENCY})")
     args = parser.parse_args()
 
+    if args.batch_tokens < 1:
+        abort("--batch-tokens must be at least 1")
+    if args.concurrency < 1:
+        abort("--concurrency must be at least 1")
+
     if not FINDINGS_DIR.exists():
         abort(f"Findings directory not found: {FINDINGS_DIR}")
 
@@ -66,13 +320,14 @@ def main():
     if not findings:
         abort("No findings found")
 
+    if args.map_reduce:
+        map_reduce(findings, args.batch_tokens, args.concurrency, args.dry_run)
+        return
+
     # Build the full prompt: instructions + all findings injected
     instructions = PROMPT_PATH.read_text()
 
-    findings_text = []
-    for num, text in findings:
-        findings_text.append(f"--- Finding {num:04d} ---\n{text}")
-    all_findings = "\n\n".join(findings_text)
+    all_findings = format_findings(findings)
 
     prompt = instructions.replace("{{findings}}", all_findings)
     prompt = prompt.replace("{{last_finding}}", f"{findings[-1][0]:04d}")
@@ -80,7 +335,7 @@ def main():
 
     prompt_size = len(prompt.encode())
     print(f"Findings: {len(findings)} ({findings[0][0]:04d}–{findings[-1][0]:04d})")
-    print(f"Prompt size: {prompt_size:,} bytes (~{prompt_size // 4:,} tokens)")
+    print(f"Prompt size: {prompt_size:,} bytes (~{estimate_tokens(prompt):,} tokens)")
     print(f"Model: {MODEL} | Thinking: max")
 
     if args.dry_run:
@@ -89,17 +344,7 @@ def main():
 
     KB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    cmd = [
-        "claude", "--print",
-        "--model", MODEL,
-        "--output-format", "json",
-        "--permission-mode", "bypassPermissions",
-    ]
-
-    env = os.environ.copy()
-    env.pop("CLAUDECODE", None)
-    env["CLAUDE_CODE_EFFORT_LEVEL"] = "max"
-
+    cmd, env = claude_command()
     start = time.time()
 
     result = subprocess.run(
@@ -123,19 +368,12 @@ def main():
             )
         abort(f"claude exited {result.returncode} ({elapsed:.0f}s)\n{stderr_lines}")
 
-    try:
-        data = json.loads(result.stdout)
-        usage = data.get("usage", {})
-        cost = data.get("total_cost_usd", 0)
-        inp = (
-            usage.get("input_tokens", 0)
-            + usage.get("cache_read_input_tokens", 0)
-            + usage.get("cache_creation_input_tokens", 0)
-        )
-        out = usage.get("output_tokens", 0)
-        print(f"Done. {elapsed:.0f}s | in:{inp:,} out:{out:,} ${cost:.4f}")
-    except (json.JSONDecodeError, KeyError):
+    usage = token_usage(result.stdout)
+    if usage is None:
         print(f"Done. {elapsed:.0f}s [no token data]")
+    else:
+        print(f"Done. {elapsed:.0f}s | in:{usage['input_tokens']:,} "
+              f"out:{usage['output_tokens']:,} ${usage['cost_usd']:.4f}")
 
     if KB_PATH.exists():
         kb_size = KB_PATH.stat().st_size
@@ -0,0 +1,90 @@
+"""
+Running claude, and the child processes of a parallel stage, shared by
+build, synthesis, audit and the pipeline.
+
+  claude_command   — the claude --print command line and its environment
+  token_usage      — token counts and cost from claude's JSON output
+  RunningProcesses — the processes in flight, so a failure can stop them all
+
+The claude CLI is looked up on PATH, so a stub executable placed first on
+PATH stands in for it when testing the scripts.
+"""
+
+import json
+import os
+import subprocess
+import threading
+
+MODEL = "claude-opus-4-6"
+
+
+class Cancelled(Exception):
+    """Raised when a process is started after its pool was cancelled."""
+
+
+class RunningProcesses:
+    """The processes in flight, so a failure can stop them all.
+
+    cancel() kills them, or with `terminate` sends SIGTERM so that a child
+    which runs processes of its own can stop those too.
+    """
+
+    def __init__(self, terminate=False):
+        self.terminate = terminate
+        self.lock = threading.Lock()
+        self.procs = set()
+        self.cancelled = False
+
+    def start(self, cmd, **kwargs):
+        with self.lock:
+            if self.cancelled:
+                raise Cancelled()
+            proc = subprocess.Popen(cmd, **kwargs)
+            self.procs.add(proc)
+        return proc
+
+    def finished(self, proc):
+        with self.lock:
+            self.procs.discard(proc)
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            for proc in self.procs:
+                if self.terminate:
+                    proc.terminate()
+                else:
+                    proc.kill()
+
+
+def claude_command():
+    """(cmd, env) for one claude --print call; the prompt goes on stdin."""
+    cmd = [
+        "claude", "--print",
+        "--model", MODEL,
+        "--output-format", "json",
+        "--permission-mode", "bypassPermissions",
+    ]
+    env = os.environ.copy()
+    env.pop("CLAUDECODE", None)
+    env["CLAUDE_CODE_EFFORT_LEVEL"] = "max"
+    return cmd, env
+
+
+def token_usage(stdout):
+    """Input tokens (cached included), output tokens and cost of a call,
+    or None if its output carries no usage."""
+    try:
+        data = json.loads(stdout)
+        usage = data.get("usage", {})
+        return {
+            "input_tokens": (
+                usage.get("input_tokens", 0)
+                + usage.get("cache_read_input_tokens", 0)
+                + usage.get("cache_creation_input_tokens", 0)
+            ),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cost_usd": data.get("total_cost_usd", 0),
+        }
+    except (json.JSONDecodeError, KeyError, AttributeError):
+        return None
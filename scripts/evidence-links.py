@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Check the golden evidence cited by findings against the scenarios.
+
+Resolves every golden JSON path, scenario name, scenario module and op
+type cited in findings/*.md against the evidence index (see
+evidence_index.py) in one pass, and lists the citations that point at
+nothing. The index is rebuilt only when febe/scenarios or golden/
+changed; goldens are never regenerated.
+
+Exits 1 if any citation is dangling.
+
+Usage:
+    python scripts/evidence-links.py                  # dangling citations
+    python scripts/evidence-links.py --links          # every citation and its scenarios
+    python scripts/evidence-links.py --scenario NAME  # findings citing a scenario
+    python scripts/evidence-links.py --rebuild
+"""
+
+import argparse
+import sys
+import time
+from collections import defaultdict
+
+from evidence_index import INDEX_PATH, EvidenceIndex, IndexUnavailable
+
+
+def abort(message):
+    print(f"\nABORTED: {message}", file=sys.stderr)
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check golden evidence citations in findings"
+    )
+    parser.add_argument("--links", action="store_true",
+                        help="List every citation with the scenarios it resolves to")
+    parser.add_argument("--scenario", metavar="NAME",
+                        help="List the findings citing a scenario (name or category/name)")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        index, rebuilt = EvidenceIndex.load(rebuild=args.rebuild)
+    except IndexUnavailable as e:
+        abort(str(e))
+    citations = list(index.citations())
+    elapsed = time.perf_counter() - start
+
+    if args.scenario:
+        wanted = args.scenario if "/" in args.scenario else None
+        citing = defaultdict(list)
+        # Op types resolve to every scenario using them; only count direct citations
+        for c in citations:
+            if c.kind == "op":
+                continue
+            for key in c.targets:
+                if key == wanted or key.split("/", 1)[-1] == args.scenario:
+                    citing[c.path].append(c.line)
+        for path, lines in sorted(citing.items()):
+            print(f"{path}: line {', '.join(map(str, lines))}")
+        print(f"{len(citing)} findings cite {args.scenario}")
+        return
+
+    if args.links:
+        for c in citations:
+            targets = ", ".join(c.targets) if c.targets else "DANGLING"
+            print(f"{c.path}:{c.line}: {c.kind} {c.text} → {targets}")
+
+    dangling = [c for c in citations if not c.targets]
+    if not args.links:
+        for c in dangling:
+            print(f"{c.path}:{c.line}: {c.kind} {c.text} — matches nothing")
+
+    findings = len({c.path for c in citations})
+    print(f"{len(citations)} citations in {findings} findings, {len(dangling)} dangling "
+          f"({len(index.scenarios)} scenarios{', index rebuilt' if rebuilt else ''}; "
+          f"{elapsed * 1000:.0f}ms)")
+    if rebuilt:
+        print(f"Index: {INDEX_PATH}")
+    if dangling:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
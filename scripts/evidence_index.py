@@ -0,0 +1,164 @@
+"""
+Index of the golden evidence that findings cite, and a resolver for it.
+
+The index lists every golden scenario (single- and multi-session): its
+category, name, scenario function, module, golden JSON path and the
+operation types it records. Operation types are read from the
+scenario's source ("op": "...") and, for goldens present in golden/,
+from the JSON itself, so nothing needs to be regenerated.
+
+Building the index imports febe/scenarios. It is cached in
+knowledge-base/evidence-index.json under a hash of the scenario sources
+and the golden files' sizes and mtimes, so later runs only hash files.
+
+Citations recognised in findings/*.md:
+  golden   — `name.json`, `category/name.json` or golden/.../*.json (globs allowed)
+  scenario — `name` scenario, scenario `name`, scenario_name
+  module   — febe/scenarios/....py
+  op       — "op": "name"
+
+Used by evidence-links.py (the command line) and audit-findings-kb.py.
+"""
+
+import hashlib
+import inspect
+import json
+import re
+import sys
+from collections import namedtuple
+from fnmatch import fnmatchcase
+from pathlib import Path
+
+HARNESS_ROOT = Path(__file__).resolve().parent.parent
+FEBE_DIR = HARNESS_ROOT / "febe"
+SCENARIOS_DIR = FEBE_DIR / "scenarios"
+GOLDEN_DIR = HARNESS_ROOT / "golden"
+FINDINGS_DIR = HARNESS_ROOT / "findings"
+INDEX_PATH = HARNESS_ROOT / "knowledge-base" / "evidence-index.json"
+
+OP_RE = re.compile(r'"op":\s*"(\w+)"')
+CITATION_PATTERNS = [
+    ("golden", re.compile(r"`([^`\s]*\.json)`|(?<![\w/])((?:[\w-]+/)*golden/[\w*/.-]+\.json)")),
+    ("scenario", re.compile(r"`(\w+)` scenario|scenario `(\w+)`|\b(scenario_\w+)")),
+    ("module", re.compile(r"(febe/scenarios/[\w/]+\.py)")),
+    ("op", OP_RE),
+]
+
+Citation = namedtuple("Citation", "path line kind text targets")
+
+
+class IndexUnavailable(Exception):
+    """Raised when the scenarios cannot be imported to build the index."""
+
+
+def sources_hash():
+    """SHA-256 over the scenario sources and the golden files' stats."""
+    h = hashlib.sha256()
+    for path in sorted(SCENARIOS_DIR.rglob("*.py")):
+        h.update(path.relative_to(HARNESS_ROOT).as_posix().encode())
+        h.update(hashlib.sha256(path.read_bytes()).digest())
+    for path in sorted(GOLDEN_DIR.rglob("*.json")):
+        st = path.stat()
+        h.update(f"{path.relative_to(HARNESS_ROOT).as_posix()} {st.st_mtime_ns} {st.st_size}".encode())
+    return h.hexdigest()
+
+
+def golden_ops(path):
+    """Operation types recorded in a golden file (empty if unreadable)."""
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return set()
+    return {op["op"] for op in data.get("operations", [])
+            if isinstance(op, dict) and isinstance(op.get("op"), str)}
+
+
+def build_index():
+    """Import the scenarios and describe each one."""
+    if str(FEBE_DIR) not in sys.path:
+        sys.path.insert(0, str(FEBE_DIR))
+    try:
+        from scenarios import ALL_SCENARIOS
+        from scenarios.multisession import MULTISESSION_SCENARIOS
+    except (ImportError, SyntaxError) as e:
+        raise IndexUnavailable(f"cannot import febe/scenarios: {e}")
+
+    scenarios = []
+    for category, name, func in ALL_SCENARIOS + MULTISESSION_SCENARIOS:
+        golden = f"golden/{category}/{name}.json"
+        ops = set(OP_RE.findall(inspect.getsource(func)))
+        ops |= golden_ops(HARNESS_ROOT / golden)
+        scenarios.append({
+            "category": category,
+            "name": name,
+            "function": func.__name__,
+            "module": Path(inspect.getsourcefile(func)).resolve().relative_to(HARNESS_ROOT).as_posix(),
+            "golden": golden,
+            "ops": sorted(ops),
+        })
+    return scenarios
+
+
+class EvidenceIndex:
+    """Scenario names, golden paths, modules and op types, for resolving
+    citations."""
+
+    def __init__(self, scenarios):
+        self.scenarios = scenarios
+        self.by_key = {f"{s['category']}/{s['name']}": s for s in scenarios}
+        self.by_name = {}
+        for s in scenarios:
+            for name in (s["name"], s["function"]):
+                self.by_name.setdefault(name, []).append(f"{s['category']}/{s['name']}")
+        self.ops = {}
+        for s in scenarios:
+            for op in s["ops"]:
+                self.ops.setdefault(op, []).append(f"{s['category']}/{s['name']}")
+
+    @classmethod
+    def load(cls, rebuild=False):
+        """The cached index, rebuilt first if the scenarios or goldens changed.
+
+        Returns (index, rebuilt).
+        """
+        key = sources_hash()
+        if not rebuild and INDEX_PATH.exists():
+            try:
+                cached = json.loads(INDEX_PATH.read_text())
+                if cached.get("sources_sha256") == key:
+                    return cls(cached["scenarios"]), False
+            except (ValueError, KeyError):
+                pass
+        scenarios = build_index()
+        INDEX_PATH.write_text(json.dumps(
+            {"sources_sha256": key, "scenarios": scenarios}, indent=1) + "\n")
+        return cls(scenarios), True
+
+    def resolve(self, kind, text):
+        """Scenario keys (category/name) a citation points to; empty if dangling."""
+        if kind == "golden":
+            pattern = text.split("golden/", 1)[-1][:-len(".json")]
+            if "/" in pattern:
+                return sorted(k for k in self.by_key if fnmatchcase(k, pattern))
+            return sorted(k for k in self.by_key if fnmatchcase(k.split("/", 1)[1], pattern))
+        if kind == "scenario":
+            return sorted(self.by_name.get(text, []))
+        if kind == "module":
+            keys = sorted(k for k, s in self.by_key.items() if s["module"] == text)
+            return keys or ([text] if (HARNESS_ROOT / text).is_file() else [])
+        if kind == "op":
+            return sorted(self.ops.get(text, []))
+        raise ValueError(f"unknown citation kind: {kind}")
+
+    def citations(self, paths=None):
+        """Every evidence citation in the findings, resolved, in file order."""
+        if paths is None:
+            paths = sorted(FINDINGS_DIR.glob("*.md"))
+        for path in paths:
+            rel = path.relative_to(HARNESS_ROOT).as_posix()
+            with open(path) as f:
+                for lineno, line in enumerate(f, 1):
+                    for kind, pattern in CITATION_PATTERNS:
+                        for m in pattern.finditer(line):
+                            text = next(g for g in m.groups() if g)
+                            yield Citation(rel, lineno, kind, text, self.resolve(kind, text))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Search findings, bugs, analyses and the KB from a persistent index.
+
+The index (knowledge-base/kb-index.sqlite, see kb_index.py) is brought up
+to date before every query; only files whose mtime or size changed are
+re-read. Each term matches as a phrase, so entry IDs and tumblers work
+as typed. Results are ranked by BM25, with entry IDs and titles weighted
+above body text.
+
+Usage:
+    python scripts/kb-index.py recombinend
+    python scripts/kb-index.py "[ST-INSERT]" --kind kb
+    python scripts/kb-index.py 1.1.0.1.0.1 --limit 20
+    python scripts/kb-index.py --stats
+    python scripts/kb-index.py --rebuild
+"""
+
+import argparse
+import sys
+import time
+
+from kb_index import INDEX_PATH, KINDS, IndexUnavailable, KBIndex
+
+
+def abort(message):
+    print(f"\nABORTED: {message}", file=sys.stderr)
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Search findings, bugs, analyses and the KB"
+    )
+    parser.add_argument("query", nargs="*", help="Terms to search for (all must match)")
+    parser.add_argument("--kind", action="append", choices=KINDS,
+                        help="Only search this kind of document (repeatable)")
+    parser.add_argument("--limit", type=int, default=10, help="Results to show (default 10)")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index everything")
+    parser.add_argument("--stats", action="store_true", help="Show what the index holds")
+    args = parser.parse_args()
+
+    try:
+        index = KBIndex()
+    except IndexUnavailable as e:
+        abort(str(e))
+
+    with index:
+        start = time.perf_counter()
+        indexed, removed = index.rebuild() if args.rebuild else index.update()
+        elapsed = time.perf_counter() - start
+        if indexed or removed or args.rebuild:
+            print(f"Indexed {len(indexed)} files, removed {len(removed)} "
+                  f"({elapsed * 1000:.0f}ms)")
+
+        if args.stats or not args.query:
+            print(f"Index: {INDEX_PATH}")
+            for kind, (files, units) in index.stats().items():
+                print(f"  {kind}: {files} files, {units} documents")
+            if not args.query:
+                return
+
+        query = " ".join(args.query)
+        start = time.perf_counter()
+        hits = index.search(query, kinds=args.kind, limit=args.limit)
+        elapsed = time.perf_counter() - start
+
+        for rank, hit in enumerate(hits, 1):
+            label = f"{hit.path} [{hit.entry_id}]" if hit.entry_id else hit.path
+            print(f"{rank:>3}. {label} ({hit.kind})")
+            print(f"     {hit.title}")
+            print(f"     {' '.join(hit.snippet.split())}")
+        print(f"{len(hits)} results for {query!r} ({elapsed * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
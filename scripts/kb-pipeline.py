@@ -2,8 +2,20 @@
 """
 Findings KB pipeline — analyze, assemble, organize, audit.
 
-Orchestrates the four stages of KB construction. Stops after audit
-for human review.
+Orchestrates the stages of KB construction. Stops after audit for human
+review.
+
+The stages form a DAG. Each declares the files it reads and writes:
+
+    analyze → assemble → organize ─┬→ audit checks ─┬→ audit report
+                                   └→ audit review ─┘
+
+A stage is skipped when the content of its inputs (and its arguments)
+is unchanged since its last successful run and its outputs exist. The
+hashes are kept in knowledge-base/pipeline-state.json. Stages whose
+dependencies are done run together; the audit's mechanical checks run
+alongside the model review. Every run appends its per-stage timings to
+knowledge-base/pipeline-runs.jsonl.
 
 Usage:
     python scripts/kb-pipeline.py                          # full pipeline
@@ -14,38 +26,265 @@ Usage:
     python scripts/kb-pipeline.py --organize               # stage 3 only
     python scripts/kb-pipeline.py --audit                  # stage 4 only
     python scripts/kb-pipeline.py --dry-run                # preview all stages
+    python scripts/kb-pipeline.py --concurrency 4          # analyze 4 findings at a time
+    python scripts/kb-pipeline.py --incremental            # redo only what changed
+    python scripts/kb-pipeline.py --force                  # run stages even if unchanged
+    python scripts/kb-pipeline.py --shard-review           # review KB sections concurrently
 """
 
 import argparse
+import hashlib
+import json
+import os
 import subprocess
 import sys
+import threading
 import time
+from datetime import datetime
 from pathlib import Path
 
+from claude_runner import Cancelled, RunningProcesses
+
 SCRIPTS_DIR = Path(__file__).resolve().parent
 HARNESS_ROOT = SCRIPTS_DIR.parent
 AUDIT_PATH = HARNESS_ROOT / "knowledge-base" / "audit.md"
+STATE_PATH = HARNESS_ROOT / "knowledge-base" / "pipeline-state.json"
+RUN_LOG_PATH = HARNESS_ROOT / "knowledge-base" / "pipeline-runs.jsonl"
+
+
+class Stage:
+    """One pipeline stage: a script and its arguments, the files it reads
+    and writes (globs relative to the harness root), and the stages it
+    runs after.
+
+    `args` are part of the stage's signature; `extra_args` (which only
+    change how the stage works, not what it produces) are not. A forced
+    stage always runs.
+    """
+
+    def __init__(self, name, script, args, inputs, outputs, after=(),
+                 extra_args=(), forced=False):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.extra_args = list(extra_args)
+        self.inputs = [f"scripts/{script}"] + list(inputs)
+        self.outputs = list(outputs)
+        self.after = list(after)
+        self.forced = forced
+
+    def signature(self):
+        """SHA-256 over the arguments and the content of every input."""
+        h = hashlib.sha256()
+        h.update(json.dumps(self.args).encode())
+        for pattern in self.inputs:
+            for path in sorted(HARNESS_ROOT.glob(pattern)):
+                if path.is_file():
+                    h.update(path.relative_to(HARNESS_ROOT).as_posix().encode())
+                    h.update(hashlib.sha256(path.read_bytes()).digest())
+        return h.hexdigest()
+
+    def outputs_exist(self):
+        return all(any(HARNESS_ROOT.glob(pattern)) for pattern in self.outputs)
+
+
+def build_stages(args):
+    """The pipeline DAG for these command-line options, in order."""
+    analyze_args = []
+    if args.bootstrap:
+        analyze_args.append("--bootstrap")
+    if args.reanalyze:
+        analyze_args.extend(["--reanalyze", args.reanalyze])
+    if args.from_num is not None:
+        analyze_args.extend(["--from", str(args.from_num)])
+    analyze_extra = []
+    if args.concurrency is not None:
+        analyze_extra.extend(["--concurrency", str(args.concurrency)])
+
+    incremental = ["--incremental"] if args.incremental else []
+    skip_opus = ["--skip-opus"] if args.skip_opus else []
+
+    stages = [
+        Stage("Analyze", "build-findings-kb.py", analyze_args,
+              inputs=["findings/*.md", "scripts/prompts/findings-kb-instructions.md"],
+              outputs=["knowledge-base/analyzed/*.md"],
+              extra_args=analyze_extra,
+              forced=bool(args.bootstrap or args.reanalyze or args.from_num is not None)),
+        Stage("Assemble", "assemble-findings-kb.py", [],
+              inputs=["knowledge-base/analyzed/*.md"],
+              outputs=["knowledge-base/assembled.md"],
+              after=["Analyze"], extra_args=incremental),
+        Stage("Organize", "organize-findings-kb.py", [],
+              inputs=["knowledge-base/assembled.md", "scripts/kb_parser.py"],
+              outputs=["knowledge-base/kb-formal.md"],
+              after=["Assemble"], extra_args=incremental),
+        Stage("Audit checks", "audit-findings-kb.py", ["--only", "checks"],
+              inputs=["knowledge-base/kb-formal.md", "findings/*.md", "bugs/*.md",
+                      "knowledge-base/analyzed/*.md",
+                      "febe/scenarios/**/*.py", "golden/**/*.json",
+                      "scripts/kb_parser.py", "scripts/kb_index.py",
+                      "scripts/evidence_index.py"],
+              outputs=["knowledge-base/audit-checks.json"],
+              after=["Organize"]),
+    ]
+    if not args.skip_opus:
+        stages.append(
+            Stage("Audit review", "audit-findings-kb.py",
+                  ["--only", "review"] + (["--shard"] if args.shard_review else []),
+                  inputs=["knowledge-base/kb-formal.md",
+                          "scripts/prompts/kb-audit-instructions.md",
+                          "scripts/kb_parser.py"],
+                  outputs=["knowledge-base/miscategorized.md"],
+                  after=["Organize"]))
+    stages.append(
+        Stage("Audit report", "audit-findings-kb.py", ["--only", "report"] + skip_opus,
+              inputs=["knowledge-base/audit-checks.json"]
+                     + ([] if args.skip_opus else ["knowledge-base/miscategorized.md"]),
+              outputs=["knowledge-base/audit.md"],
+              after=["Audit checks"] + ([] if args.skip_opus else ["Audit review"])))
+    return stages
+
+
+def waves(stages):
+    """Group stages into waves; each wave's stages depend only on earlier
+    waves (dependencies outside `stages` count as done)."""
+    names = {s.name for s in stages}
+    done = set()
+    remaining = list(stages)
+    result = []
+    while remaining:
+        wave = [s for s in remaining
+                if all(d in done or d not in names for d in s.after)]
+        result.append(wave)
+        done.update(s.name for s in wave)
+        remaining = [s for s in remaining if s not in wave]
+    return result
+
+
+def load_state():
+    return json.loads(STATE_PATH.read_text()) if STATE_PATH.exists() else {}
+
+
+def save_state(state):
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    temp = STATE_PATH.with_suffix(".tmp")
+    temp.write_text(json.dumps(state, indent=2, sort_keys=True) + "\n")
+    temp.replace(STATE_PATH)
 
 
-def run_stage(name, script, args=None):
-    """Run a pipeline stage. Aborts pipeline on failure."""
-    cmd = [sys.executable, str(SCRIPTS_DIR / script)]
-    if args:
-        cmd.extend(args)
+def why_run(stage, state, signature, force):
+    """Why the stage must run, or None if it can be skipped."""
+    if force:
+        return "--force"
+    if stage.forced:
+        return "forced by options"
+    if stage.name not in state:
+        return "no successful run recorded"
+    if state[stage.name] != signature:
+        return "inputs changed"
+    if not stage.outputs_exist():
+        return "outputs missing"
+    return None
 
+
+def run_stage(stage, running, prefix=False, dry_run=False):
+    """Run a stage's script. With `prefix`, its output lines are tagged with
+    the stage name (for stages running side by side). Returns the exit
+    code, or None if the stage was cancelled before starting."""
+    cmd = [sys.executable, str(SCRIPTS_DIR / stage.script)] + stage.args + stage.extra_args
+    if dry_run:
+        cmd.append("--dry-run")
+    if not prefix:
+        try:
+            proc = running.start(cmd, cwd=str(HARNESS_ROOT))
+        except Cancelled:
+            return None
+        try:
+            return proc.wait()
+        finally:
+            running.finished(proc)
+
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    try:
+        proc = running.start(cmd, cwd=str(HARNESS_ROOT), env=env, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, text=True, bufsize=1)
+    except Cancelled:
+        return None
+    try:
+        for line in proc.stdout:
+            print(f"[{stage.name}] {line}", end="", flush=True)
+        return proc.wait()
+    finally:
+        running.finished(proc)
+
+
+def run_wave(wave, records):
+    """Run a wave's stages side by side. Returns the stages that failed."""
+    running = RunningProcesses(terminate=True)
+    results = {}
+    prefix = len(wave) > 1
+
+    def worker(stage):
+        start = time.time()
+        code = run_stage(stage, running, prefix=prefix)
+        results[stage.name] = (code, time.time() - start)
+        if code not in (0, None):
+            running.cancel()
+
+    names = ", ".join(s.name for s in wave)
     print(f"\n{'=' * 50}")
-    print(f"STAGE: {name}")
+    print(f"STAGE: {names}")
     print(f"{'=' * 50}")
 
-    start = time.time()
-    result = subprocess.run(cmd, cwd=str(HARNESS_ROOT))
-    elapsed = time.time() - start
+    threads = [threading.Thread(target=worker, args=(s,)) for s in wave]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    except BaseException:
+        running.cancel()
+        raise
+
+    failed = []
+    for stage in wave:
+        code, elapsed = results[stage.name]
+        record = records[stage.name]
+        record["seconds"] = round(elapsed, 3)
+        if code == 0:
+            record["status"] = "ran"
+            print(f"\n{stage.name} complete ({elapsed:.0f}s)")
+        elif code is None or code < 0:
+            record["status"] = "cancelled"
+            print(f"\n{stage.name} cancelled ({elapsed:.0f}s)")
+            failed.append(stage)
+        else:
+            record["status"] = "failed"
+            print(f"\n{stage.name} failed (exit {code}, {elapsed:.0f}s)")
+            failed.append(stage)
+    return failed
+
 
-    if result.returncode != 0:
-        print(f"\n{name} failed (exit {result.returncode}, {elapsed:.0f}s)")
-        sys.exit(1)
+def write_run_log(started, records, total, result):
+    RUN_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "started": started,
+        "argv": sys.argv[1:],
+        "result": result,
+        "seconds": round(total, 3),
+        "stages": list(records.values()),
+    }
+    with RUN_LOG_PATH.open("a") as f:
+        f.write(json.dumps(entry) + "\n")
 
-    print(f"\n{name} complete ({elapsed:.0f}s)")
+
+def print_timings(records, total):
+    print(f"\n{'=' * 50}")
+    print("Stage timings")
+    for record in records.values():
+        seconds = f"{record['seconds']:.1f}s" if record["seconds"] is not None else "-"
+        print(f"  {record['name']:<14} {record['status']:<10} {seconds:>8}  {record['reason']}")
+    print(f"  {'total':<14} {'':<10} {total:>7.1f}s")
 
 
 def main():
@@ -65,64 +304,105 @@ def main():
     parser.add_argument("--reanalyze", default=None, help="Re-analyze specific findings (comma-separated)")
     parser.add_argument("--from", dest="from_num", type=int, default=None, help="Start analysis from this finding")
     parser.add_argument("--dry-run", action="store_true", help="Preview without running")
+    parser.add_argument("--concurrency", type=int, default=None, help="Findings to analyze at once")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Assemble and organize only what changed")
+    parser.add_argument("--shard-review", action="store_true",
+                        help="Review each KB category section in its own call")
+    parser.add_argument("--force", action="store_true",
+                        help="Run the selected stages even if their inputs are unchanged")
 
     args = parser.parse_args()
 
+    stages = build_stages(args)
+
     # Determine which stages to run
-    single_stage = args.analyze or args.assemble or args.organize or args.audit
+    selected = {
+        "Analyze": args.analyze,
+        "Assemble": args.assemble,
+        "Organize": args.organize,
+        "Audit checks": args.audit,
+        "Audit review": args.audit,
+        "Audit report": args.audit,
+    }
+    if any(selected.values()):
+        stages = [s for s in stages if selected[s.name]]
 
-    # Build stage args
-    analyze_args = []
-    if args.bootstrap:
-        analyze_args.append("--bootstrap")
-    if args.reanalyze:
-        analyze_args.extend(["--reanalyze", args.reanalyze])
-    if args.from_num is not None:
-        analyze_args.extend(["--from", str(args.from_num)])
-    if args.dry_run:
-        analyze_args.append("--dry-run")
+    state = load_state()
 
-    assemble_args = []
     if args.dry_run:
-        assemble_args.append("--dry-run")
-
-    audit_args = []
-    if args.skip_opus:
-        audit_args.append("--skip-opus")
+        print("Plan:")
+        upstream = set()
+        for stage in stages:
+            reason = why_run(stage, state, stage.signature(), args.force)
+            if reason is None and any(d in upstream for d in stage.after):
+                reason = "if upstream changes its inputs"
+            if reason:
+                upstream.add(stage.name)
+            print(f"  {stage.name:<14} {'run' if reason else 'skip':<5} "
+                  f"{reason or 'inputs unchanged'}")
+        # Analyze and assemble can preview their own work
+        running = RunningProcesses(terminate=True)
+        for stage in stages:
+            if stage.name in ("Analyze", "Assemble"):
+                print(f"\n{'=' * 50}")
+                print(f"STAGE: {stage.name} (dry run)")
+                print(f"{'=' * 50}")
+                if run_stage(stage, running, dry_run=True) != 0:
+                    sys.exit(1)
+        print("\nDry run — skipping organize and audit")
+        return
 
+    started = datetime.now().isoformat(timespec="seconds")
     total_start = time.time()
+    records = {s.name: {"name": s.name, "status": "pending", "seconds": None, "reason": ""}
+               for s in stages}
 
-    if single_stage:
-        if args.analyze:
-            run_stage("Analyze", "build-findings-kb.py", analyze_args)
-        if args.assemble:
-            run_stage("Assemble", "assemble-findings-kb.py", assemble_args)
-        if args.organize:
-            run_stage("Organize", "organize-findings-kb.py")
-        if args.audit:
-            run_stage("Audit", "audit-findings-kb.py", audit_args)
-    else:
-        # Full pipeline
-        run_stage("Analyze", "build-findings-kb.py", analyze_args)
-        run_stage("Assemble", "assemble-findings-kb.py", assemble_args)
-
-        if args.dry_run:
-            print("\nDry run — skipping organize and audit")
-        else:
-            run_stage("Organize", "organize-findings-kb.py")
-            run_stage("Audit", "audit-findings-kb.py", audit_args)
-
-            total_elapsed = time.time() - total_start
-            print(f"\n{'=' * 50}")
-            print(f"Pipeline complete ({total_elapsed:.0f}s)")
-            print(f"{'=' * 50}")
-            print(f"\nReview: knowledge-base/audit.md")
-            if AUDIT_PATH.exists():
-                lines = AUDIT_PATH.read_text().split("\n")
-                for line in lines[:10]:
-                    print(f"  {line}")
-                if len(lines) > 10:
-                    print(f"  ... ({len(lines) - 10} more lines)")
+    for wave in waves(stages):
+        to_run = []
+        signatures = {}
+        for stage in wave:
+            signatures[stage.name] = stage.signature()
+            reason = why_run(stage, state, signatures[stage.name], args.force)
+            records[stage.name]["reason"] = reason or "inputs unchanged"
+            if reason is None:
+                records[stage.name]["status"] = "skipped"
+                print(f"\n{stage.name}: skipped (inputs unchanged)")
+            else:
+                to_run.append(stage)
+
+        if not to_run:
+            continue
+
+        failed = run_wave(to_run, records)
+        for stage in to_run:
+            if stage not in failed and stage.outputs_exist():
+                state[stage.name] = signatures[stage.name]
+            else:
+                state.pop(stage.name, None)
+        save_state(state)
+
+        if failed:
+            total = time.time() - total_start
+            write_run_log(started, records, total, "failed")
+            print_timings(records, total)
+            sys.exit(1)
+
+    total_elapsed = time.time() - total_start
+    write_run_log(started, records, total_elapsed, "ok")
+    print_timings(records, total_elapsed)
+
+    if records.get("Audit report", {}).get("status") in ("ran", "skipped"):
+        print(f"{'=' * 50}")
+        print(f"Pipeline complete ({total_elapsed:.0f}s)")
+        print(f"{'=' * 50}")
+        print(f"\nReview: knowledge-base/audit.md")
+        if AUDIT_PATH.exists():
+            lines = AUDIT_PATH.read_text().split("\n")
+            for line in lines[:10]:
+                print(f"  {line}")
+            if len(lines) > 10:
+                print(f"  ... ({len(lines) - 10} more lines)")
 
 
 if __name__ == "__main__":
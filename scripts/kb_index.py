@@ -0,0 +1,218 @@
+"""
+Persistent full-text and entry-ID index over findings, bugs and the KB.
+
+Stored in knowledge-base/kb-index.sqlite as an SQLite FTS5 table. Each
+finding and bug is one document. Analysis files and kb-formal.md are
+split into one document per entry, so queries land on entries. Every
+[XX-NAME] citation is also recorded, with the entry or file that makes
+it, for cross-reference checks.
+
+update() re-indexes only files whose mtime or size changed and drops
+files that are gone, so an unchanged tree costs one stat per file.
+
+Used by kb-index.py (the command line) and audit-findings-kb.py.
+"""
+
+import re
+import sqlite3
+from collections import namedtuple
+from pathlib import Path
+
+from kb_parser import parse_analyses, parse_kb, read_lines
+
+HARNESS_ROOT = Path(__file__).resolve().parent.parent
+INDEX_PATH = HARNESS_ROOT / "knowledge-base" / "kb-index.sqlite"
+KB_REL_PATH = "knowledge-base/kb-formal.md"
+
+# (kind, glob relative to the harness root)
+SOURCES = [
+    ("finding", "findings/*.md"),
+    ("bug", "bugs/*.md"),
+    ("analysis", "knowledge-base/analyzed/*.md"),
+    ("kb", KB_REL_PATH),
+]
+KINDS = [kind for kind, _ in SOURCES]
+
+REF_RE = re.compile(r"\[([A-Z]+-[A-Z][A-Z0-9-]+)\]")
+ENTRY_ID_RE = re.compile(r"^[A-Z]+-[A-Z][A-Z0-9-]+$")
+TITLE_RE = re.compile(r"^#\s+(.*)$", re.M)
+
+# bm25 weights for path, kind, entry_id, title, body
+RANK = "bm25(units, 0, 0, 10.0, 5.0, 1.0)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS units USING fts5(
+    path UNINDEXED, kind UNINDEXED, entry_id, title, body
+);
+CREATE TABLE IF NOT EXISTS citations (
+    path TEXT NOT NULL,
+    source TEXT NOT NULL,
+    ref TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS citations_path ON citations (path);
+CREATE INDEX IF NOT EXISTS citations_ref ON citations (ref);
+"""
+
+Hit = namedtuple("Hit", "kind path entry_id title snippet score")
+
+
+class IndexUnavailable(Exception):
+    """Raised when this Python's SQLite was built without FTS5."""
+
+
+def fts5_available():
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def match_expression(query):
+    """Turn a plain query into an FTS5 expression.
+
+    Each whitespace-separated term becomes a quoted phrase, so entry IDs
+    (brackets optional) and tumblers match as token sequences and FTS5
+    operators in the input are taken literally. All terms must match.
+    """
+    terms = [t.strip("[]") for t in query.split()]
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms if t)
+
+
+def units_for(kind, path):
+    """The (entry_id, title, body) documents one file contributes."""
+    if kind == "kb":
+        return [(e.entry_id, e.entry_id, e.body) for e in parse_kb(read_lines(path))]
+    if kind == "analysis":
+        return [(e.entry_id, f"Finding {e.finding}", e.body)
+                for e in parse_analyses(read_lines(path))]
+    text = path.read_text()
+    m = TITLE_RE.search(text)
+    return [("", m.group(1).strip() if m else path.stem, text)]
+
+
+class KBIndex:
+    """The on-disk index. Use as a context manager to close the database."""
+
+    def __init__(self, path=INDEX_PATH, root=HARNESS_ROOT):
+        if not fts5_available():
+            raise IndexUnavailable("SQLite was built without FTS5")
+        self.root = root
+        self.db = sqlite3.connect(str(path))
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def source_files(self):
+        """(kind, relative path, path) for every file the index covers."""
+        for kind, pattern in SOURCES:
+            for path in sorted(self.root.glob(pattern)):
+                if path.is_file():
+                    yield kind, path.relative_to(self.root).as_posix(), path
+
+    def update(self):
+        """Re-index changed files and drop removed ones.
+
+        Returns (indexed, removed) lists of relative paths.
+        """
+        known = {row[0]: (row[1], row[2])
+                 for row in self.db.execute("SELECT path, mtime_ns, size FROM files")}
+        indexed = []
+        seen = set()
+        with self.db:
+            for kind, rel, path in self.source_files():
+                seen.add(rel)
+                st = path.stat()
+                if known.get(rel) == (st.st_mtime_ns, st.st_size):
+                    continue
+                self._drop(rel)
+                for entry_id, title, body in units_for(kind, path):
+                    self.db.execute(
+                        "INSERT INTO units (path, kind, entry_id, title, body) VALUES (?, ?, ?, ?, ?)",
+                        (rel, kind, entry_id, title, body))
+                    source = entry_id or path.name
+                    self.db.executemany(
+                        "INSERT INTO citations (path, source, ref) VALUES (?, ?, ?)",
+                        [(rel, source, ref) for ref in REF_RE.findall(body)])
+                self.db.execute(
+                    "INSERT OR REPLACE INTO files (path, kind, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                    (rel, kind, st.st_mtime_ns, st.st_size))
+                indexed.append(rel)
+
+            removed = sorted(set(known) - seen)
+            for rel in removed:
+                self._drop(rel)
+                self.db.execute("DELETE FROM files WHERE path = ?", (rel,))
+        return indexed, removed
+
+    def _drop(self, rel):
+        self.db.execute("DELETE FROM units WHERE path = ?", (rel,))
+        self.db.execute("DELETE FROM citations WHERE path = ?", (rel,))
+
+    def rebuild(self):
+        """Forget everything and index from scratch."""
+        with self.db:
+            for table in ("files", "units", "citations"):
+                self.db.execute(f"DELETE FROM {table}")
+        return self.update()
+
+    def search(self, query, kinds=None, limit=10):
+        """Best-ranked documents matching every term of `query`.
+
+        Documents that are the entry a query term names come first.
+        """
+        expression = match_expression(query)
+        if not expression:
+            return []
+        named = [t.strip("[]") for t in query.split() if ENTRY_ID_RE.match(t.strip("[]"))]
+        sql = (f"SELECT kind, path, entry_id, title, "
+               f"snippet(units, 4, '«', '»', '…', 12), {RANK} AS score "
+               f"FROM units WHERE units MATCH ?")
+        params = [expression]
+        if kinds:
+            sql += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        sql += f" ORDER BY entry_id IN ({', '.join('?' * len(named))}) DESC, score LIMIT ?"
+        params.extend(named)
+        params.append(limit)
+        return [Hit(*row) for row in self.db.execute(sql, params)]
+
+    def entry_ids(self, kind="kb"):
+        """Entry IDs defined by documents of one kind."""
+        return {row[0] for row in self.db.execute(
+            "SELECT DISTINCT entry_id FROM units WHERE kind = ? AND entry_id != ''", (kind,))}
+
+    def dead_references(self, path=KB_REL_PATH):
+        """(source, ref) for each citation in `path` naming no KB entry, in file order."""
+        return self.db.execute(
+            "SELECT source, ref FROM citations WHERE path = ? AND ref NOT IN "
+            "(SELECT entry_id FROM units WHERE kind = 'kb') ORDER BY rowid",
+            (path,)).fetchall()
+
+    def citing_files(self, ref, exclude=KB_REL_PATH):
+        """Other files that cite `ref`."""
+        return [row[0] for row in self.db.execute(
+            "SELECT DISTINCT path FROM citations WHERE ref = ? AND path != ? ORDER BY path",
+            (ref, exclude))]
+
+    def stats(self):
+        """Document and file counts per kind."""
+        counts = {}
+        for kind in KINDS:
+            files = self.db.execute("SELECT COUNT(*) FROM files WHERE kind = ?", (kind,)).fetchone()[0]
+            units = self.db.execute("SELECT COUNT(*) FROM units WHERE kind = ?", (kind,)).fetchone()[0]
+            counts[kind] = (files, units)
+        return counts
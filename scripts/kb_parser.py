@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Streaming parser for the findings KB, shared by organize and audit.
+
+Both formats are parsed in a single pass over lines with precompiled
+patterns. The parsers are generators: they accept any iterable of lines
+(a list, or read_lines() over a file) and yield one entry at a time, so
+a stage never needs the whole file in memory.
+
+  parse_analyses — analysis files or assembled.md, yields AnalysisEntry
+  parse_kb       — kb-formal.md, yields KBEntry
+
+Run directly to benchmark both parsers on the files in knowledge-base/:
+    python scripts/kb_parser.py
+    python scripts/kb_parser.py --repeat 50
+"""
+
+import argparse
+import re
+import time
+from collections import namedtuple
+from pathlib import Path
+
+HARNESS_ROOT = Path(__file__).resolve().parent.parent
+ASSEMBLED_PATH = HARNESS_ROOT / "knowledge-base" / "assembled.md"
+KB_PATH = HARNESS_ROOT / "knowledge-base" / "kb-formal.md"
+
+FINDING_RE = re.compile(r"^# Finding (\d+) Analysis")
+FINDING_BOUNDARY_RE = re.compile(r"^# Finding \d+")
+ENTRY_RE = re.compile(r"^### ([A-Z]+-[A-Z0-9-]+)")
+HEADER_RE = re.compile(r"^###\s")
+KB_BOUNDARY_RE = re.compile(r"^#{2,3} ")
+
+AnalysisEntry = namedtuple("AnalysisEntry", "entry_id finding body")
+KBEntry = namedtuple("KBEntry", "entry_id body")
+
+
+def read_lines(path):
+    """Lines of a file without their newlines, read one at a time."""
+    with open(path) as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
+def parse_analyses(lines):
+    """Yield an AnalysisEntry for each entry in analysis output.
+
+    An entry runs from its ### header to the next ### header, the next
+    "# Finding" heading, or a --- separator (which is consumed). Entries
+    before the first "# Finding NNNN Analysis" heading and "## Omit"
+    sections are skipped.
+    """
+    finding = None
+    entry_id = None
+    body = []
+    for line in lines:
+        if entry_id is not None:
+            if line.strip() == "---":
+                yield AnalysisEntry(entry_id, finding, "\n".join(body).strip())
+                entry_id = None
+                continue
+            if not (HEADER_RE.match(line) or FINDING_BOUNDARY_RE.match(line)):
+                body.append(line)
+                continue
+            yield AnalysisEntry(entry_id, finding, "\n".join(body).strip())
+            entry_id = None
+
+        m = FINDING_RE.match(line)
+        if m:
+            finding = m.group(1)
+            continue
+        if line.startswith("## Omit"):
+            continue
+        m = ENTRY_RE.match(line)
+        if m and finding:
+            entry_id = m.group(1)
+            body = []
+
+    if entry_id is not None:
+        yield AnalysisEntry(entry_id, finding, "\n".join(body).strip())
+
+
+def parse_kb(lines):
+    """Yield a KBEntry for each entry in kb-formal.md.
+
+    An entry runs from its ### header to the next ### or ## heading.
+    """
+    entry_id = None
+    body = []
+    for line in lines:
+        if entry_id is not None:
+            if not (line.startswith("##") and KB_BOUNDARY_RE.match(line)):
+                body.append(line)
+                continue
+            yield KBEntry(entry_id, "\n".join(body).strip())
+            entry_id = None
+
+        m = ENTRY_RE.match(line)
+        if m:
+            entry_id = m.group(1)
+            body = []
+
+    if entry_id is not None:
+        yield KBEntry(entry_id, "\n".join(body).strip())
+
+
+def benchmark(name, path, parse, repeat):
+    """Best-of-`repeat` time to stream-parse one file."""
+    if not path.exists():
+        print(f"{name}: {path} not found, skipped")
+        return
+    size = path.stat().st_size
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in parse(read_lines(path)))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name}: {size:,} bytes, {count} entries, "
+          f"{best * 1000:.1f}ms ({size / best / 1e6:.0f} MB/s, best of {repeat})")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the streaming KB parsers"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=20,
+        help="Runs per file; the best is reported (default 20)"
+    )
+    args = parser.parse_args()
+
+    benchmark("kb-formal.md", KB_PATH, parse_kb, args.repeat)
+    benchmark("assembled.md", ASSEMBLED_PATH, parse_analyses, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,24 +8,47 @@ Stage 3 of the KB pipeline:
   3. organize (this script) — group by category, preserve all contributions
   4. audit (audit-findings-kb.py) — review the full KB for quality
 
-Parses the assembled analysis files, groups entries by category prefix,
+Parses the assembled analysis files (with the streaming parser in
+kb_parser.py, shared with audit), groups entries by category prefix,
 and produces kb-formal.md with each finding's contribution preserved
 separately under its entry ID. No merging, no synthesis, no judgment calls.
 Contradictions between findings are preserved for the spec-writing agent
 to resolve.
 
+Every pass over the entries is linear: contributions, co-occurrence and
+counts are built from single-pass indexes, so organize stays sub-second as
+the KB grows. --benchmark times parse + format on a synthetic KB built by
+replicating the assembled file (10x by default) without writing anything.
+
+--incremental reads the analysis files directly instead of assembled.md.
+It keeps each file's parsed entries and the formatted sections in
+knowledge-base/organize-cache.json, re-parses only files whose mtime, size
+and hash changed, and re-formats only the sections holding entries those
+files contributed before or after the change.
+
 Usage:
     python scripts/organize-findings-kb.py
+    python scripts/organize-findings-kb.py --incremental
+    python scripts/organize-findings-kb.py --benchmark
+    python scripts/organize-findings-kb.py --benchmark 20
 """
 
+import argparse
+import hashlib
+import json
 import re
 import sys
-from collections import defaultdict
+import time
+from collections import Counter, defaultdict
 from pathlib import Path
 
+from kb_parser import parse_analyses, read_lines
+
 HARNESS_ROOT = Path(__file__).resolve().parent.parent
 ASSEMBLED_PATH = HARNESS_ROOT / "knowledge-base" / "assembled.md"
 KB_PATH = HARNESS_ROOT / "knowledge-base" / "kb-formal.md"
+ANALYZED_DIR = HARNESS_ROOT / "knowledge-base" / "analyzed"
+CACHE_PATH = HARNESS_ROOT / "knowledge-base" / "organize-cache.json"
 
 # Standard category order
 CATEGORIES = [
@@ -39,6 +62,7 @@ CATEGORIES = [
 ]
 
 CATEGORY_PREFIXES = {cat[0] for cat in CATEGORIES}
+CATEGORY_ORDER = {cat[0]: i for i, cat in enumerate(CATEGORIES)}
 
 
 def abort(message):
@@ -46,117 +70,74 @@ def abort(message):
     sys.exit(1)
 
 
-def parse_assembled(text):
-    """Parse assembled.md into a list of (entry_id, finding_number, body) tuples."""
-    entries = []
-    current_finding = None
-
-    # Split into lines for processing
-    lines = text.split("\n")
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-
-        # Track which finding we're in
-        m = re.match(r"^# Finding (\d+) Analysis", line)
-        if m:
-            current_finding = m.group(1)
-            i += 1
-            continue
-
-        # Skip omit sections
-        if line.startswith("## Omit"):
-            i += 1
-            continue
-
-        # Parse entry headers
-        m = re.match(r"^### ([A-Z]+-[A-Z0-9-]+)", line)
-        if m and current_finding:
-            entry_id = m.group(1)
-            # Collect body until next ### or # Finding or ---
-            body_lines = []
-            i += 1
-            while i < len(lines):
-                if re.match(r"^###\s", lines[i]):
-                    break
-                if re.match(r"^# Finding \d+", lines[i]):
-                    break
-                if lines[i].strip() == "---":
-                    i += 1  # consume the separator
-                    break
-                body_lines.append(lines[i])
-                i += 1
-            body = "\n".join(body_lines).strip()
-            entries.append((entry_id, current_finding, body))
-            continue
-
-        i += 1
-
-    return entries
-
-
 def extract_prefix(entry_id):
     """Extract the category prefix from an entry ID like 'SS-TUMBLER' -> 'SS'."""
     return entry_id.split("-", 1)[0]
 
 
-def build_cooccurrence(entries):
-    """Build co-occurrence: which entry IDs appeared together in the same finding."""
+def related_sort_key(entry_id):
+    """Sort key for related entries: category order, then alphabetically."""
+    return (CATEGORY_ORDER.get(extract_prefix(entry_id), 99), entry_id)
+
+
+def index_entries(entries):
+    """Index entries in a single pass.
+
+    Returns (grouped, cooccurrence, highest): contributions per entry ID in
+    order of first appearance, the entry IDs that appeared together in the
+    same finding, and the highest finding number.
+    """
+    grouped = defaultdict(list)
     finding_entries = defaultdict(set)
-    for entry_id, finding, _ in entries:
+    highest = 0
+    for entry_id, finding, body in entries:
+        grouped[entry_id].append((finding, body))
         finding_entries[finding].add(entry_id)
+        n = int(finding)
+        if n > highest:
+            highest = n
 
     cooccurrence = defaultdict(set)
-    for finding, ids in finding_entries.items():
+    for ids in finding_entries.values():
         for eid in ids:
-            cooccurrence[eid].update(ids - {eid})
+            cooccurrence[eid].update(ids)
+    for eid, related in cooccurrence.items():
+        related.discard(eid)
 
-    return cooccurrence
+    return grouped, cooccurrence, highest
 
 
-def find_highest_finding(entries):
-    """Find the highest finding number across all entries."""
-    highest = 0
-    for _, finding, _ in entries:
-        n = int(finding)
-        if n > highest:
-            highest = n
-    return highest
+def format_entry(out, entry_id, contributions):
+    """Append one entry's contributions to the output lines."""
+    out.append(f"### {entry_id}")
+    out.append("")
+    if len(contributions) == 1:
+        finding, body = contributions[0]
+        out.append(f"**Source:** Finding {finding}")
+        out.append("")
+        out.append(body)
+    else:
+        findings_list = ", ".join(f"{f}" for f, _ in contributions)
+        out.append(f"**Sources:** Findings {findings_list}")
+        out.append("")
+        for finding, body in contributions:
+            out.append(f"#### Finding {finding}")
+            out.append("")
+            out.append(body)
+            out.append("")
 
 
-def format_kb(entries):
-    """Format entries into the final kb-formal.md content."""
-    # Group by (prefix, entry_id) preserving order of first appearance
-    grouped = defaultdict(list)
-    entry_order = {}  # entry_id -> order of first appearance
-    order_counter = 0
-    for entry_id, finding, body in entries:
-        grouped[entry_id].append((finding, body))
-        if entry_id not in entry_order:
-            entry_order[entry_id] = order_counter
-            order_counter += 1
-
-    # Build co-occurrence map
-    cooccurrence = build_cooccurrence(entries)
-
-    # Find highest finding number
-    highest = find_highest_finding(entries)
-
-    # Group entry IDs by category
-    category_entries = defaultdict(list)
-    other_entries = []
-    for entry_id in entry_order:
-        prefix = extract_prefix(entry_id)
-        if prefix in CATEGORY_PREFIXES:
-            category_entries[prefix].append(entry_id)
-        else:
-            other_entries.append(entry_id)
+OTHER_SECTION = "Other"
 
-    # Sort entries within each category by order of first appearance
-    for prefix in category_entries:
-        category_entries[prefix].sort(key=lambda eid: entry_order[eid])
 
-    # Build output
+def section_key(entry_id):
+    """The section an entry belongs to: its category prefix, or Other."""
+    prefix = extract_prefix(entry_id)
+    return prefix if prefix in CATEGORY_PREFIXES else OTHER_SECTION
+
+
+def format_header(highest):
+    """The KB title and preamble."""
     out = []
     out.append("# Formal Properties Knowledge Base")
     out.append(f"<!-- last-finding: {highest:04d} -->")
@@ -166,99 +147,295 @@ def format_kb(entries):
     out.append("> Contradictions between findings are preserved for the spec-writing agent to resolve.")
     out.append("> Cite entries as `[SS-ADDRESS-SPACE]`, `[ST-INSERT]`, `[FC-SUBSPACE]`, etc.")
     out.append("")
+    return "\n".join(out)
 
-    for prefix, section_name, description in CATEGORIES:
-        out.append(f"## {section_name}")
-        out.append("")
-        out.append(f"> {description}")
-        out.append("")
 
-        eids = category_entries.get(prefix, [])
-        if not eids:
-            out.append("*No entries.*")
-            out.append("")
-            continue
+def format_category(prefix, eids, grouped, cooccurrence):
+    """One standard category section."""
+    _, section_name, description = CATEGORIES[CATEGORY_ORDER[prefix]]
+    out = []
+    out.append(f"## {section_name}")
+    out.append("")
+    out.append(f"> {description}")
+    out.append("")
 
-        for entry_id in eids:
-            contributions = grouped[entry_id]
-            out.append(f"### {entry_id}")
-            out.append("")
+    if not eids:
+        out.append("*No entries.*")
+        out.append("")
+        return "\n".join(out)
+
+    for entry_id in eids:
+        format_entry(out, entry_id, grouped[entry_id])
 
-            if len(contributions) == 1:
-                finding, body = contributions[0]
-                out.append(f"**Source:** Finding {finding}")
-                out.append("")
-                out.append(body)
-            else:
-                findings_list = ", ".join(f"{f}" for f, _ in contributions)
-                out.append(f"**Sources:** Findings {findings_list}")
-                out.append("")
-                for finding, body in contributions:
-                    out.append(f"#### Finding {finding}")
-                    out.append("")
-                    out.append(body)
-                    out.append("")
-
-            # Add co-occurrence
-            related = cooccurrence.get(entry_id, set())
-            if related:
-                # Sort related by category order then alphabetically
-                def sort_key(eid):
-                    p = extract_prefix(eid)
-                    cat_order = {c[0]: i for i, c in enumerate(CATEGORIES)}
-                    return (cat_order.get(p, 99), eid)
-                related_sorted = sorted(related, key=sort_key)
-                out.append(f"**Co-occurring entries:** {', '.join(f'[{r}]' for r in related_sorted)}")
-                out.append("")
-
-            out.append("---")
+        # Add co-occurrence
+        related = cooccurrence.get(entry_id)
+        if related:
+            related_sorted = sorted(related, key=related_sort_key)
+            out.append(f"**Co-occurring entries:** {', '.join(f'[{r}]' for r in related_sorted)}")
             out.append("")
 
-    # Other categories (invented prefixes)
-    if other_entries:
-        out.append("## Other Categories")
+        out.append("---")
         out.append("")
-        out.append("> These categories were invented during analysis.")
-        out.append("")
-        for entry_id in other_entries:
-            contributions = grouped[entry_id]
-            out.append(f"### {entry_id}")
-            out.append("")
-            if len(contributions) == 1:
-                finding, body = contributions[0]
-                out.append(f"**Source:** Finding {finding}")
-                out.append("")
-                out.append(body)
-            else:
-                findings_list = ", ".join(f"{f}" for f, _ in contributions)
-                out.append(f"**Sources:** Findings {findings_list}")
-                out.append("")
-                for finding, body in contributions:
-                    out.append(f"#### Finding {finding}")
-                    out.append("")
-                    out.append(body)
-                    out.append("")
-            out.append("---")
-            out.append("")
 
     return "\n".join(out)
 
 
+def format_other(eids, grouped):
+    """The section for invented prefixes."""
+    out = []
+    out.append("## Other Categories")
+    out.append("")
+    out.append("> These categories were invented during analysis.")
+    out.append("")
+    for entry_id in eids:
+        format_entry(out, entry_id, grouped[entry_id])
+        out.append("---")
+        out.append("")
+    return "\n".join(out)
+
+
+def format_sections(grouped, cooccurrence, only=None):
+    """Format the category sections, keyed by prefix (or Other).
+
+    With `only`, just those sections are formatted. Other is absent when
+    no entry uses an invented prefix.
+    """
+    # grouped preserves order of first appearance
+    section_entries = defaultdict(list)
+    for entry_id in grouped:
+        section_entries[section_key(entry_id)].append(entry_id)
+
+    sections = {}
+    for prefix, _, _ in CATEGORIES:
+        if only is None or prefix in only:
+            sections[prefix] = format_category(
+                prefix, section_entries.get(prefix, []), grouped, cooccurrence)
+    if OTHER_SECTION in section_entries and (only is None or OTHER_SECTION in only):
+        sections[OTHER_SECTION] = format_other(section_entries[OTHER_SECTION], grouped)
+    return sections
+
+
+def join_kb(header, sections):
+    """Assemble the header and sections in category order."""
+    parts = [header]
+    parts.extend(sections[prefix] for prefix, _, _ in CATEGORIES)
+    if OTHER_SECTION in sections:
+        parts.append(sections[OTHER_SECTION])
+    return "\n".join(parts)
+
+
+def format_kb(entries):
+    """Format entries into the final kb-formal.md content."""
+    grouped, cooccurrence, highest = index_entries(entries)
+    return join_kb(format_header(highest), format_sections(grouped, cooccurrence))
+
+
+def file_hash(path):
+    """SHA-256 of a file's contents."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def analysis_files():
+    """Analysis files in finding order, as assemble concatenates them."""
+    files = []
+    for f in ANALYZED_DIR.glob("*.md"):
+        match = re.match(r"(\d+)", f.name)
+        if match:
+            files.append((int(match.group(1)), f))
+    files.sort(key=lambda x: x[0])
+    return [f for _, f in files]
+
+
+class OrganizeCache:
+    """Parsed entries per analysis file and the formatted KB sections.
+
+    Invalidated as a whole when this script or the parser changes, since
+    the cached entries and sections depend on both.
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        scripts = Path(__file__).resolve().parent
+        self.script_hash = hashlib.sha256(
+            (file_hash(Path(__file__)) + file_hash(scripts / "kb_parser.py")).encode()
+        ).hexdigest()
+        data = json.loads(path.read_text()) if path.exists() else {}
+        if data.get("script_sha256") != self.script_hash:
+            data = {}
+        self.files = data.get("files", {})
+        self.sections = data.get("sections", {})
+        self.kb_hash = data.get("kb_sha256")
+
+    def refresh(self, path):
+        """Bring one file's record up to date.
+
+        Returns (old_entries, new_entries) if its content changed, or None.
+        """
+        st = path.stat()
+        record = self.files.get(path.name)
+        if record and record["mtime_ns"] == st.st_mtime_ns and record["size"] == st.st_size:
+            return None
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        old = record["entries"] if record else []
+        changed = record is None or record["sha256"] != digest
+        if changed:
+            entries = list(parse_analyses(data.decode("utf-8").strip().split("\n")))
+        else:
+            entries = old
+        self.files[path.name] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha256": digest,
+            "entries": [list(e) for e in entries],
+        }
+        return (old, entries) if changed else None
+
+    def save(self):
+        temp = self.path.with_suffix(".tmp")
+        temp.write_text(json.dumps({
+            "script_sha256": self.script_hash,
+            "kb_sha256": self.kb_hash,
+            "files": self.files,
+            "sections": self.sections,
+        }) + "\n")
+        temp.replace(self.path)
+
+
+def organize_incremental():
+    """Regenerate kb-formal.md from the analysis files, redoing only what changed."""
+    if not ANALYZED_DIR.exists():
+        abort(f"No analyzed directory: {ANALYZED_DIR}")
+
+    cache = OrganizeCache()
+    paths = analysis_files()
+    names = {p.name for p in paths}
+
+    changed = []
+    affected = set()
+    for path in paths:
+        change = cache.refresh(path)
+        if change:
+            changed.append(path.name)
+            old, new = change
+            affected.update(section_key(e[0]) for e in old)
+            affected.update(section_key(e[0]) for e in new)
+    for name in sorted(set(cache.files) - names):
+        changed.append(name)
+        affected.update(section_key(e[0]) for e in cache.files.pop(name)["entries"])
+
+    # Sections missing from the cache (first run, new Other) must be formatted too
+    for prefix, _, _ in CATEGORIES:
+        if prefix not in cache.sections:
+            affected.add(prefix)
+
+    print(f"Organizing KB from {len(paths)} analysis files "
+          f"({len(changed)} changed)")
+
+    if not changed and not affected and KB_PATH.exists() and cache.kb_hash == file_hash(KB_PATH):
+        print("KB is up to date")
+        return
+
+    entries = [tuple(e) for path in paths for e in cache.files[path.name]["entries"]]
+    grouped, cooccurrence, highest = index_entries(entries)
+    if not any(section_key(eid) == OTHER_SECTION for eid in grouped):
+        cache.sections.pop(OTHER_SECTION, None)
+        affected.discard(OTHER_SECTION)
+
+    cache.sections.update(format_sections(grouped, cooccurrence, only=affected))
+    kb_content = join_kb(format_header(highest), cache.sections)
+    KB_PATH.write_text(kb_content)
+    cache.kb_hash = hashlib.sha256(kb_content.encode("utf-8")).hexdigest()
+    cache.save()
+
+    regenerated = [prefix for prefix, _, _ in CATEGORIES if prefix in affected]
+    if OTHER_SECTION in affected:
+        regenerated.append(OTHER_SECTION)
+    print(f"Parsed {len(entries)} entries, {len(grouped)} unique IDs")
+    print(f"Sections regenerated: {', '.join(regenerated) if regenerated else 'none'}")
+    kb_lines = kb_content.count("\n")
+    print(f"KB written to {KB_PATH} ({KB_PATH.stat().st_size:,} bytes, {kb_lines:,} lines)")
+
+
+def synthesize_assembled(text, scale):
+    """Build a synthetic assembled file `scale` times the size of `text`.
+
+    Each copy renumbers its findings. Even copies keep the original entry
+    IDs, so entries gain contributions; odd copies suffix them, so the
+    number of entries grows too.
+    """
+    parts = [text]
+    for copy in range(1, scale):
+        offset = copy * 10000
+
+        def renumber(m):
+            return f"# Finding {int(m.group(1)) + offset:04d} Analysis"
+
+        part = re.sub(r"^# Finding (\d+) Analysis", renumber, text, flags=re.M)
+        if copy % 2:
+            part = re.sub(r"^(### [A-Z]+-[A-Z0-9-]+)", rf"\1-X{copy}", part, flags=re.M)
+        parts.append(part)
+    return "\n\n---\n\n".join(parts)
+
+
+def benchmark(text, scale):
+    """Time parse + format on a synthetic KB; nothing is written."""
+    synthetic = synthesize_assembled(text, scale)
+    print(f"Benchmark: {scale}x synthetic assembled file "
+          f"({len(synthetic.encode('utf-8')):,} bytes)")
+
+    start = time.perf_counter()
+    entries = list(parse_analyses(synthetic.split("\n")))
+    parsed = time.perf_counter()
+    kb_content = format_kb(entries)
+    formatted = time.perf_counter()
+
+    print(f"  entries: {len(entries):,} ({len(Counter(e[0] for e in entries)):,} unique)")
+    print(f"  output:  {len(kb_content.encode('utf-8')):,} bytes")
+    print(f"  parse:   {parsed - start:.3f}s")
+    print(f"  format:  {formatted - parsed:.3f}s")
+    print(f"  total:   {formatted - start:.3f}s")
+
+
 def main():
+    parser = argparse.ArgumentParser(
+        description="Organize the assembled findings into kb-formal.md"
+    )
+    parser.add_argument(
+        "--benchmark", type=int, nargs="?", const=10, default=None, metavar="SCALE",
+        help="Time parse + format on a synthetic KB SCALE times the assembled file (default 10)"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Read the analysis files and redo only the sections they changed"
+    )
+    args = parser.parse_args()
+
+    if args.incremental and args.benchmark is None:
+        organize_incremental()
+        return
+
     if not ASSEMBLED_PATH.exists():
         abort(f"Assembled file not found: {ASSEMBLED_PATH}")
 
-    text = ASSEMBLED_PATH.read_text()
-    assembled_size = len(text.encode("utf-8"))
+    if args.benchmark is not None:
+        if args.benchmark < 1:
+            abort("--benchmark scale must be at least 1")
+        benchmark(ASSEMBLED_PATH.read_text(), args.benchmark)
+        return
+
+    assembled_size = ASSEMBLED_PATH.stat().st_size
     print(f"Organizing KB from assembled file ({assembled_size:,} bytes)")
 
-    entries = parse_assembled(text)
+    entries = list(parse_analyses(read_lines(ASSEMBLED_PATH)))
     print(f"Parsed {len(entries)} entries from {len(set(e[1] for e in entries))} findings")
 
-    # Count by category
-    prefix_counts = defaultdict(int)
-    for entry_id, _, _ in entries:
-        prefix_counts[extract_prefix(entry_id)] += 1
+    # Count by category and by entry ID in one pass
+    id_counts = Counter(e[0] for e in entries)
+    prefix_counts = Counter()
+    for entry_id, count in id_counts.items():
+        prefix_counts[extract_prefix(entry_id)] += count
     for prefix, name, _ in CATEGORIES:
         count = prefix_counts.get(prefix, 0)
         if count:
@@ -267,9 +444,8 @@ def main():
     if other_count:
         print(f"  Other: {other_count} entries")
 
-    unique_ids = len(set(e[0] for e in entries))
-    multi_source = sum(1 for eid in set(e[0] for e in entries)
-                       if sum(1 for e in entries if e[0] == eid) > 1)
+    unique_ids = len(id_counts)
+    multi_source = sum(1 for count in id_counts.values() if count > 1)
     print(f"Unique entry IDs: {unique_ids} ({multi_source} with multiple findings)")
 
     kb_content = format_kb(entries)